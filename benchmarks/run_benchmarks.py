@@ -0,0 +1,358 @@
+"""
+Benchmarks of the simulation hot paths.
+
+Startup benchmarks time cold imports and a sweep worker's first point in
+fresh interpreters; micro-benchmarks time the model functions that run
+inside every RHS evaluation; macro-benchmarks time a full simulate() call
+and each sweep of main.py, recording wall time, peak memory (tracemalloc),
+solver call counts and RHS evaluations per second. Results are written as JSON, and can be
+compared against a stored baseline to flag regressions.
+
+Run from the repository root:
+
+    python benchmarks/run_benchmarks.py                      # all benchmarks
+    python benchmarks/run_benchmarks.py --quick              # skip the sweeps
+    python benchmarks/run_benchmarks.py --save-baseline      # store a baseline
+    python benchmarks/run_benchmarks.py --baseline benchmarks/baseline.json
+"""
+
+import os
+import sys
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# the package and main.py are used from the checkout, installed or not
+sys.path.insert(0, ROOT)
+
+import argparse
+import json
+import platform
+import subprocess
+import tempfile
+import time
+import timeit
+import tracemalloc
+
+import numpy as np
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+
+BENCHMARK_FORMAT_VERSION = 1
+BASELINE_PATH = os.path.join(ROOT, 'benchmarks', 'baseline.json')
+RESULTS_DIRECTORY = os.path.join(ROOT, 'benchmarks', 'results')
+MICRO_REPEATS = 5
+MICRO_MIN_TIME = 0.2  # seconds per timing repeat
+REGRESSION_THRESHOLD = 0.2  # relative slowdown that is flagged
+STARTUP_REPEATS = 3
+# entry points whose cold import time is measured, each in a fresh interpreter
+STARTUP_MODULES = ('kick_simulation', 'kick_simulation.cli', 'kick_simulation.sweep',
+                   'kick_simulation.simulate')
+
+def _micro(function, repeats=MICRO_REPEATS, min_time=MICRO_MIN_TIME):
+    """
+    Times a function of no arguments; the best of repeats is reported, as
+    the other repeats are slowed down by unrelated load.
+    """
+
+    timer = timeit.Timer(function)
+    number, _ = timer.autorange()
+    number = max(number, int(np.ceil(number*min_time/0.2)))
+    best = min(timer.repeat(repeats, number))/number
+
+    return {'time_per_call': best, 'calls_per_second': 1/best}
+
+
+def _macro(function):
+    """
+    Wall time and peak traced memory of a function of no arguments. Tracing
+    slows allocation-heavy code down considerably, so the function runs
+    twice: untraced for the wall time, then traced for the memory.
+    """
+
+    start = time.perf_counter()
+    function()
+    wall_time = time.perf_counter() - start
+
+    tracemalloc.start()
+    try:
+        function()
+        peak_memory = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return {'wall_time': wall_time, 'peak_memory': peak_memory}
+
+
+def micro_benchmarks():
+    """
+    Per-call cost of the functions evaluated inside the RHS, on the
+    inputs of a typical state.
+    """
+
+    from kick_simulation.muscle_modelling.force_length import force_length_tendon
+    from kick_simulation.muscle_modelling.model_eval import model_eval
+    from kick_simulation.muscle_modelling.get_velocity import get_velocity
+    from kick_simulation.muscle_modelling.muscle_group import MuscleGroup
+    from kick_simulation.muscle_modelling.regression import get_muscle_force_length_regression,\
+                           get_muscle_force_velocity_regression
+    from kick_simulation.muscle_length import quad_muscle_length
+    from kick_simulation.dynamics import dynamics
+    from kick_simulation.batch_simulate import batch_muscle_group
+
+    force_length_regression = get_muscle_force_length_regression()
+    force_velocity_regression = get_muscle_force_velocity_regression()
+    coefficients = np.asarray(force_velocity_regression)
+
+    lm = np.array([0.95, 1.02, 1.0, 0.97])
+    lt = np.array([1.01, 1.03, 1.02, 1.015])
+    activations = np.array([1.0, 1.0, 1.0, 1.0])
+    group = batch_muscle_group(np.array([np.pi/6]))
+    muscles = MuscleGroup(group.f0M[0], group.resting_length_muscle[0],
+                          group.resting_length_tendon[0])
+    x = np.array([np.pi/4, 1.0, 0.95, 1.02, 1.0, 0.97])
+    # warm started from the solution at the same state, as in a simulation
+    vm0 = dynamics(x, np.pi/6, muscles, activations,
+                   force_length_regression, force_velocity_regression)[2:]
+
+    return {
+        'force_length_tendon': _micro(lambda: force_length_tendon(lt)),
+        'model_eval': _micro(lambda: model_eval('Sigmoid', lm - 1, coefficients)),
+        'get_velocity': _micro(lambda: get_velocity(
+            activations, lm, lt, force_length_regression, force_velocity_regression)),
+        'quad_muscle_length': _micro(lambda: quad_muscle_length(np.pi/4, np.pi/6)),
+        'dynamics': _micro(lambda: dynamics(
+            x, np.pi/6, muscles, activations,
+            force_length_regression, force_velocity_regression, vm0=vm0)),
+    }
+
+
+def simulate_benchmark():
+    """
+    A single simulate() call, including its figure, and the run_simulation
+    call underneath it on its own for the solver counts and RHS rate.
+    """
+
+    from kick_simulation.simulate import simulate, run_simulation
+    from kick_simulation.activation import ConstantActivation
+    from kick_simulation.muscle_modelling.regression import get_muscle_force_length_regression,\
+                           get_muscle_force_velocity_regression
+
+    force_length_regression = get_muscle_force_length_regression()
+    force_velocity_regression = get_muscle_force_velocity_regression()
+    arguments = (0.75, [np.pi/8, 0.1, 1, 1, 1, 1], np.pi/6) + (ConstantActivation(1),)*4 \
+        + (force_length_regression, force_velocity_regression)
+
+    record = _macro(lambda: plt.close(simulate(*arguments)[0]))
+
+    # solver counts and the RHS rate come from the same (deterministic)
+    # headless run, so the rate does not include building the figure
+    start = time.perf_counter()
+    stats = run_simulation(*arguments).solver_stats
+    solve_time = time.perf_counter() - start
+    record.update(nfev=stats['nfev'], njev=stats['njev'], nlu=stats['nlu'],
+                  solve_time=solve_time, rhs_per_second=stats['nfev']/solve_time)
+
+    return {'simulate': record}
+
+
+def sweep_benchmarks():
+    """
+    Each sweep of main.py, run serially in a temporary directory (for the
+    figures they save) so that memory and solver counts are measured in
+    this process. The optimization of main.py is not a sweep and is left
+    out.
+    """
+
+    import main
+    from kick_simulation import sweep
+
+    run_sweep = sweep.run_sweep
+    results = []
+
+    def serial_run_sweep(T, points, **options):
+        options.update(workers=1, progress=False)
+        sweep_results = run_sweep(T, points, **options)
+        results.extend(sweep_results)
+        return sweep_results
+
+    sweeps = ['sample_simulation_sweep', 'sweep_thigh_offset', 'sweep_initial_theta',
+              'sweep_muscle_activations', 'sweep_final']
+
+    records = {}
+    cwd = os.getcwd()
+    show = plt.show
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        plt.show = lambda *args, **kwargs: None
+        sweep.run_sweep = main.run_sweep = serial_run_sweep
+        try:
+            for name in sweeps:
+                def run():
+                    del results[:]
+                    getattr(main, name)()
+                    plt.close('all')
+
+                record = _macro(run)
+                nfev = sum(result.solver_stats['nfev'] for result in results)
+                record.update(simulations=len(results), nfev=nfev,
+                              njev=sum(result.solver_stats['njev'] for result in results),
+                              nlu=sum(result.solver_stats['nlu'] for result in results),
+                              rhs_per_second=nfev/record['wall_time'])
+                records[name] = record
+        finally:
+            sweep.run_sweep = main.run_sweep = run_sweep
+            plt.show = show
+            os.chdir(cwd)
+
+    return records
+
+
+def _run_python(code):
+    """
+    Runs code in a fresh interpreter and returns the JSON it prints last.
+    """
+
+    output = subprocess.run([sys.executable, '-c', code], cwd=ROOT, check=True,
+                            capture_output=True, text=True).stdout
+
+    return json.loads(output.splitlines()[-1])
+
+
+def startup_benchmarks():
+    """
+    Cold-start cost, each measured in a fresh interpreter: the import time
+    of the package's entry points, and the time and peak resident memory
+    of a sweep worker simulating its first point.
+    """
+
+    records = {}
+    for module in STARTUP_MODULES:
+        code = ('import json, time; start = time.perf_counter(); import %s; '
+                'print(json.dumps(time.perf_counter() - start))' % module)
+        records['import_' + module.replace('.', '_')] = {
+            'wall_time': min(_run_python(code) for _ in range(STARTUP_REPEATS))}
+
+    code = ('import json, resource, time; start = time.perf_counter(); '
+            'from kick_simulation.sweep import simulate_point; simulate_point(0.75, {}); '
+            'print(json.dumps([time.perf_counter() - start, '
+            'resource.getrusage(resource.RUSAGE_SELF).ru_maxrss*1024]))')
+    wall_time, peak_rss = min(_run_python(code) for _ in range(STARTUP_REPEATS))
+    records['worker_first_point'] = {'wall_time': wall_time, 'peak_rss': peak_rss}
+
+    return records
+
+
+def run_benchmarks(quick=False, only=None):
+    """
+    Runs the benchmarks.
+
+    :param quick: skip the sweep benchmarks
+    :param only: names of benchmark groups to run ('startup', 'micro',
+        'simulate', 'sweeps'), all if None
+    :return report: JSON-serializable dictionary of results and environment
+    """
+
+    groups = [('startup', startup_benchmarks), ('micro', micro_benchmarks),
+              ('simulate', simulate_benchmark)]
+    if not quick:
+        groups.append(('sweeps', sweep_benchmarks))
+
+    benchmarks = {}
+    for group, function in groups:
+        if only is None or group in only:
+            benchmarks[group] = function()
+
+    return {
+        'version': BENCHMARK_FORMAT_VERSION,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'environment': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'processor': platform.processor(),
+        },
+        'benchmarks': benchmarks,
+    }
+
+
+def compare(report, baseline, threshold=REGRESSION_THRESHOLD):
+    """
+    Compares a report against a baseline report. A benchmark regresses if
+    its time per call or wall time grew by more than threshold, relative
+    to the baseline.
+
+    :param report: report from run_benchmarks
+    :param baseline: earlier report
+    :param threshold: relative slowdown that counts as a regression
+    :return rows: list of (name, baseline time, new time, ratio, regressed)
+    """
+
+    rows = []
+    for group, records in report['benchmarks'].items():
+        for name, record in records.items():
+            old = baseline.get('benchmarks', {}).get(group, {}).get(name)
+            if old is None:
+                continue
+            key = 'time_per_call' if 'time_per_call' in record else 'wall_time'
+            ratio = record[key]/old[key]
+            rows.append(('%s.%s' % (group, name), old[key], record[key], ratio,
+                         ratio > 1 + threshold))
+
+    return rows
+
+
+def _print_report(report):
+    for group, records in report['benchmarks'].items():
+        for name, record in records.items():
+            if 'time_per_call' in record:
+                print('%-40s %12.2f us/call %12.0f calls/s' % (
+                    group + '.' + name, 1e6*record['time_per_call'], record['calls_per_second']))
+            elif 'nfev' not in record:
+                print('%-40s %12.3f s%s' % (
+                    group + '.' + name, record['wall_time'], '' if 'peak_rss' not in record
+                    else ' %9.1f MB peak RSS' % (record['peak_rss']/2**20)))
+            else:
+                print('%-40s %12.3f s %9.1f MB peak %10d nfev %10.0f rhs/s' % (
+                    group + '.' + name, record['wall_time'], record['peak_memory']/2**20,
+                    record['nfev'], record['rhs_per_second']))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks of the simulation hot paths')
+    parser.add_argument('--quick', action='store_true', help='skip the sweep benchmarks')
+    parser.add_argument('--only', nargs='+', choices=['startup', 'micro', 'simulate', 'sweeps'],
+                        help='benchmark groups to run')
+    parser.add_argument('--output', help='JSON file to write the results to '
+                        '(default: a timestamped file in benchmarks/results)')
+    parser.add_argument('--baseline', help='JSON report to compare against')
+    parser.add_argument('--save-baseline', action='store_true',
+                        help='also store the results as %s' % os.path.relpath(BASELINE_PATH, ROOT))
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD,
+                        help='relative slowdown flagged as a regression')
+    args = parser.parse_args()
+
+    report = run_benchmarks(quick=args.quick, only=args.only)
+    _print_report(report)
+
+    output = args.output or os.path.join(
+        RESULTS_DIRECTORY, 'benchmark_%s.json' % time.strftime('%Y%m%d_%H%M%S'))
+    paths = [output] + ([BASELINE_PATH] if args.save_baseline else [])
+    for path in paths:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'w') as file:
+            json.dump(report, file, indent=2)
+        print('results written to %s' % path)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        regressed = False
+        for name, old, new, ratio, flagged in compare(report, baseline, args.threshold):
+            regressed |= flagged
+            print('%-40s %10.4g -> %10.4g  x%.2f%s' % (
+                name, old, new, ratio, '  REGRESSION' if flagged else ''))
+        if regressed:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
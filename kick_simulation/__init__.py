@@ -0,0 +1,70 @@
+"""
+Simulation of a knee-extension kick, driven by Hill-type models of the four
+heads of the quadriceps.
+
+Submodules and the names re-exported below are imported on first access,
+so importing the package (in a sweep worker, or for the command line tool)
+loads neither scipy, scikit-learn nor matplotlib until they are needed.
+"""
+
+import importlib
+
+__version__ = '0.1.0'
+
+_SUBMODULES = (
+    'activation',
+    'batch_simulate',
+    'checkpoint',
+    'cli',
+    'compiled',
+    'dynamics',
+    'geometry',
+    'gravity_moment',
+    'instrumentation',
+    'muscle_length',
+    'muscle_modelling',
+    'optimize',
+    'parameters',
+    'plotting',
+    'result_cache',
+    'sensitivity',
+    'simulate',
+    'surrogate',
+    'sweep',
+    'trajectory_store',
+)
+# public names and the submodules they are defined in
+_EXPORTS = {
+    'run_simulation': 'simulate',
+    'SimulationResult': 'simulate',
+    'parameter_grid': 'sweep',
+    'run_sweep': 'sweep',
+    'adaptive_sweep': 'sweep',
+    'KickParameters': 'parameters',
+    'ActivationPattern': 'activation',
+    'ConstantActivation': 'activation',
+    'CosineActivation': 'activation',
+    'PiecewiseLinearActivation': 'activation',
+    'get_muscle_force_length_regression': 'muscle_modelling.regression',
+    'get_muscle_force_velocity_regression': 'muscle_modelling.regression',
+    'optimize_kick': 'optimize',
+    'SimulationCache': 'result_cache',
+    'SweepCheckpoint': 'checkpoint',
+    'TrajectoryStore': 'trajectory_store',
+    'instrumented': 'instrumentation',
+}
+
+def __getattr__(name):
+    if name in _EXPORTS:
+        value = getattr(importlib.import_module('.' + _EXPORTS[name], __name__), name)
+    elif name in _SUBMODULES:
+        value = importlib.import_module('.' + name, __name__)
+    else:
+        raise AttributeError('module %r has no attribute %r' % (__name__, name))
+
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_SUBMODULES) | set(_EXPORTS))
@@ -0,0 +1,278 @@
+import numpy as np
+
+# time constants of first-order excitation-activation dynamics (Thelen 2003)
+ACTIVATION_TIME_CONSTANT = 0.01
+DEACTIVATION_TIME_CONSTANT = 0.04
+EXCITATION_TIME_STEP = 1e-3
+
+class ActivationProfile:
+    """
+    Base class of muscle activation profiles. A profile is defined by a
+    tuple of plain values (its key), which makes it hashable, comparable
+    and picklable, so it can be sent to sweep worker processes and used in
+    cache keys, unlike a lambda. Profiles are evaluated at a time or at an
+    array of times.
+
+    Profiles that are piecewise linear in time also expose their knots
+    through table(), so that ActivationPattern can interpolate them for all
+    muscles at once.
+    """
+
+    def _key(self):
+        raise NotImplementedError
+
+    def table(self):
+        """
+        Knots of the profile if it is piecewise linear in time (and constant
+        beyond its first and last knot).
+
+        :return times: increasing knot times, or None
+        :return values: activation at the knots, or None
+        """
+
+        return None, None
+
+    def __call__(self, t):
+        """
+        Evaluate activation at time t.
+
+        :param t: time, in seconds, scalar or array
+        :return activation: activation between (0, 1), same shape as t
+        """
+
+        times, values = self.table()
+        activation = np.interp(t, times, values)
+        if np.ndim(activation) == 0:
+            return float(activation)
+
+        return activation
+
+    def __repr__(self):
+        return '%s(%s)' % (type(self).__name__, ', '.join(repr(value) for value in self._key()))
+
+    def __eq__(self, other):
+        return type(other) is type(self) and other._key() == self._key()
+
+    def __hash__(self):
+        return hash((type(self).__name__, self._key()))
+
+
+class ConstantActivation(ActivationProfile):
+    """
+    Muscle activation that stays at a fixed level.
+    """
+
+    def __init__(self, level=1):
+
+        self.level = level
+
+    def _key(self):
+        return (self.level,)
+
+    def table(self):
+        return np.array([0.0]), np.array([self.level], dtype=float)
+
+    def __call__(self, t):
+        if np.ndim(t) == 0:
+            return self.level
+
+        return np.full(np.shape(t), self.level, dtype=float)
+
+
+class CosineActivation(ActivationProfile):
+    """
+    Muscle activation that ramps down as cos(pi*t/(2*duration)), reaching 0
+    after duration seconds.
+    """
+
+    def __init__(self, duration=1):
+
+        self.duration = duration
+
+    def _key(self):
+        return (self.duration,)
+
+    def __call__(self, t):
+        return np.cos((np.asarray(t)*np.pi)/(2*self.duration))
+
+
+class PiecewiseLinearActivation(ActivationProfile):
+    """
+    Muscle activation interpolated linearly between knots, and held at the
+    first and last level outside them.
+    """
+
+    def __init__(self, times, levels):
+
+        self.times = tuple(float(t) for t in times)
+        self.levels = tuple(float(level) for level in levels)
+
+        if len(self.times) != len(self.levels) or len(self.times) == 0:
+            raise ValueError('times and levels must be non-empty and of equal length')
+        if np.any(np.diff(self.times) < 0):
+            raise ValueError('knot times must be increasing')
+
+    def _key(self):
+        return (self.times, self.levels)
+
+    def table(self):
+        return np.array(self.times), np.array(self.levels)
+
+
+class SampledEMGActivation(ActivationProfile):
+    """
+    Muscle activation from a sampled EMG envelope: the samples are rectified,
+    normalized by their peak (or by max_voluntary, the EMG amplitude of a
+    maximal voluntary contraction) and clipped to [0, 1], then interpolated
+    linearly in time.
+    """
+
+    def __init__(self, times, samples, max_voluntary=None):
+
+        self.times = tuple(float(t) for t in times)
+        self.samples = tuple(float(sample) for sample in samples)
+        self.max_voluntary = max_voluntary
+
+        if len(self.times) != len(self.samples) or len(self.times) == 0:
+            raise ValueError('times and samples must be non-empty and of equal length')
+        if np.any(np.diff(self.times) < 0):
+            raise ValueError('sample times must be increasing')
+
+        envelope = np.abs(np.array(self.samples))
+        peak = np.max(envelope) if max_voluntary is None else max_voluntary
+        self._levels = np.clip(envelope/peak if peak > 0 else envelope, 0, 1)
+
+    def _key(self):
+        return (self.times, self.samples, self.max_voluntary)
+
+    def table(self):
+        return np.array(self.times), self._levels
+
+
+class ExcitationDynamicsActivation(ActivationProfile):
+    """
+    Activation following a neural excitation profile through first-order
+    excitation-activation dynamics,
+
+        da/dt = (u - a)/tau(u, a),
+
+    with tau = tau_act*(0.5 + 1.5*a) while activating (u > a) and
+    tau_deact/(0.5 + 1.5*a) while deactivating. The dynamics are integrated
+    once, over [0, duration] with step dt, when the profile is built, and
+    evaluated by interpolation afterwards. The excitation is itself an
+    activation profile, so that this profile stays hashable, picklable and
+    describable by its repr.
+    """
+
+    def __init__(self, excitation, duration, initial_activation=0,
+                 activation_time_constant=ACTIVATION_TIME_CONSTANT,
+                 deactivation_time_constant=DEACTIVATION_TIME_CONSTANT,
+                 dt=EXCITATION_TIME_STEP):
+
+        if not isinstance(excitation, ActivationProfile):
+            raise TypeError('excitation must be an ActivationProfile, got %s'
+                            % type(excitation).__name__)
+
+        self.excitation = excitation
+        self.duration = duration
+        self.initial_activation = initial_activation
+        self.activation_time_constant = activation_time_constant
+        self.deactivation_time_constant = deactivation_time_constant
+        self.dt = dt
+
+        times = np.linspace(0, duration, max(int(np.ceil(duration/dt)), 1) + 1)
+        u = np.broadcast_to(np.asarray(excitation(times), dtype=float), times.shape)
+        levels = np.empty(len(times))
+        levels[0] = initial_activation
+        for i in range(1, len(times)):
+            a = levels[i - 1]
+            if u[i - 1] > a:
+                tau = activation_time_constant*(0.5 + 1.5*a)
+            else:
+                tau = deactivation_time_constant/(0.5 + 1.5*a)
+            # exact solution for the excitation and time constant frozen
+            # over the step, which keeps a within [0, 1]
+            levels[i] = u[i - 1] + (a - u[i - 1])*np.exp(-(times[i] - times[i - 1])/tau)
+
+        self._times = times
+        self._levels = levels
+
+    def _key(self):
+        return (self.excitation, self.duration, self.initial_activation,
+                self.activation_time_constant, self.deactivation_time_constant, self.dt)
+
+    def table(self):
+        return self._times, self._levels
+
+
+class ActivationPattern:
+    """
+    Activations of a group of muscles, evaluated for all muscles at once.
+    Piecewise-linear profiles are merged into one (knots, muscles) table on
+    the union of their knots, so all of them are interpolated with a single
+    search; other profiles (or plain functions) are evaluated one by one.
+    """
+
+    def __init__(self, profiles):
+
+        self.profiles = tuple(profiles)
+
+        self._tabulated = []
+        tables = []
+        for i, profile in enumerate(self.profiles):
+            times, values = profile.table() if isinstance(profile, ActivationProfile) \
+                else (None, None)
+            if times is not None:
+                self._tabulated.append(i)
+                tables.append((times, values))
+        self._other = [i for i in range(len(self.profiles)) if i not in self._tabulated]
+
+        if tables:
+            self._times = np.unique(np.concatenate([times for times, _ in tables]))
+            self._values = np.stack([np.interp(self._times, times, values)
+                                     for times, values in tables], axis=-1)
+
+    def __call__(self, t):
+        """
+        Evaluate the activations at time t.
+
+        :param t: time, in seconds, scalar or (M,) array
+        :return activations: (N,) activations, or (M, N) for an array of times
+        """
+
+        t = np.asarray(t, dtype=float)
+        activations = np.empty(t.shape + (len(self.profiles),))
+
+        if self._tabulated:
+            activations[..., self._tabulated] = _interp_rows(t, self._times, self._values)
+        for i in self._other:
+            activations[..., i] = self.profiles[i](t)
+
+        return activations
+
+    def __len__(self):
+        return len(self.profiles)
+
+    def __repr__(self):
+        return 'ActivationPattern(%r)' % (list(self.profiles),)
+
+    def __eq__(self, other):
+        return type(other) is type(self) and other.profiles == self.profiles
+
+    def __hash__(self):
+        return hash((type(self).__name__, self.profiles))
+
+
+def _interp_rows(t, times, values):
+    """
+    Linear interpolation of the rows of values (one per knot) at t, held
+    constant outside the knots.
+    """
+
+    if len(times) == 1:
+        return np.broadcast_to(values[0], t.shape + values.shape[1:])
+
+    index = np.clip(np.searchsorted(times, t, side='right') - 1, 0, len(times) - 2)
+    weight = np.clip((t - times[index])/(times[index + 1] - times[index]), 0, 1)[..., np.newaxis]
+
+    return (1 - weight)*values[index] + weight*values[index + 1]
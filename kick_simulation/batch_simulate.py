@@ -0,0 +1,297 @@
+import numpy as np
+
+from .muscle_length import quad_muscle_length
+from .muscle_modelling.muscle_group import MuscleGroup
+from .dynamics import dynamics, QUAD_MOMENT_ARM
+from .simulate import QUAD_REST_ANGLE, SHANK_LENGTH, \
+    FEMORIS_MAX_FORCE, LATERALIS_MAX_FORCE, MEDIALIS_MAX_FORCE, INTERMEDIUS_MAX_FORCE, \
+    FEMORIS_MUSCLE_PERCENT, LATERALIS_MUSCLE_PERCENT, MEDIALIS_MUSCLE_PERCENT, \
+    INTERMEDIUS_MUSCLE_PERCENT, FEMORIS_TENDON_PERCENT, LATERALIS_TENDON_PERCENT, \
+    MEDIALIS_TENDON_PERCENT, INTERMEDIUS_TENDON_PERCENT
+
+# quadricep heads in state-vector order: femoris, lateralis, medialis, intermedius
+MAX_FORCES = np.array([FEMORIS_MAX_FORCE, LATERALIS_MAX_FORCE,
+                       MEDIALIS_MAX_FORCE, INTERMEDIUS_MAX_FORCE])
+MUSCLE_PERCENTS = np.array([FEMORIS_MUSCLE_PERCENT, LATERALIS_MUSCLE_PERCENT,
+                            MEDIALIS_MUSCLE_PERCENT, INTERMEDIUS_MUSCLE_PERCENT])
+TENDON_PERCENTS = np.array([FEMORIS_TENDON_PERCENT, LATERALIS_TENDON_PERCENT,
+                            MEDIALIS_TENDON_PERCENT, INTERMEDIUS_TENDON_PERCENT])
+# explicit RK4 is only stable below roughly 5e-5 s near full activation
+TIME_STEP = 2e-5
+INITIAL_TIME_STEP = 1e-4  # first trial step of the adaptive scheme
+RTOL = 1e-6
+ATOL = 1e-8
+OUTPUT_POINTS = 100
+
+# Dormand-Prince 5(4) tableau, as used by scipy's RK45
+DOPRI_C = np.array([0, 1/5, 3/10, 4/5, 8/9, 1])
+DOPRI_A = [
+    np.array([]),
+    np.array([1/5]),
+    np.array([3/40, 9/40]),
+    np.array([44/45, -56/15, 32/9]),
+    np.array([19372/6561, -25360/2187, 64448/6561, -212/729]),
+    np.array([9017/3168, -355/33, 46732/5247, 49/176, -5103/18656]),
+]
+DOPRI_B = np.array([35/384, 0, 500/1113, 125/192, -2187/6784, 11/84])
+DOPRI_E = np.array([-71/57600, 0, 71/16695, -71/1920, 17253/339200, -22/525, 1/40])
+
+def batch_muscle_group(thigh_offsets, parameters=None):
+    """
+    Builds the quadricep muscle group for a batch of thigh offsets.
+
+    :param thigh_offsets: (B,) initial offset angles of thigh in radians
+    :param parameters: optional KickParameters with the maximum forces and
+        muscle/tendon percentages, scalars or one per trajectory
+    :return muscles: MuscleGroup with (B, 4) scale factors
+    """
+
+    if parameters is None:
+        max_forces, muscle_percents, tendon_percents = \
+            MAX_FORCES, MUSCLE_PERCENTS, TENDON_PERCENTS
+    else:
+        max_forces = parameters.muscle_values('max_force')
+        muscle_percents = parameters.muscle_values('muscle_percent')
+        tendon_percents = parameters.muscle_values('tendon_percent')
+
+    rest_quad_muscle_length = quad_muscle_length(QUAD_REST_ANGLE, thigh_offsets)[:, np.newaxis]
+    shape = (len(thigh_offsets), len(MAX_FORCES))
+
+    return MuscleGroup(
+        np.broadcast_to(max_forces, shape),
+        np.broadcast_to(muscle_percents*rest_quad_muscle_length, shape),
+        np.broadcast_to(tendon_percents*rest_quad_muscle_length, shape))
+
+
+def _rk4_step(f, t, y, dt):
+    """
+    Classic fourth-order Runge-Kutta step, returns the new state and a zero
+    error norm for every trajectory (fixed steps are always accepted).
+    """
+
+    k1 = f(t, y)
+    k2 = f(t + dt/2, y + dt/2*k1)
+    k3 = f(t + dt/2, y + dt/2*k2)
+    k4 = f(t + dt, y + dt*k3)
+
+    y_new = y + dt/6*(k1 + 2*k2 + 2*k3 + k4)
+
+    return y_new, np.zeros(len(y_new))
+
+
+def _dopri_step(f, t, y, dt, rtol, atol):
+    """
+    Dormand-Prince 5(4) step over the whole batch, returns the new state and
+    the scaled error norm of each trajectory (accept if <= 1).
+    """
+
+    K = [f(t, y)]
+    for c, a in zip(DOPRI_C[1:], DOPRI_A[1:]):
+        K.append(f(t + c*dt, y + dt*np.tensordot(a, K, axes=1)))
+    y_new = y + dt*np.tensordot(DOPRI_B, K, axes=1)
+    K.append(f(t + dt, y_new))
+
+    scale = atol + rtol*np.maximum(np.abs(y), np.abs(y_new))
+    error = dt*np.tensordot(DOPRI_E, K, axes=1)/scale
+    error_norm = np.sqrt(np.mean(error**2, axis=-1))
+
+    return y_new, error_norm
+
+
+def _take(value, index):
+    """
+    Subset of a per-trajectory array; scalars and None are shared.
+    """
+
+    return value if value is None or np.ndim(value) == 0 else value[index]
+
+
+def batch_simulate(T, initial_conditions, thigh_offsets, activations,
+                   force_length_regression, force_velocity_regression,
+                   method='RK45', dt=None, rtol=RTOL, atol=ATOL,
+                   output_points=OUTPUT_POINTS, tables=None, moment_arm=QUAD_MOMENT_ARM,
+                   parameters=None):
+    """
+    Runs B simulations of the model in lockstep. The (B, 6) state array is
+    advanced with a vectorized Runge-Kutta scheme, so the interpreter
+    overhead of every step is shared by the whole batch. The default
+    adaptive Dormand-Prince 5(4) scheme uses one step size for the batch,
+    controlled by the worst trajectory; the tendon stiffness limits explicit
+    steps to roughly 5e-5 s near full activation, which the adaptive scheme
+    finds by itself. The fixed-step RK4 scheme is cheaper per step but is
+    only stable if dt is below that limit.
+
+    Each trajectory is integrated until its knee angle leaves [0, pi] (the
+    same validity range simulate() truncates to) or until T; finished
+    trajectories are dropped from the batch so later steps only pay for the
+    ones still running. The state at the boundary crossing is interpolated
+    within the last step, and its velocity counts towards max_velocity. A
+    trajectory whose state or error becomes non-finite (e.g. from NaN
+    activations) is dropped as well, with NaN max velocity and end time.
+
+    :param T: total time to simulate, in seconds
+    :param initial_conditions: (B, 6) initial states of thigh and muscles
+    :param thigh_offsets: (B,) initial offset angles of thigh in radians
+    :param activations: (B, 4) constant muscle activations, or a function
+        mapping time to a (B, 4) array of activations
+    :param force_length_regression: function that regresses force from length
+    :param force_velocity_regression: function that regresses force from velocity
+    :param method: 'RK45' (adaptive Dormand-Prince) or 'RK4' (fixed step)
+    :param dt: time step for 'RK4' (TIME_STEP by default), initial time step
+        for 'RK45' (INITIAL_TIME_STEP by default), in seconds
+    :param rtol: relative tolerance for 'RK45'
+    :param atol: absolute tolerance for 'RK45'
+    :param output_points: number of evenly spaced output samples over [0, T]
+    :param tables: optional MuscleTables for tabulated mode
+    :param moment_arm: constant moment arm of the quadricep in meters, or
+        None to use the angle-dependent moment arm of the muscle path
+    :param parameters: optional KickParameters, scalars or (B,) arrays with
+        one parameter set per trajectory; a constant moment arm then comes
+        from its quad_moment_arm
+    :return results: dictionary with the output times, (output_points, B)
+        theta and foot velocity samples (NaN once a trajectory has ended),
+        (B,) max velocities, (B,) end times of each trajectory and the
+        number of accepted and rejected steps
+    """
+
+    if method not in ('RK45', 'RK4'):
+        raise ValueError("method must be 'RK45' or 'RK4', got %r" % (method,))
+    if dt is None:
+        dt = TIME_STEP if method == 'RK4' else INITIAL_TIME_STEP
+
+    x = np.array(initial_conditions, dtype=float)
+    thigh_offsets = np.broadcast_to(
+        np.asarray(thigh_offsets, dtype=float), (x.shape[0],)).copy()
+    batch_size = x.shape[0]
+
+    n_muscles = x.shape[1] - 2
+    if callable(activations):
+        get_activations = lambda t: np.broadcast_to(
+            np.asarray(activations(t), dtype=float), (batch_size, n_muscles))
+    else:
+        constant_activations = np.broadcast_to(
+            np.asarray(activations, dtype=float), (batch_size, n_muscles))
+        get_activations = lambda t: constant_activations
+
+    muscles = batch_muscle_group(thigh_offsets, parameters)
+    if parameters is None:
+        shank_length = np.full(batch_size, SHANK_LENGTH)
+    else:
+        shank_length = np.broadcast_to(parameters.shank_length, (batch_size,))
+        if moment_arm is not None:
+            moment_arm = np.broadcast_to(parameters.quad_moment_arm, (batch_size,))
+
+    time = np.linspace(0, T, output_points)
+    theta = np.full((output_points, batch_size), np.nan)
+    velocity = np.full((output_points, batch_size), np.nan)
+    max_velocity = np.full(batch_size, np.nan)
+    end_time = np.full(batch_size, float(T))
+
+    # trajectories that start outside [0, pi] are never integrated
+    index = np.flatnonzero((x[:, 0] >= 0) & (x[:, 0] <= np.pi))
+    end_time[np.setdiff1d(np.arange(batch_size), index)] = 0
+    max_velocity[index] = shank_length[index]*x[index, 1]
+    group = muscles.take(index)
+    offsets = thigh_offsets[index]
+    arms = _take(moment_arm, index)
+    body = None if parameters is None else parameters.take(index)
+    state = x[index]
+
+    # the last CE velocities solved for warm start the next solve
+    muscle_velocity = None
+
+    def f(t, y):
+        nonlocal muscle_velocity
+        y_dot = dynamics(y, offsets, group, get_activations(t)[index],
+                         force_length_regression, force_velocity_regression,
+                         tables=tables, moment_arm=arms, parameters=body,
+                         vm0=muscle_velocity)
+        muscle_velocity = y_dot[:, 2:]
+
+        return y_dot
+
+    def drop(finished):
+        """
+        Removes finished trajectories from the batch.
+        """
+
+        nonlocal index, offsets, group, muscle_velocity, arms, body, state
+        running = ~finished
+        index = index[running]
+        offsets = offsets[running]
+        group = group.take(running)
+        muscle_velocity = None if muscle_velocity is None else muscle_velocity[running]
+        arms = _take(arms, running)
+        body = None if body is None else body.take(running)
+        state = state[running]
+
+    t = 0.0
+    h = dt
+    output = 0
+    accepted = 0
+    rejected = 0
+    while len(index) > 0:
+        while output < output_points and time[output] <= t*(1 + 1e-12):
+            theta[output, index] = state[:, 0]
+            velocity[output, index] = shank_length[index]*state[:, 1]
+            output += 1
+
+        if output == output_points:
+            break
+
+        # steps end exactly on the output samples
+        step = min(h, time[output] - t)
+        if step < 1e-12*T:
+            raise RuntimeError('step size underflow at t = %g' % t)
+        if method == 'RK4':
+            new_state, error = _rk4_step(f, t, state, step)
+        else:
+            new_state, error = _dopri_step(f, t, state, step, rtol, atol)
+
+        # a diverged trajectory would make every step size rejected, so it
+        # is dropped and the step is retried without it
+        diverged = ~(np.isfinite(error) & np.isfinite(new_state).all(axis=1))
+        if diverged.any():
+            max_velocity[index[diverged]] = np.nan
+            end_time[index[diverged]] = np.nan
+            drop(diverged)
+            continue
+
+        if method == 'RK45':
+            error = np.max(error, initial=0)
+            h = step*min(10, max(0.2, 0.9*error**-0.2)) if error > 0 else step*10
+            if error > 1:
+                rejected += 1
+                continue
+        accepted += 1
+
+        # trajectories whose knee left [0, pi] keep their last valid state,
+        # and end where the angle crosses the boundary, with the velocity
+        # interpolated there
+        valid = (new_state[:, 0] >= 0) & (new_state[:, 0] <= np.pi)
+        if not valid.all():
+            old_state = state[~valid]
+            crossed = new_state[~valid]
+            boundary = np.where(crossed[:, 0] > np.pi, np.pi, 0)
+            fraction = (boundary - old_state[:, 0])/(crossed[:, 0] - old_state[:, 0])
+            ended = index[~valid]
+            end_time[ended] = t + step*fraction
+            crossing_velocity = shank_length[ended]*(
+                old_state[:, 1] + fraction*(crossed[:, 1] - old_state[:, 1]))
+            max_velocity[ended] = np.maximum(max_velocity[ended], crossing_velocity)
+            drop(~valid)
+            new_state = new_state[valid]
+
+        t += step
+        state = new_state
+        max_velocity[index] = np.maximum(max_velocity[index], shank_length[index]*state[:, 1])
+
+    return {
+        "max_velocity" : max_velocity,
+        "time" : time,
+        "theta" : theta,
+        "velocity": velocity,
+        "end_time": end_time,
+        "accepted_steps": accepted,
+        "rejected_steps": rejected,
+    }
@@ -0,0 +1,330 @@
+import hashlib
+import json
+import os
+import socket
+import tempfile
+import threading
+import time
+import traceback
+import uuid
+
+from .result_cache import CACHE_VERSION, activation_descriptor, load_result, save_result
+
+CLAIM_TIMEOUT = 600  # seconds without a heartbeat after which a claim is considered abandoned
+HEARTBEAT_INTERVAL = 60  # seconds between refreshes of the claims of running points
+RESULTS_DIRECTORY = 'results'
+FAILURES_DIRECTORY = 'failures'
+CLAIMS_DIRECTORY = 'claims'
+
+def point_key(T, point):
+    """
+    Returns the content hash identifying a sweep point, so a checkpoint
+    directory can be shared by several sweeps and a point is recognised
+    however the sweep that contains it is ordered.
+
+    :param T: total time to simulate, in seconds
+    :param point: dictionary of sweep parameters
+    :return key: hex digest
+    """
+
+    description = {}
+    for name, value in point.items():
+        if callable(value):
+            value = activation_descriptor(value)
+            if value is None:
+                raise ValueError('sweep parameter %r cannot be checkpointed, use an '
+                                 'activation profile instead of a plain function' % name)
+        else:
+            value = float(value)
+        description[name] = value
+
+    description = json.dumps({'version': CACHE_VERSION, 'T': float(T), 'point': description},
+                             sort_keys=True)
+
+    return hashlib.sha256(description.encode()).hexdigest()
+
+
+def _process_start_time(pid):
+    """
+    Start time of a process, in clock ticks since boot, which tells it apart
+    from a later process that reuses its pid.
+
+    :param pid: process id
+    :return start: start time, or None if the process does not exist or
+        /proc is unavailable
+    """
+
+    try:
+        with open('/proc/%d/stat' % pid) as file:
+            stat = file.read()
+    except (OSError, TypeError):
+        return None
+    # the process name, in parentheses, may itself contain spaces; the
+    # start time is the 22nd field and the 20th after the name
+    return int(stat[stat.rindex(')') + 2:].split()[19])
+
+
+def _write_json(path, record):
+    """
+    Writes a JSON record to a temporary file and atomically renames it.
+    """
+
+    descriptor, temporary = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(descriptor, 'w') as file:
+            json.dump(record, file, indent=2)
+        os.replace(temporary, path)
+    except BaseException:
+        os.remove(temporary)
+        raise
+
+
+class SweepCheckpoint:
+    """
+    Directory recording the progress of sweeps, shared by any number of
+    processes, on one machine or on several with a shared file system.
+    Every point is identified by its point_key and goes through three
+    files: a claim, created exclusively by the process that simulates the
+    point so no two processes run it at once; then either its result, saved
+    like a result cache entry, or a failure record with the error and
+    traceback. Results and failure records are written atomically, and the
+    claim is removed once they exist.
+
+    A process that dies leaves its claims behind. While a point runs, its
+    claim is touched every heartbeat_interval; a claim is abandoned once it
+    has gone claim_timeout without a heartbeat, or, on the host that made
+    it, as soon as its process is gone. The claim records the start time of
+    the process next to its pid, so a later process that reuses the pid
+    does not keep a dead claim alive. Abandoned claims are taken over by
+    the next process that needs the point.
+    """
+
+    def __init__(self, directory, claim_timeout=CLAIM_TIMEOUT,
+                 heartbeat_interval=HEARTBEAT_INTERVAL):
+
+        self.directory = directory
+        self.claim_timeout = claim_timeout
+        self.heartbeat_interval = heartbeat_interval
+        for name in (RESULTS_DIRECTORY, FAILURES_DIRECTORY, CLAIMS_DIRECTORY):
+            os.makedirs(os.path.join(directory, name), exist_ok=True)
+
+    def result_path(self, key):
+        """
+        Location of the result file of a point.
+        """
+
+        return os.path.join(self.directory, RESULTS_DIRECTORY, key + '.npz')
+
+    def failure_path(self, key):
+        """
+        Location of the failure file of a point.
+        """
+
+        return os.path.join(self.directory, FAILURES_DIRECTORY, key + '.json')
+
+    def claim_path(self, key):
+        """
+        Location of the claim file of a point.
+        """
+
+        return os.path.join(self.directory, CLAIMS_DIRECTORY, key + '.json')
+
+    def completed(self, key):
+        """
+        Whether the result of a point is checkpointed.
+        """
+
+        return os.path.exists(self.result_path(key))
+
+    def failed(self, key):
+        """
+        Whether a point has a failure record.
+        """
+
+        return os.path.exists(self.failure_path(key))
+
+    def finished(self, key):
+        """
+        Whether a point needs no more work, because it completed or failed.
+        """
+
+        return self.completed(key) or self.failed(key)
+
+    def load(self, key):
+        """
+        Loads the checkpointed result of a point.
+
+        :param key: point key
+        :return result: SimulationResult, or None if the point did not complete
+        """
+
+        try:
+            return load_result(self.result_path(key))
+        except FileNotFoundError:
+            return None
+
+    def failure(self, key):
+        """
+        Failure record of a point.
+
+        :param key: point key
+        :return record: dictionary with the parameters, error and traceback
+            of the point, or None if it did not fail
+        """
+
+        try:
+            with open(self.failure_path(key)) as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return None
+
+    def failures(self):
+        """
+        Failure records of every failed point in the directory.
+
+        :return records: dictionary of failure records keyed by point key
+        """
+
+        directory = os.path.join(self.directory, FAILURES_DIRECTORY)
+        keys = [name[:-len('.json')] for name in os.listdir(directory) if name.endswith('.json')]
+
+        return {key: record for key in sorted(keys)
+                for record in [self.failure(key)] if record is not None}
+
+    def clear_failure(self, key):
+        """
+        Removes the failure record of a point, so it is simulated again.
+        """
+
+        try:
+            os.remove(self.failure_path(key))
+        except FileNotFoundError:
+            pass
+
+    def claim(self, key):
+        """
+        Claims a point for this process, taking over an abandoned claim.
+
+        :param key: point key
+        :return claimed: True if this process now owns the point
+        """
+
+        path = self.claim_path(key)
+        for _ in range(2):
+            try:
+                descriptor = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                if not self._abandoned(path):
+                    return False
+                # renaming is atomic, so only one process takes the claim over;
+                # at worst a point is simulated twice, with the same result
+                abandoned = '%s.%d-%s.abandoned' % (path, os.getpid(), uuid.uuid4().hex[:8])
+                try:
+                    os.rename(path, abandoned)
+                except FileNotFoundError:
+                    return False
+                os.remove(abandoned)
+                continue
+
+            with os.fdopen(descriptor, 'w') as file:
+                json.dump({'host': socket.gethostname(), 'pid': os.getpid(),
+                           'started': _process_start_time(os.getpid()),
+                           'time': time.time()}, file)
+            return True
+
+        return False
+
+    def heartbeat(self, key):
+        """
+        Keeps the claim of a point alive while it is simulated, by touching
+        the claim file every heartbeat_interval from a background thread.
+
+        :param key: point key
+        :return stop: function stopping the heartbeat
+        """
+
+        path = self.claim_path(key)
+        stopped = threading.Event()
+
+        def beat():
+            while not stopped.wait(self.heartbeat_interval):
+                try:
+                    os.utime(path)
+                except FileNotFoundError:
+                    return
+
+        threading.Thread(target=beat, daemon=True).start()
+
+        return stopped.set
+
+    def _abandoned(self, path):
+        """
+        Whether a claim was left behind by a process that died.
+        """
+
+        try:
+            age = time.time() - os.path.getmtime(path)
+            with open(path) as file:
+                claim = json.load(file)
+        except FileNotFoundError:
+            return False
+        except ValueError:
+            # still being written, or cut short by a crash
+            claim = {}
+
+        if claim.get('host') == socket.gethostname() and isinstance(claim.get('pid'), int):
+            try:
+                os.kill(claim['pid'], 0)
+            except ProcessLookupError:
+                return True
+            except PermissionError:
+                pass
+            started = claim.get('started')
+            if started is not None and _process_start_time(claim['pid']) != started:
+                # the pid now belongs to another process
+                return True
+
+        return age > self.claim_timeout
+
+    def release(self, key):
+        """
+        Removes the claim of a point without recording an outcome.
+        """
+
+        try:
+            os.remove(self.claim_path(key))
+        except FileNotFoundError:
+            pass
+
+    def complete(self, key, result):
+        """
+        Checkpoints the result of a claimed point and releases it.
+
+        :param key: point key
+        :param result: SimulationResult of the point
+        """
+
+        save_result(self.result_path(key), result)
+        self.clear_failure(key)
+        self.release(key)
+
+    def fail(self, key, point, error):
+        """
+        Records the failure of a claimed point and releases it.
+
+        :param key: point key
+        :param point: dictionary of sweep parameters
+        :param error: exception raised by the simulation
+        """
+
+        _write_json(self.failure_path(key), {
+            'parameters': {name: activation_descriptor(value) if callable(value) else float(value)
+                           for name, value in point.items()},
+            'error': '%s: %s' % (type(error).__name__, error),
+            'traceback': ''.join(traceback.format_exception(type(error), error,
+                                                            error.__traceback__)),
+            'host': socket.gethostname(),
+            'pid': os.getpid(),
+            'time': time.time(),
+        })
+        self.release(key)
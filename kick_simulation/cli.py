@@ -0,0 +1,292 @@
+"""
+Command line tool that runs named sweeps from a configuration file.
+
+    kick-simulation list sweeps.json
+    kick-simulation run sweeps.json sweep_final --workers 4 --output final.json
+    kick-simulation run sweeps.json sweep_final --checkpoint-dir checkpoints
+
+The configuration is JSON (or TOML, for a .toml file) with a "sweeps" table
+of named sweeps. Every sweep has a simulation time "T" and either a "grid"
+of parameter values expanded by parameter_grid, a list of "points", or the
+"ranges" (and "fixed" values) of an adaptive sweep:
+
+    {"sweeps": {
+        "sweep_final": {
+            "T": 1,
+            "grid": {"initial_theta": [0, "pi/6", "pi/4"],
+                     "thigh_offset": ["-pi/12", 0, "pi/6", "pi/4"]}},
+        "sweep_initial_theta": {
+            "T": 1,
+            "ranges": {"initial_theta": [0, "pi"]},
+            "fixed": {"thigh_offset": "pi/6"},
+            "budget": 17}}}
+
+Angles may be written as multiples of pi ("pi/6", "-2*pi/3"). An activation
+is a constant level, or a table naming an activation profile and its
+arguments, e.g. {"type": "CosineActivation", "duration": 1}. A sweep may
+also set run_sweep options (workers, chunksize, cache_dir, store_dir,
+checkpoint_dir), which the command line options override.
+
+With a checkpoint directory, rerunning an interrupted command skips the
+points that already finished, and several processes or machines started
+on a shared directory split the points between them. Points whose
+simulation fails are reported and recorded in the checkpoint instead of
+stopping the sweep.
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+
+ACTIVATION_PARAMETERS = ('femoris_activation', 'lateralis_activation',
+                         'medialis_activation', 'intermedius_activation')
+SWEEP_OPTIONS = ('workers', 'chunksize', 'cache_dir', 'store_dir', 'checkpoint_dir')
+ADAPTIVE_OPTIONS = ('initial_divisions', 'budget', 'tolerance', 'max_depth')
+PI_EXPRESSION = re.compile(r'^\s*(-)?\s*(\d*\.?\d*)\s*\*?\s*pi\s*(?:/\s*(\d*\.?\d+))?\s*$')
+
+def load_config(path):
+    """
+    Reads a sweep configuration file.
+
+    :param path: path of a .json or .toml file
+    :return config: dictionary with a 'sweeps' table
+    """
+
+    if path.endswith('.toml'):
+        try:
+            import tomllib
+        except ImportError:
+            # tomllib is only in the standard library from Python 3.11
+            import tomli as tomllib
+        with open(path, 'rb') as file:
+            config = tomllib.load(file)
+    else:
+        with open(path) as file:
+            config = json.load(file)
+
+    if not isinstance(config.get('sweeps'), dict) or not config['sweeps']:
+        raise ValueError('%s defines no sweeps, expected a "sweeps" table' % path)
+
+    return config
+
+
+def parse_number(value):
+    """
+    Number from a configuration value, which may be a multiple of pi.
+
+    :param value: number, or string such as 'pi/6' or '-2*pi/3'
+    :return number: float value
+    """
+
+    if not isinstance(value, str):
+        return float(value)
+
+    match = PI_EXPRESSION.match(value)
+    if match is None:
+        return float(value)
+
+    import math
+
+    sign, factor, divisor = match.groups()
+    number = float(factor or 1)*math.pi/float(divisor or 1)
+
+    return -number if sign else number
+
+
+def parse_activation(value):
+    """
+    Activation profile from a configuration value.
+
+    :param value: constant level, or dictionary with the 'type' of an
+        activation profile and its keyword arguments
+    :return profile: ActivationProfile
+    """
+
+    from . import activation
+
+    if not isinstance(value, dict):
+        return activation.ConstantActivation(parse_number(value))
+
+    arguments = dict(value)
+    name = arguments.pop('type', None)
+    if 'excitation' in arguments:
+        # the excitation of ExcitationDynamicsActivation is a profile too
+        arguments['excitation'] = parse_activation(arguments['excitation'])
+    profile = getattr(activation, str(name), None)
+    if not (isinstance(profile, type) and issubclass(profile, activation.ActivationProfile)):
+        raise ValueError('unknown activation profile %r' % (name,))
+
+    return profile(**arguments)
+
+
+def parse_value(name, value):
+    """
+    Sweep parameter from a configuration value.
+    """
+
+    if name in ACTIVATION_PARAMETERS:
+        return parse_activation(value)
+
+    return parse_number(value)
+
+
+def run_named_sweep(name, spec, progress=True, instrument=False, **options):
+    """
+    Runs one sweep of a configuration.
+
+    :param name: name of the sweep, for error messages
+    :param spec: the sweep's table from the configuration
+    :param progress: show a progress bar
+    :param instrument: record instrumentation reports of the runs
+    :param options: run_sweep options overriding those of the sweep
+    :return points: sweep points, in the order they were simulated
+    :return results: list of SimulationResult, one per point (None for
+        points that failed in a checkpointed sweep)
+    """
+
+    from .sweep import parameter_grid, run_sweep, adaptive_sweep
+
+    if 'T' not in spec:
+        raise ValueError('sweep %r has no simulation time T' % name)
+    kinds = [kind for kind in ('grid', 'points', 'ranges') if kind in spec]
+    if len(kinds) != 1:
+        raise ValueError('sweep %r needs exactly one of grid, points and ranges' % name)
+
+    sweep_options = {option: spec[option] for option in SWEEP_OPTIONS if option in spec}
+    sweep_options.update({option: value for option, value in options.items()
+                          if value is not None})
+    sweep_options.update(progress=progress, instrument=instrument)
+    T = parse_number(spec['T'])
+
+    if 'ranges' in spec:
+        ranges = {parameter: tuple(parse_number(bound) for bound in bounds)
+                  for parameter, bounds in spec['ranges'].items()}
+        fixed = {parameter: parse_value(parameter, value)
+                 for parameter, value in spec.get('fixed', {}).items()}
+        adaptive_options = {option: spec[option] for option in ADAPTIVE_OPTIONS
+                            if option in spec}
+        return adaptive_sweep(T, ranges, fixed, **adaptive_options, **sweep_options)
+
+    if 'grid' in spec:
+        points = parameter_grid(**{parameter: [parse_value(parameter, value) for value in values]
+                                   for parameter, values in spec['grid'].items()})
+    else:
+        points = [{parameter: parse_value(parameter, value) for parameter, value in point.items()}
+                  for point in spec['points']]
+
+    return points, run_sweep(T, points, **sweep_options)
+
+
+def _describe(point):
+    """
+    JSON-serializable form of a sweep point.
+    """
+
+    from .result_cache import activation_descriptor
+
+    return {name: activation_descriptor(value) if name in ACTIVATION_PARAMETERS else float(value)
+            for name, value in point.items()}
+
+
+def _summary(points, results):
+    """
+    Per-point records of a sweep, for printing and for the output file.
+    """
+
+    return [dict(parameters=_describe(point), max_velocity=None, failed=True)
+            if result is None else
+            dict(parameters=_describe(point), max_velocity=float(result.max_velocity),
+                 termination=result.termination, termination_time=result.termination_time)
+            for point, result in zip(points, results)]
+
+
+def _list(args):
+    config = load_config(args.config)
+    for name, spec in config['sweeps'].items():
+        kind = next((kind for kind in ('grid', 'points', 'ranges') if kind in spec), '?')
+        print('%-30s T=%-6s %s' % (name, spec.get('T'), kind))
+
+    return 0
+
+
+def _run(args):
+    config = load_config(args.config)
+    names = args.sweeps or list(config['sweeps'])
+    unknown = [name for name in names if name not in config['sweeps']]
+    if unknown:
+        print('unknown sweeps: %s (defined: %s)' % (', '.join(unknown),
+              ', '.join(config['sweeps'])), file=sys.stderr)
+        return 2
+
+    output = {}
+    for name in names:
+        points, results = run_named_sweep(
+            name, config['sweeps'][name], progress=not args.quiet, instrument=args.instrument,
+            workers=args.workers, cache_dir=args.cache_dir,
+            store_dir=None if args.store_dir is None else os.path.join(args.store_dir, name),
+            checkpoint_dir=None if args.checkpoint_dir is None
+                           else os.path.join(args.checkpoint_dir, name),
+            retry_failed=args.retry_failed or None)
+        records = _summary(points, results)
+        output[name] = records
+
+        completed = [record for record in records if record['max_velocity'] is not None]
+        failed = len(records) - len(completed)
+        if completed:
+            best = max(completed, key=lambda record: record['max_velocity'])
+            print('%s: %d simulations, best max velocity %.4f m/s at %s'
+                  % (name, len(records), best['max_velocity'],
+                     ', '.join('%s=%s' % item for item in best['parameters'].items())))
+        if failed:
+            print('%s: %d of %d simulations failed, rerun with --retry-failed to try them again'
+                  % (name, failed, len(records)), file=sys.stderr)
+
+        if args.instrument:
+            from .instrumentation import merge_reports
+            report = merge_reports(result.instrumentation for result in results
+                                   if result is not None)
+            print(json.dumps(None if report is None else report.as_dict(), indent=2))
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(output, file, indent=2)
+
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='kick-simulation',
+                                     description='Run kick simulation sweeps')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    list_parser = commands.add_parser('list', help='list the sweeps of a configuration')
+    list_parser.add_argument('config', help='JSON or TOML sweep configuration')
+    list_parser.set_defaults(command=_list)
+
+    run_parser = commands.add_parser('run', help='run sweeps of a configuration')
+    run_parser.add_argument('config', help='JSON or TOML sweep configuration')
+    run_parser.add_argument('sweeps', nargs='*', help='names of the sweeps to run (default: all)')
+    run_parser.add_argument('--workers', type=int, help='number of worker processes')
+    run_parser.add_argument('--cache-dir', help='directory of a shared result cache')
+    run_parser.add_argument('--store-dir',
+                            help='directory to store full trajectories in, one store per sweep')
+    run_parser.add_argument('--checkpoint-dir',
+                            help='directory to checkpoint finished points in, one per sweep; '
+                                 'reruns resume from it and may run on several machines')
+    run_parser.add_argument('--retry-failed', action='store_true',
+                            help='simulate points recorded as failed in the checkpoint again')
+    run_parser.add_argument('--output', help='JSON file to write the per-point results to')
+    run_parser.add_argument('--instrument', action='store_true',
+                            help='print an instrumentation report of each sweep')
+    run_parser.add_argument('--quiet', action='store_true', help='hide progress bars')
+    run_parser.set_defaults(command=_run)
+
+    args = parser.parse_args(argv)
+
+    return args.command(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,280 @@
+import math
+
+import numpy as np
+
+from .activation import ActivationPattern
+from .geometry import QUAD_SHANK_INSERTION, KNEE_ORIGIN, THIGH_LENGTH, PHI, _path_terms
+from .gravity_moment import SHANK_MASS, COM_DIST
+from .dynamics import KNEE_INERTIA, QUAD_MOMENT_ARM
+from .batch_simulate import batch_muscle_group
+from .simulate import SHANK_LENGTH, SimulationResult
+from .muscle_modelling.get_velocity import BETA, VELOCITY_TOLERANCE, MAX_ITERATIONS
+from .muscle_modelling.model_eval import as_force_velocity_model
+from .muscle_modelling.regression import get_muscle_force_length_regression, \
+                       get_muscle_force_velocity_regression
+
+# numba is optional: without it the kernels are left uncompiled (so this
+# module still imports) and run_compiled refuses to run, since the
+# fixed-step kernel is far slower than run_simulation as plain Python
+try:
+    import numba
+    NUMBA_AVAILABLE = True
+except ImportError:
+    numba = None
+    NUMBA_AVAILABLE = False
+
+# explicit RK4 is only stable below roughly 5e-5 s near full activation
+TIME_STEP = 2e-5
+OUTPUT_POINTS = 100
+GRAVITY = 9.81
+
+def _jit(function):
+    """
+    Compiles a kernel in nopython mode when numba is installed, and returns
+    it unchanged otherwise.
+    """
+
+    if NUMBA_AVAILABLE:
+        return numba.njit(cache=True)(function)
+
+    return function
+
+
+@_jit
+def _force_velocity(vm, coefficients, centres, width):
+    """
+    Force-velocity scale factor and its slope at a single velocity.
+    """
+
+    value = coefficients[0]
+    slope = 0.0
+    for i in range(len(centres)):
+        s = 1.0/(1.0 + math.exp(-(vm - centres[i])/width))
+        value += coefficients[i + 1]*s
+        slope += coefficients[i + 1]*s*(1.0 - s)/width
+
+    return value, slope
+
+
+@_jit
+def _solve_velocity(active_force, required_force, vm0, coefficients, centres, width,
+                    fv_min, fv_max):
+    """
+    Scalar version of get_velocity.solve_velocity: safeguarded Newton steps
+    inside the bracket given by the bounds of fv.
+    """
+
+    lower = (required_force - max(active_force*fv_min, active_force*fv_max))/BETA
+    upper = (required_force - min(active_force*fv_min, active_force*fv_max))/BETA
+    vm = min(max(vm0, lower), upper)
+
+    for _ in range(MAX_ITERATIONS):
+        fv, fv_slope = _force_velocity(vm, coefficients, centres, width)
+        residual = active_force*fv + BETA*vm - required_force
+        slope = active_force*fv_slope + BETA
+
+        if residual < 0:
+            lower = vm
+        elif residual > 0:
+            upper = vm
+        if abs(residual) <= VELOCITY_TOLERANCE or upper - lower <= VELOCITY_TOLERANCE:
+            break
+
+        newton = vm - residual/slope if slope > 0 else lower
+        if newton > lower and newton < upper:
+            vm = newton
+        else:
+            vm = 0.5*(lower + upper)
+
+    return vm
+
+
+@_jit
+def _rhs(x, thigh_offset, activations, f0M, resting_length_muscle, resting_length_tendon,
+         force_length_parameters, coefficients, centres, width, fv_min, fv_max,
+         path_offset, path_amplitude, path_phase, path_moment_arm, moment_arm,
+         velocity, x_dot):
+    """
+    Time-derivative of the state vector, written into x_dot. velocity holds
+    the CE velocities of the previous call (the warm start of the root
+    solve) and is updated in place. path_moment_arm selects the
+    angle-dependent moment arm of the muscle path instead of moment_arm.
+    """
+
+    theta = x[0]
+    angle = theta + thigh_offset - PHI + path_phase
+    distance = math.sqrt(path_offset - 2*path_amplitude*math.cos(angle))
+    muscle_tendon_length = THIGH_LENGTH + distance
+    arm = moment_arm
+    if path_moment_arm:
+        arm = -path_amplitude*math.sin(angle)/distance
+
+    a, x0, sigma = force_length_parameters[0], force_length_parameters[1], \
+        force_length_parameters[2]
+
+    torque_quad = 0.0
+    for i in range(len(f0M)):
+        lm = x[2 + i]
+        lt = (muscle_tendon_length - resting_length_muscle[i]*lm)/resting_length_tendon[i]
+
+        tendon_stretch = max(lt - 1.0, 0.0)
+        tendon_force = 10*tendon_stretch + 240*tendon_stretch**2
+        parallel_stretch = max(lm - 1.0, 0.0)
+        parallel_force = 3*parallel_stretch**2/(0.6 + parallel_stretch)
+        force_length = a*math.exp(-(lm - x0)**2/(2*sigma**2))
+
+        torque_quad += f0M[i]*tendon_force
+        velocity[i] = _solve_velocity(activations[i]*force_length,
+                                      tendon_force - parallel_force, velocity[i],
+                                      coefficients, centres, width, fv_min, fv_max)
+        x_dot[2 + i] = velocity[i]
+
+    torque_gravity = SHANK_MASS*GRAVITY*COM_DIST*math.cos(theta + thigh_offset - math.pi/2)
+
+    x_dot[0] = x[1]
+    x_dot[1] = (torque_quad*arm + torque_gravity)/KNEE_INERTIA
+
+
+@_jit
+def _integrate(x0, thigh_offset, activations, dt, n_steps, output_steps,
+               f0M, resting_length_muscle, resting_length_tendon,
+               force_length_parameters, coefficients, centres, width, fv_min, fv_max,
+               path_offset, path_amplitude, path_phase, path_moment_arm, moment_arm):
+    """
+    Fixed-step RK4 loop. activations holds the activations sampled every
+    half step, (2*n_steps + 1, N). Integration stops when the knee leaves
+    [0, pi]; the crossing time is interpolated linearly within the step.
+
+    Returns the state at each of output_steps (NaN after the end), the
+    maximum angular velocity, the end time and the termination status
+    (0 for none, 1 for full extension, 2 for full flexion).
+    """
+
+    n = len(x0)
+    states = np.full((len(output_steps), n), np.nan)
+    velocity = np.zeros(n - 2)
+
+    x = x0.copy()
+    k1 = np.empty(n)
+    k2 = np.empty(n)
+    k3 = np.empty(n)
+    k4 = np.empty(n)
+
+    max_omega = x[1]
+    end_time = n_steps*dt
+    status = 0
+    output = 0
+
+    for step in range(n_steps + 1):
+        while output < len(output_steps) and output_steps[output] == step:
+            states[output] = x
+            output += 1
+        if step == n_steps:
+            break
+
+        _rhs(x, thigh_offset, activations[2*step], f0M, resting_length_muscle,
+             resting_length_tendon, force_length_parameters, coefficients, centres, width,
+             fv_min, fv_max, path_offset, path_amplitude, path_phase, path_moment_arm,
+             moment_arm, velocity, k1)
+        _rhs(x + dt/2*k1, thigh_offset, activations[2*step + 1], f0M, resting_length_muscle,
+             resting_length_tendon, force_length_parameters, coefficients, centres, width,
+             fv_min, fv_max, path_offset, path_amplitude, path_phase, path_moment_arm,
+             moment_arm, velocity, k2)
+        _rhs(x + dt/2*k2, thigh_offset, activations[2*step + 1], f0M, resting_length_muscle,
+             resting_length_tendon, force_length_parameters, coefficients, centres, width,
+             fv_min, fv_max, path_offset, path_amplitude, path_phase, path_moment_arm,
+             moment_arm, velocity, k3)
+        _rhs(x + dt*k3, thigh_offset, activations[2*step + 2], f0M, resting_length_muscle,
+             resting_length_tendon, force_length_parameters, coefficients, centres, width,
+             fv_min, fv_max, path_offset, path_amplitude, path_phase, path_moment_arm,
+             moment_arm, velocity, k4)
+        x_new = x + dt/6*(k1 + 2*k2 + 2*k3 + k4)
+
+        if x_new[0] > math.pi or x_new[0] < 0:
+            boundary = math.pi if x_new[0] > math.pi else 0.0
+            end_time = (step + (boundary - x[0])/(x_new[0] - x[0]))*dt
+            status = 1 if x_new[0] > math.pi else 2
+            break
+
+        x = x_new
+        max_omega = max(max_omega, x[1])
+
+    return states, max_omega, end_time, status
+
+
+def run_compiled(T, initialCondition, thigh_offset, activations,
+                 force_length_regression=None, force_velocity_regression=None,
+                 dt=TIME_STEP, output_points=OUTPUT_POINTS, moment_arm=QUAD_MOMENT_ARM):
+    """
+    Runs a simulation of the model with the compiled fixed-step RK4 kernel.
+    The whole state derivative, including the root solve for the CE
+    velocities, runs in a single nopython function, so this backend needs
+    numba (see NUMBA_AVAILABLE), installed with the 'compiled' extra. The
+    model matches run_simulation, up to the accuracy of the fixed step.
+
+    :param T: total time to simulate, in seconds
+    :param initialCondition: initial state of thigh and muscles
+    :param thigh_offset: initial offset angle of thigh in radians
+    :param activations: activation functions w.r.t. time, one per muscle;
+        they are sampled every half step before integration
+    :param force_length_regression: gaussian force-length regression from
+        get_muscle_force_length_regression, defaults to the saved fit
+    :param force_velocity_regression: ForceVelocityModel or coefficients,
+        defaults to the saved fit
+    :param dt: time step, in seconds
+    :param output_points: number of evenly spaced output samples over [0, T]
+    :param moment_arm: constant moment arm of the quadricep in meters, or
+        None to use the angle-dependent moment arm of the muscle path
+    :return result: SimulationResult
+    """
+
+    if not NUMBA_AVAILABLE:
+        raise ImportError('run_compiled needs numba, install it with '
+                          '"pip install kick-simulation[compiled]" or use run_simulation')
+
+    if force_length_regression is None:
+        force_length_regression = get_muscle_force_length_regression()
+    force_length_parameters = getattr(force_length_regression, 'parameters', None)
+    if force_length_parameters is None:
+        raise ValueError('the compiled kernel only supports the gaussian force-length '
+                         'regression of get_muscle_force_length_regression')
+    if force_velocity_regression is None:
+        force_velocity_regression = get_muscle_force_velocity_regression()
+    model = as_force_velocity_model(force_velocity_regression)
+    if model.function_type != 'Sigmoid':
+        raise ValueError('the compiled kernel only supports the sigmoid basis')
+    fv_min, fv_max = model.bounds()
+
+    x0 = np.array(initialCondition, dtype=float)
+    if not 0 <= x0[0] <= np.pi:
+        raise ValueError('initial knee angle must lie in [0, pi], got %g' % x0[0])
+
+    n_steps = max(int(np.ceil(T/dt)), 1)
+    dt = T/n_steps
+    output_steps = np.rint(np.linspace(0, n_steps, output_points)).astype(np.int64)
+    samples = np.arange(2*n_steps + 1)*(dt/2)
+    activation_samples = ActivationPattern(activations)(samples)
+
+    muscles = batch_muscle_group(np.array([float(thigh_offset)]))
+    path_offset, path_amplitude, path_phase = _path_terms(QUAD_SHANK_INSERTION, KNEE_ORIGIN)
+
+    states, max_omega, end_time, status = _integrate(
+        x0, float(thigh_offset), activation_samples, dt, n_steps, output_steps,
+        np.ascontiguousarray(muscles.f0M[0]), muscles.resting_length_muscle[0],
+        muscles.resting_length_tendon[0],
+        np.asarray(force_length_parameters, dtype=float), model.coefficients,
+        model.centres, model.width, float(fv_min), float(fv_max),
+        float(path_offset), float(path_amplitude), float(path_phase),
+        moment_arm is None, 0.0 if moment_arm is None else float(moment_arm))
+
+    time = output_steps*dt
+    valid = ~np.isnan(states[:, 0])
+    termination = {0: None, 1: 'extension', 2: 'flexion'}[status]
+
+    return SimulationResult(
+        time[valid], states[valid, 0], SHANK_LENGTH*states[valid, 1],
+        SHANK_LENGTH*max_omega, termination,
+        None if termination is None else end_time,
+        {'method': 'RK4-compiled',
+         'nfev': 4*int(np.ceil(end_time/dt)), 'njev': 0, 'nlu': 0},
+        states[valid, 2:])
@@ -0,0 +1,210 @@
+import numpy as np
+
+from . import instrumentation
+from .gravity_moment import gravity_moment, gravity_moment_derivative, SHANK_MASS, COM_DIST
+from .geometry import musculotendon_geometry, moment_arm_derivative
+from .muscle_modelling.curves import force_length, force_length_slope, \
+                         parallel_stiffness, tendon_force, tendon_stiffness, \
+                         force_velocity, force_velocity_slope
+from .muscle_modelling.get_velocity import get_velocity, BETA
+
+KNEE_INERTIA = 0.195
+QUAD_MOMENT_ARM = 0.039
+
+def dynamics(x, thigh_offset, muscles, activations,
+             force_length_regression, force_velocity_regression,
+             tables=None, moment_arm=QUAD_MOMENT_ARM, parameters=None, vm0=None):
+    """
+    Computes time-derivative of state-vector based on model
+
+    :param x: state vector (ankle angle, 
+                            angular velocity, 
+                            normalized CE length of each of the N muscles),
+              or a (B, 2 + N) array holding B such state vectors
+    :param thigh_offset: initial offset angle of thigh in radians, one per
+        state vector for batched states
+    :param muscles: MuscleGroup object holding the N quadricep muscles, with
+        (B, N) scale factors for batched states
+    :param activations: muscle activations between (0, 1), one per muscle
+        (and per state vector for batched states)
+    :param force_length_regression: regression function for force length
+    :param force_velocity_regression: regression function for for velocity
+    :param tables: optional MuscleTables built from the same regressions,
+        serves the muscle curves and CE velocities from lookup tables
+    :param moment_arm: constant moment arm of the quadricep in meters, or
+        None to use the angle-dependent moment arm of the muscle path
+    :param parameters: optional KickParameters supplying the knee inertia
+        and the shank's mass and centre of mass distance (one per state
+        vector for batched states); the moment arm is passed separately
+    :param vm0: optional initial guess of the CE velocities, e.g. those of
+        the previous evaluation
+    :return x_dot: time-derivate of state vector
+    """
+
+    '''
+    if x[0] > np.pi:
+        print("too high - boundary reached")
+        return x
+
+    if x[0] < 0:
+        print("too low - boundary reached")
+        return x
+    '''
+
+    recorder = instrumentation.recorder
+    if recorder is not None:
+        recorder.rhs()
+
+    x = np.asarray(x, dtype=float)
+    theta = x[..., 0]
+    lm = x[..., 2:]
+
+    # we first obtain the normalized tendon lengths for all muscles
+    # they depend on normalized muscle length and musculotendon length,
+    # which is shared by all quadricep heads
+
+    muscle_tendon_length, muscle_tendon_slope = musculotendon_geometry(theta, thigh_offset)
+    lt = muscles.norm_tendon_length(
+            np.expand_dims(muscle_tendon_length, -1), lm)
+    if moment_arm is None:
+        moment_arm = -muscle_tendon_slope
+    if recorder is not None:
+        recorder.lap('geometry')
+
+    # we calculate torque caused by each muscle as well as gravity
+    # note that f_ext is 0 so that term is not present (0'd out)
+
+    if tables is None:
+        tendon_forces = tendon_force(lt)
+    else:
+        tendon_forces = tables.force_length_tendon(lt)
+    if recorder is not None:
+        recorder.lap('curves')
+
+    torque_quad = np.sum(muscles.f0M*tendon_forces, axis=-1)*moment_arm
+    inertia, mass, centre_of_mass_distance = _body_parameters(parameters)
+    torque_gravity = gravity_moment(theta, thigh_offset, mass, centre_of_mass_distance)
+    if recorder is not None:
+        recorder.lap('gravity')
+
+    # once we have torques, x_dot[1] is easy to calculate and the rest are
+    # implemented in accordance to what is present in the lectures
+
+    x_dot = np.empty_like(x)
+    x_dot[..., 0] = x[..., 1]
+    x_dot[..., 1] = (torque_quad + torque_gravity)/inertia
+    if tables is None:
+        x_dot[..., 2:] = get_velocity(activations, lm, lt,
+                        force_length_regression, force_velocity_regression,
+                        vm0=vm0)
+    else:
+        x_dot[..., 2:] = tables.get_velocity(activations, lm, lt, vm0=vm0)
+    if recorder is not None:
+        recorder.lap('root_solve')
+
+    return x_dot
+
+
+def dynamics_jacobian(x, thigh_offset, muscles, activations,
+                      force_length_regression, force_velocity_regression,
+                      tables=None, moment_arm=QUAD_MOMENT_ARM, parameters=None, vm0=None):
+    """
+    Computes the Jacobian of the time-derivative of the state-vector w.r.t.
+    the state-vector, for use by implicit (stiff) integrators.
+
+    The CE velocities are defined implicitly by the damped-Hill equilibrium
+    g(vm, lm, lt) = a*fl(lm)*fv(vm) + fpe(lm) + BETA*vm - fse(lt) = 0, so
+    their derivatives follow from the implicit function theorem,
+    d(vm)/d(.) = -(dg/d(.))/(dg/d(vm)). The Jacobian uses the exact muscle
+    curves even in tabulated mode.
+
+    :param x: state vector (ankle angle,
+                            angular velocity,
+                            normalized CE length of each of the N muscles)
+    :param thigh_offset: initial offset angle of thigh in radians
+    :param muscles: MuscleGroup object holding the N quadricep muscles
+    :param activations: muscle activations between (0, 1), one per muscle
+    :param force_length_regression: regression function for force length
+    :param force_velocity_regression: regression function for for velocity
+    :param tables: optional MuscleTables, only used for the CE velocities
+    :param moment_arm: constant moment arm of the quadricep in meters, or
+        None to use the angle-dependent moment arm of the muscle path
+    :param parameters: optional KickParameters supplying the knee inertia
+        and the shank's mass and centre of mass distance
+    :param vm0: optional initial guess of the CE velocities
+    :return jacobian: (2 + N, 2 + N) matrix d(x_dot)/d(x)
+    """
+
+    recorder = instrumentation.recorder
+    if recorder is not None:
+        recorder.jacobian()
+
+    x = np.asarray(x, dtype=float)
+    theta = x[0]
+    lm = x[2:]
+    n = len(x)
+
+    muscle_tendon_length, muscle_tendon_slope = musculotendon_geometry(theta, thigh_offset)
+    lt = muscles.norm_tendon_length(muscle_tendon_length, lm)
+
+    # with the path moment arm, the torque also changes with theta through
+    # the arm itself
+    if moment_arm is None:
+        moment_arm = -muscle_tendon_slope
+        moment_arm_slope = moment_arm_derivative(theta, thigh_offset)
+    else:
+        moment_arm_slope = 0
+
+    if tables is None:
+        vm = get_velocity(activations, lm, lt,
+                          force_length_regression, force_velocity_regression,
+                          vm0=vm0)
+    else:
+        vm = tables.get_velocity(activations, lm, lt, vm0=vm0)
+
+    # derivatives of the normalized tendon lengths
+    dlt_dtheta = muscle_tendon_slope/muscles.resting_length_tendon
+    dlt_dlm = -muscles.resting_length_muscle/muscles.resting_length_tendon
+
+    tendon_slope = tendon_stiffness(lt)
+
+    inertia, mass, centre_of_mass_distance = _body_parameters(parameters)
+
+    jacobian = np.zeros((n, n))
+    jacobian[0, 1] = 1
+
+    # angular acceleration depends on theta through the moment of gravity
+    # and the tendon lengths, and on each CE length through its tendon
+    tendon_forces = muscles.f0M*tendon_force(lt)
+    jacobian[1, 0] = (np.sum(muscles.f0M*tendon_slope*dlt_dtheta)*moment_arm
+                      + np.sum(tendon_forces)*moment_arm_slope
+                      + gravity_moment_derivative(theta, thigh_offset, mass,
+                                                  centre_of_mass_distance))/inertia
+    jacobian[1, 2:] = muscles.f0M*tendon_slope*dlt_dlm*moment_arm/inertia
+
+    # partial derivatives of the equilibrium residual g
+    dg_dvm = activations*force_length(lm, force_length_regression) \
+        * force_velocity_slope(vm, force_velocity_regression) + BETA
+    dg_dlm = activations*force_length_slope(lm, force_length_regression) \
+        * force_velocity(vm, force_velocity_regression) \
+        + parallel_stiffness(lm) - tendon_slope*dlt_dlm
+    dg_dtheta = -tendon_slope*dlt_dtheta
+
+    jacobian[2:, 0] = -dg_dtheta/dg_dvm
+    jacobian[np.arange(2, n), np.arange(2, n)] = -dg_dlm/dg_dvm
+    if recorder is not None:
+        recorder.lap('jacobian')
+
+    return jacobian
+
+
+def _body_parameters(parameters):
+    """
+    Knee inertia, shank mass and centre of mass distance, from the
+    parameters if given and from the module defaults otherwise.
+    """
+
+    if parameters is None:
+        return KNEE_INERTIA, SHANK_MASS, COM_DIST
+
+    return parameters.knee_inertia, parameters.shank_mass, parameters.com_distance
@@ -0,0 +1,131 @@
+import numpy as np
+
+QUAD_SHANK_INSERTION = (0.08, 0.03)
+KNEE_ORIGIN = (0.06, 0)
+THIGH_LENGTH = 0.5004
+PHI = (3*np.pi)/2
+
+def _path_terms(insertion, origin):
+    """
+    Angle-independent terms of the path from the knee origin to the rotated
+    insertion point. Rotating the insertion p by gamma and subtracting the
+    origin o gives the squared distance
+
+        d^2 = |p|^2 + |o|^2 - 2*|o||p|*cos(gamma + delta - epsilon)
+
+    with delta and epsilon the polar angles of p and o.
+
+    :return offset: |p|^2 + |o|^2
+    :return amplitude: |o||p|
+    :return phase: delta - epsilon
+    """
+
+    insertion = np.asarray(insertion, dtype=float)
+    origin = np.asarray(origin, dtype=float)
+    insertion_x, insertion_y = insertion[..., 0], insertion[..., 1]
+    origin_x, origin_y = origin[..., 0], origin[..., 1]
+
+    offset = insertion_x**2 + insertion_y**2 + origin_x**2 + origin_y**2
+    amplitude = np.hypot(insertion_x, insertion_y)*np.hypot(origin_x, origin_y)
+    phase = np.arctan2(insertion_y, insertion_x) - np.arctan2(origin_y, origin_x)
+
+    return offset, amplitude, phase
+
+
+def _path_angle(theta, thigh_offset, insertion, phase):
+    """
+    Angle gamma + delta - epsilon of the rotated insertion point. With
+    per-muscle insertion points (an (N, 2) array), a trailing muscle axis is
+    added to the angles.
+    """
+
+    gamma = np.add(theta, thigh_offset) - PHI
+    if np.ndim(insertion) > 1:
+        gamma = np.expand_dims(gamma, -1)
+
+    return gamma + phase
+
+
+def musculotendon_geometry(theta, thigh_offset, insertion=QUAD_SHANK_INSERTION,
+                           origin=KNEE_ORIGIN, thigh_length=THIGH_LENGTH):
+    """
+    Musculotendon length of the quadricep and its derivative w.r.t. the
+    knee angle, in closed form. The length is evaluated once and shared by
+    all heads with the same insertion; with per-muscle insertion points the
+    results get a trailing muscle axis.
+
+    :param theta: angle between shank and thigh, scalar or array
+    :param thigh_offset: initial offset angle of thigh in radians, scalar or
+        array broadcastable against theta
+    :param insertion: insertion point on the shank, (2,) or (N, 2) for N
+        muscles with their own insertion
+    :param origin: knee origin of the path
+    :param thigh_length: length of the path along the thigh
+    :return length: musculotendon length
+    :return length_slope: derivative of the length w.r.t. theta
+    """
+
+    offset, amplitude, phase = _path_terms(insertion, origin)
+    angle = _path_angle(theta, thigh_offset, insertion, phase)
+
+    distance = np.sqrt(offset - 2*amplitude*np.cos(angle))
+    length_slope = amplitude*np.sin(angle)/distance
+
+    return thigh_length + distance, length_slope
+
+
+def musculotendon_length(theta, thigh_offset, insertion=QUAD_SHANK_INSERTION,
+                         origin=KNEE_ORIGIN, thigh_length=THIGH_LENGTH):
+    """
+    Musculotendon length of the quadricep, in closed form.
+
+    :param theta: angle between shank and thigh, scalar or array
+    :param thigh_offset: initial offset angle of thigh in radians
+    :param insertion: insertion point on the shank, (2,) or (N, 2)
+    :param origin: knee origin of the path
+    :param thigh_length: length of the path along the thigh
+    :return length: musculotendon length
+    """
+
+    offset, amplitude, phase = _path_terms(insertion, origin)
+    angle = _path_angle(theta, thigh_offset, insertion, phase)
+
+    return thigh_length + np.sqrt(offset - 2*amplitude*np.cos(angle))
+
+
+def moment_arm(theta, thigh_offset, insertion=QUAD_SHANK_INSERTION, origin=KNEE_ORIGIN):
+    """
+    Moment arm of the quadricep about the knee, by the principle of virtual
+    work the negative derivative of the musculotendon length w.r.t. theta.
+    It is positive where tendon tension drives theta up.
+
+    :param theta: angle between shank and thigh, scalar or array
+    :param thigh_offset: initial offset angle of thigh in radians
+    :param insertion: insertion point on the shank, (2,) or (N, 2)
+    :param origin: knee origin of the path
+    :return arm: moment arm in meters
+    """
+
+    return -musculotendon_geometry(theta, thigh_offset, insertion, origin)[1]
+
+
+def moment_arm_derivative(theta, thigh_offset, insertion=QUAD_SHANK_INSERTION,
+                          origin=KNEE_ORIGIN):
+    """
+    Derivative of the moment arm w.r.t. theta. Differentiating
+    d*d' = A*sin(angle) once more gives d'' = (A*cos(angle) - d'^2)/d.
+
+    :param theta: angle between shank and thigh, scalar or array
+    :param thigh_offset: initial offset angle of thigh in radians
+    :param insertion: insertion point on the shank, (2,) or (N, 2)
+    :param origin: knee origin of the path
+    :return arm_slope: derivative of the moment arm w.r.t. theta
+    """
+
+    offset, amplitude, phase = _path_terms(insertion, origin)
+    angle = _path_angle(theta, thigh_offset, insertion, phase)
+
+    distance = np.sqrt(offset - 2*amplitude*np.cos(angle))
+    distance_slope = amplitude*np.sin(angle)/distance
+
+    return -(amplitude*np.cos(angle) - distance_slope**2)/distance
@@ -0,0 +1,41 @@
+import numpy as np
+
+SHANK_MASS = 4.33
+COM_DIST = 0.22
+PHI = (3*np.pi)/2
+
+def gravity_moment(theta, thigh_offset, mass=SHANK_MASS, centre_of_mass_distance=COM_DIST):
+    """
+    Calculate moment of gravity based on theta
+
+    :param theta: andgle in radians
+    :param thigh_offset: initial offset angle of thigh in radians
+    :param mass: mass of the shank in kg
+    :param centre_of_mass_distance: distance of the shank's centre of mass
+        from the knee in meters
+    :return moment: moment caused by gravity
+    """
+
+    g = 9.81  # acceleration of gravity
+    moment = mass * g * centre_of_mass_distance * np.cos((theta + thigh_offset) - np.pi/2)
+
+    return moment
+
+
+def gravity_moment_derivative(theta, thigh_offset, mass=SHANK_MASS,
+                              centre_of_mass_distance=COM_DIST):
+    """
+    Calculate derivative of moment of gravity w.r.t. theta
+
+    :param theta: andgle in radians
+    :param thigh_offset: initial offset angle of thigh in radians
+    :param mass: mass of the shank in kg
+    :param centre_of_mass_distance: distance of the shank's centre of mass
+        from the knee in meters
+    :return moment_slope: derivative of moment caused by gravity
+    """
+
+    g = 9.81  # acceleration of gravity
+    moment_slope = -mass * g * centre_of_mass_distance * np.sin((theta + thigh_offset) - np.pi/2)
+
+    return moment_slope
@@ -0,0 +1,319 @@
+import time
+
+import numpy as np
+
+# the report that instrumented code records into, None while instrumentation
+# is disabled; hot paths only test it against None, so disabled
+# instrumentation costs a module attribute lookup per call
+recorder = None
+_enabled = False
+# reports of the runs of the current instrumented() block
+_session = None
+
+# components of the RHS whose time is accounted separately
+TIMED_COMPONENTS = ('geometry', 'curves', 'root_solve', 'gravity', 'jacobian')
+
+class RunReport:
+    """
+    Counters and timings of one simulation, or of several merged together:
+    RHS and Jacobian evaluations, accepted and rejected integrator steps
+    and the smallest and largest step, CE velocity root solves with their
+    iterations and convergence failures per muscle, and the time spent in
+    each of TIMED_COMPONENTS. rejected_steps is None for integrators that
+    do not expose their rejections (LSODA, Radau, BDF).
+    """
+
+    def __init__(self):
+
+        self.runs = 1
+        self.wall_time = 0.0
+        self.rhs_evaluations = 0
+        self.jacobian_evaluations = 0
+        self.accepted_steps = 0
+        self.rejected_steps = None
+        self.min_step = np.inf
+        self.max_step = 0.0
+        self.root_solves = 0
+        self.root_iterations = None
+        self.root_failures = None
+        self.max_root_iterations = 0
+        self.timings = dict.fromkeys(TIMED_COMPONENTS, 0.0)
+        self._lap = None
+        # RHS evaluations made inside the integrator's steps, which excludes
+        # those of its start-up and of dense output
+        self._step_evaluations = 0
+
+    def rhs(self):
+        """
+        Counts an RHS evaluation and starts timing its components.
+        """
+
+        self.rhs_evaluations += 1
+        self._lap = time.perf_counter()
+
+    def jacobian(self):
+        """
+        Counts a Jacobian evaluation and starts timing it.
+        """
+
+        self.jacobian_evaluations += 1
+        self._lap = time.perf_counter()
+
+    def lap(self, component):
+        """
+        Adds the time since the last lap (or the start of the RHS) to a
+        component.
+
+        :param component: one of TIMED_COMPONENTS
+        """
+
+        now = time.perf_counter()
+        if self._lap is not None:
+            self.timings[component] += now - self._lap
+        self._lap = now
+
+    def root_solve(self, iterations, unconverged):
+        """
+        Records one call of the CE velocity root solve.
+
+        :param iterations: iterations taken by every element, (N,) or (B, N)
+        :param unconverged: mask of the elements that did not converge
+        """
+
+        iterations = np.reshape(iterations, (-1, np.shape(iterations)[-1]))
+        unconverged = np.reshape(unconverged, iterations.shape)
+        if self.root_iterations is None:
+            self.root_iterations = np.zeros(iterations.shape[-1], dtype=int)
+            self.root_failures = np.zeros(iterations.shape[-1], dtype=int)
+
+        self.root_solves += 1
+        self.root_iterations += iterations.sum(axis=0)
+        self.root_failures += unconverged.sum(axis=0)
+        self.max_root_iterations = max(self.max_root_iterations, int(iterations.max()))
+
+    def step(self, size, evaluations):
+        """
+        Records an accepted integrator step.
+
+        :param size: step size, in seconds
+        :param evaluations: RHS evaluations made while taking the step,
+            including those of rejected attempts
+        """
+
+        self.accepted_steps += 1
+        self._step_evaluations += evaluations
+        self.min_step = min(self.min_step, size)
+        self.max_step = max(self.max_step, size)
+
+    def finish(self, solver, wall_time):
+        """
+        Completes the report of a run from its integrator.
+
+        :param solver: scipy OdeSolver used for the run
+        :param wall_time: duration of the run, in seconds
+        """
+
+        self.wall_time = wall_time
+        self._lap = None
+        # scipy's explicit Runge-Kutta methods evaluate the RHS exactly
+        # n_stages times per attempted step
+        n_stages = getattr(solver, 'n_stages', None)
+        if n_stages is not None:
+            attempts = self._step_evaluations//n_stages
+            self.rejected_steps = max(attempts - self.accepted_steps, 0)
+
+    def merge(self, other):
+        """
+        Adds the counters and timings of another report to this one.
+
+        :param other: RunReport
+        :return self: the merged report
+        """
+
+        self.runs += other.runs
+        self.wall_time += other.wall_time
+        self.rhs_evaluations += other.rhs_evaluations
+        self.jacobian_evaluations += other.jacobian_evaluations
+        self.accepted_steps += other.accepted_steps
+        if other.rejected_steps is not None:
+            self.rejected_steps = (self.rejected_steps or 0) + other.rejected_steps
+        self.min_step = min(self.min_step, other.min_step)
+        self.max_step = max(self.max_step, other.max_step)
+        self.root_solves += other.root_solves
+        if other.root_iterations is not None:
+            if self.root_iterations is None:
+                self.root_iterations = np.zeros_like(other.root_iterations)
+                self.root_failures = np.zeros_like(other.root_failures)
+            self.root_iterations = self.root_iterations + other.root_iterations
+            self.root_failures = self.root_failures + other.root_failures
+        self.max_root_iterations = max(self.max_root_iterations, other.max_root_iterations)
+        for component, seconds in other.timings.items():
+            self.timings[component] = self.timings.get(component, 0.0) + seconds
+
+        return self
+
+    def as_dict(self):
+        """
+        JSON-serializable form of the report.
+
+        :return report: dictionary of counters and timings
+        """
+
+        return {
+            'runs': self.runs,
+            'wall_time': self.wall_time,
+            'rhs_evaluations': self.rhs_evaluations,
+            'jacobian_evaluations': self.jacobian_evaluations,
+            'accepted_steps': self.accepted_steps,
+            'rejected_steps': self.rejected_steps,
+            'min_step': None if self.accepted_steps == 0 else float(self.min_step),
+            'max_step': None if self.accepted_steps == 0 else float(self.max_step),
+            'root_solves': self.root_solves,
+            'root_iterations': None if self.root_iterations is None
+                               else self.root_iterations.tolist(),
+            'root_failures': None if self.root_failures is None
+                             else self.root_failures.tolist(),
+            'max_root_iterations': self.max_root_iterations,
+            'timings': dict(self.timings),
+        }
+
+    @classmethod
+    def from_dict(cls, values):
+        """
+        Report from its as_dict() form.
+
+        :param values: dictionary of counters and timings
+        :return report: RunReport
+        """
+
+        report = cls()
+        for name, value in values.items():
+            if name in ('root_iterations', 'root_failures'):
+                value = None if value is None else np.array(value, dtype=int)
+            elif name == 'min_step':
+                value = np.inf if value is None else value
+            elif name == 'max_step':
+                value = 0.0 if value is None else value
+            elif name == 'timings':
+                value = dict(value)
+            setattr(report, name, value)
+
+        return report
+
+    def __repr__(self):
+        return 'RunReport(%r)' % self.as_dict()
+
+
+def merge_reports(reports):
+    """
+    Aggregates run reports, e.g. those of the runs of a sweep. Reports that
+    are None (runs made without instrumentation) are skipped.
+
+    :param reports: iterable of RunReport
+    :return report: merged RunReport, or None if there was none
+    """
+
+    total = None
+    for report in reports:
+        if report is None:
+            continue
+        if total is None:
+            total = RunReport()
+            total.runs = 0
+        total.merge(report)
+
+    return total
+
+
+def enabled():
+    return _enabled
+
+
+def enable():
+    """
+    Enables instrumentation; every following simulation run records a
+    RunReport, which is attached to its SimulationResult. Reports are only
+    collected inside an instrumented() block, so long-lived processes such
+    as sweep workers do not accumulate them.
+    """
+
+    global _enabled
+
+    _enabled = True
+
+
+def disable():
+    global _enabled, _session, recorder
+
+    _enabled = False
+    _session = None
+    recorder = None
+
+
+class instrumented:
+    """
+    Context manager enabling instrumentation for the simulations run in its
+    body. reports holds their RunReports, and summary() merges them; an
+    enclosing block also receives them.
+    """
+
+    def __enter__(self):
+        global _enabled, _session
+
+        self._outer = (_enabled, _session)
+        self.reports = _session = []
+        _enabled = True
+        return self
+
+    def __exit__(self, *exc_info):
+        global _enabled, _session, recorder
+
+        _enabled, _session = self._outer
+        if _session is not None:
+            _session.extend(self.reports)
+        if not _enabled:
+            recorder = None
+
+    def summary(self):
+        return merge_reports(self.reports)
+
+
+def begin_run():
+    """
+    Starts the report of a simulation run.
+
+    :return report: new RunReport, None if instrumentation is disabled
+    :return previous: the recorder to restore when the run ends
+    """
+
+    global recorder
+
+    previous = recorder
+    if not _enabled:
+        return None, previous
+
+    recorder = RunReport()
+
+    return recorder, previous
+
+
+def end_run(report, previous, solver, wall_time):
+    """
+    Completes the report of a simulation run and adds it to the reports of
+    the enclosing instrumented() block.
+
+    :param report: RunReport from begin_run, or None
+    :param previous: recorder returned by begin_run
+    :param solver: scipy OdeSolver used for the run
+    :param wall_time: duration of the run, in seconds
+    """
+
+    global recorder
+
+    recorder = previous
+    if report is None:
+        return
+
+    report.finish(solver, wall_time)
+    if _session is not None:
+        _session.append(report)
@@ -0,0 +1,27 @@
+import numpy as np
+
+from .geometry import QUAD_SHANK_INSERTION, KNEE_ORIGIN, THIGH_LENGTH, PHI, \
+    musculotendon_geometry, musculotendon_length
+
+def quad_muscle_length(theta, thigh_offset):
+    """
+    Calculates quadricp muscle length based on angle
+    :param theta: angle between shank and thigh, scalar or array
+    :param thigh_offset: initial offset angle of thigh in radians, scalar or
+        array broadcastable against theta
+    :return quad_muscle: length of muscle
+    """
+
+    return musculotendon_length(theta, thigh_offset)
+
+
+def quad_muscle_length_derivative(theta, thigh_offset):
+    """
+    Calculates derivative of quadricep muscle length w.r.t. knee angle
+    :param theta: angle between shank and thigh, scalar or array
+    :param thigh_offset: initial offset angle of thigh in radians, scalar or
+        array broadcastable against theta
+    :return quad_muscle_slope: derivative of length of muscle w.r.t. theta
+    """
+
+    return musculotendon_geometry(theta, thigh_offset)[1]
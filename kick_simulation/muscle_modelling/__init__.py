@@ -0,0 +1,5 @@
+"""
+Hill-type muscle model: force-length and force-velocity curves fitted to
+experimental data, tendon and parallel elastic elements, and the solve for
+the contractile element velocity.
+"""
@@ -0,0 +1,164 @@
+import numpy as np
+
+from .model_eval import as_force_velocity_model
+
+def tendon_force(lt, out=None):
+    """
+    Normalized tension of the tendon (series elastic element).
+
+    :param lt: normalized tendon length, scalar or array of any shape
+    :param out: optional array to write the result to
+    :return tension: normalized tension, same shape as lt
+    """
+
+    # a slack tendon (below resting length) carries no tension
+    stretch = _stretch(lt, out)
+    stretch *= 240*stretch + 10
+
+    return _result(stretch)
+
+
+def tendon_stiffness(lt, out=None):
+    """
+    Derivative of the normalized tendon tension w.r.t. normalized length.
+
+    :param lt: normalized tendon length, scalar or array of any shape
+    :param out: optional array to write the result to
+    :return stiffness: derivative of tension, same shape as lt
+    """
+
+    slack = np.less_equal(lt, 1)
+    stiffness = _stretch(lt, out)
+    stiffness *= 480
+    stiffness += 10
+    np.copyto(stiffness, 0, where=slack)
+
+    return _result(stiffness)
+
+
+def parallel_force(lm, out=None):
+    """
+    Normalized force of the parallel elastic element.
+
+    :param lm: normalized CE length, scalar or array of any shape
+    :param out: optional array to write the result to
+    :return force: normalized parallel elastic force, same shape as lm
+    """
+
+    # stretch below resting length produces no passive force
+    stretch = _stretch(lm, out)
+    stretch *= 3*stretch/(0.6 + stretch)
+
+    return _result(stretch)
+
+
+def parallel_stiffness(lm, out=None):
+    """
+    Derivative of the normalized parallel elastic force w.r.t. CE length.
+
+    :param lm: normalized CE length, scalar or array of any shape
+    :param out: optional array to write the result to
+    :return stiffness: derivative of parallel force, same shape as lm
+    """
+
+    stretch = _stretch(lm, out)
+    stretch *= 3*(1.2 + stretch)/((0.6 + stretch)**2)
+
+    return _result(stretch)
+
+
+def force_length(lm, force_length_regression, out=None):
+    """
+    Force-length scale factor of the contractile element.
+
+    :param lm: normalized CE length, scalar or array of any shape
+    :param force_length_regression: regression function for force length
+    :param out: optional array to write the result to
+    :return scale_factor: force-length scale factor, same shape as lm
+    """
+
+    scale_factor = force_length_regression(lm)
+    if out is None:
+        return scale_factor
+
+    np.copyto(out, scale_factor)
+    return out
+
+
+def force_length_slope(lm, force_length_regression, out=None):
+    """
+    Derivative of the force-length scale factor w.r.t. CE length. Uses the
+    regression's analytic derivative when it provides one, and a central
+    difference otherwise.
+
+    :param lm: normalized CE length, scalar or array of any shape
+    :param force_length_regression: regression function for force length
+    :param out: optional array to write the result to
+    :return slope: derivative of the scale factor, same shape as lm
+    """
+
+    derivative = getattr(force_length_regression, 'derivative', None)
+    if derivative is not None:
+        slope = derivative(lm)
+    else:
+        h = 1e-6
+        slope = (force_length_regression(np.add(lm, h))
+                 - force_length_regression(np.subtract(lm, h)))/(2*h)
+
+    if out is None:
+        return slope
+
+    np.copyto(out, slope)
+    return out
+
+
+def force_velocity(vm, force_velocity_regression, out=None):
+    """
+    Force-velocity scale factor of the contractile element.
+
+    :param vm: normalized CE velocity, scalar or array of any shape
+    :param force_velocity_regression: ForceVelocityModel or its coefficients
+    :param out: optional array to write the result to
+    :return scale_factor: force-velocity scale factor, same shape as vm
+    """
+
+    return as_force_velocity_model(force_velocity_regression)(vm, out)
+
+
+def force_velocity_slope(vm, force_velocity_regression, out=None):
+    """
+    Derivative of the force-velocity scale factor w.r.t. CE velocity.
+
+    :param vm: normalized CE velocity, scalar or array of any shape
+    :param force_velocity_regression: ForceVelocityModel or its coefficients
+    :param out: optional array to write the result to
+    :return slope: derivative of the scale factor, same shape as vm
+    """
+
+    return as_force_velocity_model(force_velocity_regression).derivative(vm, out)
+
+
+def _stretch(length, out):
+    """
+    Stretch beyond resting length, max(length - 1, 0), computed into out
+    (or a new float array, 0-d for scalars) so the caller can finish in
+    place; integer lengths give a float stretch.
+    """
+
+    stretch = np.subtract(length, 1.0, out=out, dtype=float)
+    if not isinstance(stretch, np.ndarray):
+        stretch = np.asarray(stretch)
+    np.maximum(stretch, 0, out=stretch)
+
+    return stretch
+
+
+def _result(value):
+    """
+    Unwraps 0-d arrays so that scalar inputs give scalar outputs.
+    """
+
+    if isinstance(value, np.ndarray) and value.ndim == 0:
+        return value[()]
+
+    return value
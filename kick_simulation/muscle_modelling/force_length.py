@@ -0,0 +1,104 @@
+import numpy as np
+
+from .curves import force_length, force_length_slope, \
+                         parallel_force, parallel_stiffness, \
+                         tendon_force, tendon_stiffness
+
+def force_length_muscle(lm, force_length_regression):
+    """
+    Compute the force-length scale factor for a muscle based on its length.
+
+    :param lm: muscle (contractile element) length
+    :param force_length_regression: regression function for for force length
+    :return force_length_scale_factor: the force-length scale factor
+    """
+    
+    if len(np.array(lm).shape) <= 0:
+      lm = np.array([lm])
+
+    force_length_scale_factor = force_length(lm, force_length_regression)
+
+    return force_length_scale_factor
+
+
+def force_length_parallel(lm):
+    """
+    Compute the normalized force produced by the parallel elastic element of a muscle
+    based on its normalized length.
+
+    :param lm: normalized length of muscle (contractile element), arrays of
+        any shape are evaluated element-wise
+    :return normalize_PE_force: normalized force produced by parallel elastic element
+    """
+
+    if len(np.array(lm).shape) <= 0:
+      lm = np.array([lm])
+
+    normalize_PE_force = parallel_force(lm)
+
+    return normalize_PE_force
+
+
+def force_length_tendon(lt):
+    """
+    Compute the normalized tension produced by the tendon (series elastic element)
+    based on its normalized length.
+
+    :param lt: normalized length of tendon (series elastic element), arrays of
+        any shape are evaluated element-wise
+    :return normalize_tendon_tension: normalized tension produced by tendon
+    """
+
+    if len(np.array(lt).shape) <= 0:
+      lt = np.array([lt])
+
+    normalize_tendon_tension = tendon_force(lt)
+
+    return normalize_tendon_tension
+
+def force_length_muscle_derivative(lm, force_length_regression):
+    """
+    Compute the derivative of the force-length scale factor w.r.t. length.
+    Uses the regression's analytic derivative when it provides one, and a
+    central difference otherwise.
+
+    :param lm: muscle (contractile element) length
+    :param force_length_regression: regression function for for force length
+    :return force_length_slope: derivative of the force-length scale factor
+    """
+
+    lm = np.atleast_1d(np.asarray(lm, dtype=float))
+
+    return force_length_slope(lm, force_length_regression)
+
+
+def force_length_parallel_derivative(lm):
+    """
+    Compute the derivative of the normalized parallel elastic force w.r.t.
+    normalized muscle length.
+
+    :param lm: normalized length of muscle (contractile element)
+    :return normalize_PE_slope: derivative of normalized parallel elastic force
+    """
+
+    lm = np.atleast_1d(np.asarray(lm, dtype=float))
+
+    normalize_PE_slope = parallel_stiffness(lm)
+
+    return normalize_PE_slope
+
+
+def force_length_tendon_derivative(lt):
+    """
+    Compute the derivative of the normalized tendon tension w.r.t.
+    normalized tendon length.
+
+    :param lt: normalized length of tendon (series elastic element)
+    :return normalize_tendon_slope: derivative of normalized tendon tension
+    """
+
+    lt = np.atleast_1d(np.asarray(lt, dtype=float))
+
+    normalize_tendon_slope = tendon_stiffness(lt)
+
+    return normalize_tendon_slope
@@ -0,0 +1,33 @@
+import numpy as np
+from .curves import force_velocity, force_velocity_slope
+
+def force_velocity_muscle(vm, force_velocity_regression):
+    """
+    Compute the force-velocity scale factor for a muscle based on its velocity.
+
+    :param vm: muscle (contractile element) velocity, scalar or array of
+        velocities for several muscles
+    :param force_velocity_regression: regression function for for force velocity
+    :return force_velocity_scale_factor: the force-velocity scale factor
+    """
+
+    vm = np.atleast_1d(np.asarray(vm, dtype=float))
+
+    force_velocity_scale_factor = force_velocity(vm, force_velocity_regression)
+
+    return force_velocity_scale_factor
+
+
+def force_velocity_muscle_derivative(vm, force_velocity_regression):
+    """
+    Compute the derivative of the force-velocity scale factor w.r.t. velocity.
+
+    :param vm: muscle (contractile element) velocity, scalar or array of
+        velocities for several muscles
+    :param force_velocity_regression: regression function for for force velocity
+    :return force_velocity_slope: derivative of the force-velocity scale factor
+    """
+
+    vm = np.atleast_1d(np.asarray(vm, dtype=float))
+
+    return force_velocity_slope(vm, force_velocity_regression)
@@ -0,0 +1,113 @@
+import numpy as np
+
+from .. import instrumentation
+from .curves import force_length, parallel_force, tendon_force
+from .model_eval import as_force_velocity_model
+
+BETA = 0.1  # damping coefficient of the damped Hill model
+VELOCITY_TOLERANCE = 1e-10  # bound on |residual| (normalized force) at the root
+MAX_ITERATIONS = 100
+
+def get_velocity(a, lm, lt, lr, vr, vm0=None):
+    """
+    Returns velocity given activation, muscle-length, tendon-length,
+    length and velocity regression functions. Activation and lengths may be
+    arrays with one entry per muscle, in which case all CE velocities are
+    solved for together.
+
+    :param a: activation for the muscle(s)
+    :param lm: normalized length of muscle (contractile element)
+    :param lt: normalized length of tendon (series elastic element)
+    :param lr: force-length-regression function
+    :param vr: force-velocity-regression function
+    :param vm0: optional initial guess, e.g. the previous step's velocity
+    :return root: velocity, one entry per muscle
+    """
+
+    # the terms that do not depend on velocity are evaluated once per call
+    active_force = a*force_length(lm, lr)
+    required_force = tendon_force(lt) - parallel_force(lm)
+    recorder = instrumentation.recorder
+    if recorder is not None:
+        recorder.lap('curves')
+
+    return solve_velocity(active_force, required_force, vr, vm0)
+
+
+def solve_velocity(active_force, required_force, vr, vm0=None,
+                   tol=VELOCITY_TOLERANCE, max_iter=MAX_ITERATIONS):
+    """
+    Solves the damped-Hill equilibrium
+
+        active_force*fv(vm) + BETA*vm = required_force
+
+    element-wise for vm with a safeguarded Newton/bisection hybrid. Since the
+    sigmoid-basis fv is bounded, the root is always bracketed by the
+    velocities at which the damping term alone balances the extreme values
+    of active_force*fv; Newton steps that leave the bracket (or go uphill)
+    are replaced by bisection, so the iteration always converges. The
+    returned roots satisfy |residual| <= tol, or lie in a bracket narrower
+    than tol.
+
+    :param active_force: a*fl(lm), the activation-scaled force-length factor
+    :param required_force: tendon force minus parallel elastic force
+    :param vr: force-velocity-regression, ForceVelocityModel or coefficients
+    :param vm0: optional initial guess, e.g. the previous step's velocity
+    :param tol: tolerance on the residual and on the bracket width
+    :param max_iter: maximum number of iterations
+    :return vm: CE velocity, one entry per muscle
+    """
+
+    active_force, required_force = np.broadcast_arrays(
+        np.atleast_1d(np.asarray(active_force, dtype=float)),
+        np.atleast_1d(np.asarray(required_force, dtype=float)))
+
+    # bounds of the force-velocity curve give a bracket that is guaranteed
+    # to hold the root
+    model = as_force_velocity_model(vr)
+    fv_min, fv_max = model.bounds()
+    lower = (required_force - np.maximum(active_force*fv_min, active_force*fv_max))/BETA
+    upper = (required_force - np.minimum(active_force*fv_min, active_force*fv_max))/BETA
+
+    if vm0 is None or np.shape(vm0) != lower.shape:
+        vm = np.zeros(lower.shape)
+    else:
+        vm = np.array(vm0, dtype=float)
+    vm = np.clip(vm, lower, upper)
+
+    # iteration counts are only kept for instrumentation
+    recorder = instrumentation.recorder
+    iterations = None if recorder is None else np.zeros(vm.shape, dtype=int)
+
+    active = np.ones(vm.shape, dtype=bool)
+    for _ in range(max_iter):
+        v = vm[active]
+        k = active_force[active]
+        fv, fv_slope = model.value_and_derivative(v)
+        residual = k*fv + BETA*v - required_force[active]
+        slope = k*fv_slope + BETA
+
+        # shrink the bracket using the sign of the residual
+        lo = np.where(residual < 0, v, lower[active])
+        hi = np.where(residual > 0, v, upper[active])
+        lower[active] = lo
+        upper[active] = hi
+
+        converged = (np.abs(residual) <= tol) | (hi - lo <= tol)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            newton = v - residual/slope
+        outside = ~((newton > lo) & (newton < hi)) | (slope <= 0)
+        v = np.where(converged, v, np.where(outside, 0.5*(lo + hi), newton))
+
+        vm[active] = v
+        if iterations is not None:
+            iterations[active] += 1
+        active[active] = ~converged
+        if not active.any():
+            break
+
+    if recorder is not None:
+        recorder.root_solve(iterations, active)
+
+    return vm
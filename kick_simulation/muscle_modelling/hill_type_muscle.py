@@ -1,8 +1,4 @@
-import sys
-sys.path.append('.')
-sys.path.append('./muscle_modelling')
-
-from muscle_modelling.force_length import force_length_tendon
+from .force_length import force_length_tendon
 
 class HillTypeMuscle:
     """
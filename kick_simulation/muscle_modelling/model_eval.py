@@ -0,0 +1,204 @@
+import numpy as np
+
+# centres and width of the basis functions of the force-velocity regression
+SIGMOID_CENTRES = np.arange(-1, -0.09, 0.2)
+SIGMOID_WIDTH = 0.15
+BASIS_FUNCTIONS = ('Sigmoid', 'Gaussian')
+
+class ForceVelocityModel:
+    """
+    Force-velocity regression compiled from its ridge coefficients. The
+    basis centres and width are kept as arrays, so a batch of velocities is
+    evaluated with one broadcast over a trailing basis axis, and the value
+    and the derivative can be computed together from the same basis
+    evaluation. Both basis types are bounded in [0, 1], which gives the
+    bounds of the curve directly from the signs of the coefficients.
+
+    The model behaves like its coefficient array under np.asarray and
+    indexing, so it can be passed wherever the coefficients used to be.
+    """
+
+    def __init__(self, coefficients, function_type='Sigmoid',
+                 centres=SIGMOID_CENTRES, width=SIGMOID_WIDTH):
+
+        if function_type not in BASIS_FUNCTIONS:
+            raise ValueError('function_type must be one of %s, got %r'
+                             % (', '.join(BASIS_FUNCTIONS), function_type))
+
+        self.coefficients = np.array(coefficients, dtype=float)
+        self.function_type = function_type
+        self.centres = np.array(centres, dtype=float)
+        self.width = float(width)
+
+        if len(self.coefficients) != len(self.centres) + 1:
+            raise ValueError('expected %d coefficients, got %d'
+                             % (len(self.centres) + 1, len(self.coefficients)))
+
+        self.intercept = self.coefficients[0]
+        self.weights = self.coefficients[1:]
+        # the derivative of either basis carries a 1/width factor, which is
+        # folded into the weights once
+        self.slope_weights = self.weights/self.width
+        self.minimum = self.intercept + np.sum(np.minimum(self.weights, 0))
+        self.maximum = self.intercept + np.sum(np.maximum(self.weights, 0))
+
+    def __call__(self, vm, out=None):
+        """
+        Evaluates the regression.
+
+        :param vm: input, e.g. CE velocity, scalar or array of any shape
+        :param out: optional array to write the result to
+        :return output: regression output, same shape as vm
+        """
+
+        output = np.matmul(self._basis(vm), self.weights, out=out)
+        output += self.intercept
+
+        return _unwrap(output)
+
+    def derivative(self, vm, out=None):
+        """
+        Evaluates the derivative of the regression w.r.t. its input.
+
+        :param vm: input, e.g. CE velocity, scalar or array of any shape
+        :param out: optional array to write the result to
+        :return slope: derivative of the output, same shape as vm
+        """
+
+        basis = self._basis(vm)
+        self._basis_slope(vm, basis)
+
+        return _unwrap(np.matmul(basis, self.slope_weights, out=out))
+
+    def value_and_derivative(self, vm):
+        """
+        Evaluates the regression and its derivative in one pass, sharing the
+        basis evaluation between the two.
+
+        :param vm: input, e.g. CE velocity, scalar or array of any shape
+        :return output: regression output, same shape as vm
+        :return slope: derivative of the output, same shape as vm
+        """
+
+        basis = self._basis(vm)
+        output = np.matmul(basis, self.weights)
+        output += self.intercept
+        self._basis_slope(vm, basis)
+
+        return _unwrap(output), _unwrap(np.matmul(basis, self.slope_weights))
+
+    def bounds(self):
+        """
+        Lower and upper bound of the regression over all inputs.
+
+        :return minimum: lower bound of the output
+        :return maximum: upper bound of the output
+        """
+
+        return self.minimum, self.maximum
+
+    def _basis(self, vm):
+        """
+        Basis functions evaluated at vm, stacked along a new trailing axis.
+        """
+
+        basis = np.subtract(np.expand_dims(vm, -1), self.centres)
+        basis /= self.width
+
+        if self.function_type == 'Sigmoid':
+            # 1/(1 + exp(-(x-mu)/sigma))
+            np.negative(basis, out=basis)
+            # far below a centre exp overflows to inf, and the sigmoid
+            # correctly evaluates to 0
+            with np.errstate(over='ignore'):
+                np.exp(basis, out=basis)
+            basis += 1
+            np.reciprocal(basis, out=basis)
+        else:
+            # exp(-(x-mu)^2/(2 sigma^2))
+            np.square(basis, out=basis)
+            basis *= -0.5
+            np.exp(basis, out=basis)
+
+        return basis
+
+    def _basis_slope(self, vm, basis):
+        """
+        Turns the basis evaluated at vm into its derivative (times width),
+        in place.
+        """
+
+        if self.function_type == 'Sigmoid':
+            # d/dx of s is s*(1 - s)/sigma
+            basis *= 1 - basis
+        else:
+            # d/dx of g is -(x-mu)/sigma^2*g
+            basis *= np.subtract(self.centres, np.expand_dims(vm, -1))/self.width
+
+    def __array__(self, dtype=None, copy=None):
+        return self.coefficients if dtype is None else self.coefficients.astype(dtype)
+
+    def __getitem__(self, index):
+        return self.coefficients[index]
+
+    def __len__(self):
+        return len(self.coefficients)
+
+    def __repr__(self):
+        return 'ForceVelocityModel(%r, function_type=%r)' % (
+            self.coefficients.tolist(), self.function_type)
+
+
+def as_force_velocity_model(regression, function_type='Sigmoid'):
+    """
+    Returns the regression as a ForceVelocityModel, compiling it from its
+    coefficients if it is a plain coefficient array.
+
+    :param regression: ForceVelocityModel or array of ridge coefficients
+    :param function_type: basis type used when compiling coefficients
+    :return model: ForceVelocityModel
+    """
+
+    if isinstance(regression, ForceVelocityModel):
+        return regression
+
+    return ForceVelocityModel(regression, function_type)
+
+
+def model_eval(function_type, input, ridge_coeff):
+    """
+    Evaluates output based on regression coefficients (inference)
+
+    :param function_type: type of function, 'Sigmoid' or 'Gaussian'
+    :param input: input for regression, ex:- contractile-element velocity,
+        evaluated element-wise for arrays of any shape
+    :param ridge_coeff: coefficients obtain from ridge-regression fitting
+    :return output: returns output of regression, same shape as input
+    """
+
+    return as_force_velocity_model(ridge_coeff, function_type)(np.asarray(input, dtype=float))
+
+def model_eval_derivative(function_type, input, ridge_coeff):
+    """
+    Evaluates derivative of the regression output w.r.t. its input
+
+    :param function_type: type of function, 'Sigmoid' or 'Gaussian'
+    :param input: input for regression, ex:- contractile-element velocity,
+        evaluated element-wise for arrays of any shape
+    :param ridge_coeff: coefficients obtain from ridge-regression fitting
+    :return output: derivative of regression output, same shape as input
+    """
+
+    return as_force_velocity_model(ridge_coeff, function_type).derivative(
+        np.asarray(input, dtype=float))
+
+
+def _unwrap(value):
+    """
+    Unwraps 0-d arrays so that scalar inputs give scalar outputs.
+    """
+
+    if isinstance(value, np.ndarray) and value.ndim == 0:
+        return value[()]
+
+    return value
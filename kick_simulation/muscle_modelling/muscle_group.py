@@ -0,0 +1,77 @@
+import numpy as np
+
+from .curves import tendon_force
+
+class MuscleGroup:
+    """
+    Struct-of-arrays version of HillTypeMuscle for a group of N muscles that
+    share a musculotendon path (e.g. the four heads of the quadriceps). Every
+    scale factor is stored as a NumPy vector so that tendon lengths and forces
+    for the whole group are computed in single array operations.
+    """
+
+    def __init__(self, f0M, resting_length_muscle, resting_length_tendon):
+
+        self.f0M = np.asarray(f0M, dtype=float)
+        self.resting_length_muscle = np.asarray(resting_length_muscle, dtype=float)
+        self.resting_length_tendon = np.asarray(resting_length_tendon, dtype=float)
+
+    @classmethod
+    def from_muscles(cls, muscles):
+        """
+        Build a muscle group from a sequence of HillTypeMuscle objects.
+
+        :param muscles: sequence of HillTypeMuscle objects
+        :return group: MuscleGroup holding the muscles' scale factors
+        """
+
+        return cls(
+            [muscle.f0M for muscle in muscles],
+            [muscle.resting_length_muscle for muscle in muscles],
+            [muscle.resting_length_tendon for muscle in muscles],
+        )
+
+    def take(self, index):
+        """
+        Select rows of a batched muscle group, e.g. the trajectories that are
+        still being integrated.
+
+        :param index: indices (or mask) of the rows to keep
+        :return group: MuscleGroup holding the selected rows
+        """
+
+        return MuscleGroup(self.f0M[index], self.resting_length_muscle[index],
+                           self.resting_length_tendon[index])
+
+    def __len__(self):
+        return self.f0M.shape[-1]
+
+    def norm_tendon_length(self, muscle_tendon_length, normalized_muscle_length):
+        """
+        Calculate the normalized length of every tendon in the group.
+
+        :param muscle_tendon_length: length of muscle tendon (unnormalized),
+            either shared by the group or one per muscle
+        :param normalized_muscle_length: normalized CE element lengths (N,)
+        :return norm_tendon_length: normalized tendon lengths (SE) (N,)
+        """
+
+        return (
+            muscle_tendon_length \
+                - self.resting_length_muscle * normalized_muscle_length
+            ) / self.resting_length_tendon
+
+    def get_force(self, total_length, norm_muscle_length):
+        """
+        Calculate muscle tension (N) of every muscle in the group.
+
+        :param total_length: length of muscle tendon (unnormalized)
+        :param norm_muscle_length: normalized CE element lengths (N,)
+        :return force: tension in/generated by each muscle (N,)
+        """
+
+        normalized_tendon_length = self.norm_tendon_length(
+                                    total_length, norm_muscle_length
+                                    )
+
+        return self.f0M * tendon_force(normalized_tendon_length)
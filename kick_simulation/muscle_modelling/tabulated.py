@@ -0,0 +1,238 @@
+import numpy as np
+
+from .force_length import force_length_muscle, \
+                         force_length_parallel, \
+                         force_length_tendon
+from .model_eval import as_force_velocity_model
+from .get_velocity import BETA, solve_velocity
+
+LENGTH_RANGE = (0.3, 2.0)  # normalized CE lengths covered by the tables
+TENDON_RANGE = (0.8, 1.6)  # normalized SE lengths covered by the tables
+LENGTH_STEP = 1e-3
+ACTIVE_FORCE_RANGE = (0, 1.2)  # a*fl, activation-scaled force-length factor
+REQUIRED_FORCE_RANGE = (-5, 60)  # tendon force minus parallel elastic force
+ACTIVE_FORCE_POINTS = 121
+REQUIRED_FORCE_POINTS = 6501
+VELOCITY_RANGE = (-3, 2)  # normalized CE velocities where fv is curved
+VELOCITY_POINTS = 20001
+
+def _uniform_grid(bounds, step=None, points=None):
+    """
+    Returns start, step and nodes of a uniform grid spanning bounds.
+    """
+
+    if points is None:
+        points = int(round((bounds[1] - bounds[0])/step)) + 1
+    nodes = np.linspace(bounds[0], bounds[1], points)
+
+    return bounds[0], nodes[1] - nodes[0], nodes
+
+
+def _locate(x, start, step, points):
+    """
+    Returns the lower node index and interpolation weight of x on a uniform
+    grid, along with a mask of the entries that fall inside the grid.
+    """
+
+    position = (x - start)/step
+    inside = (position >= 0) & (position <= points - 1)
+    index = np.clip(np.floor(position), 0, points - 2).astype(np.intp)
+
+    return index, position - index, inside
+
+
+class MuscleTables:
+    """
+    Tabulated version of the Hill muscle curves for a pair of fitted
+    regressions. The Gaussian force-length fit, the parallel elastic and
+    tendon curves are sampled on uniform length grids, and the damped-Hill
+    equilibrium
+
+        a*fl(lm)*fv(vm) + BETA*vm = fse(lt) - fpe(lm)
+
+    is inverted once into a table of vm over (a*fl, fse - fpe). Because the
+    damping term makes vm depend on a*fl as well as on the required force,
+    the inverse is two dimensional; each row is built by inverting the
+    monotone sigmoid-basis fv. Lookups are uniform-grid linear (bilinear for
+    the inverse) interpolation; inputs outside the tables fall back to the
+    exact curves and root solve.
+
+    The interpolation error of every table is measured against the exact
+    curves at cell midpoints when the tables are built, and is stored in
+    error_bounds. For the default resolutions it is below 1e-4 for the
+    length curves (grid step h = 1e-3, error <= h**2/8*max|f''|). The inverse
+    table is accurate to about 1e-6 in normalized velocity over most of its
+    domain, but near the knee of fv at vm ~ 0 the error of a pure lookup
+    reaches about 3e-3; a single analytic Newton correction
+    (newton_steps=1) brings it below 1e-5 everywhere.
+    """
+
+    def __init__(self, force_length_regression, force_velocity_regression,
+                 newton_steps=0):
+
+        self.force_length_regression = force_length_regression
+        self.force_velocity_regression = as_force_velocity_model(force_velocity_regression)
+        self.newton_steps = newton_steps
+
+        # force-length and parallel elastic curves share the CE length grid,
+        # which contains lm = 1 (the kink of the parallel element) as a node
+        self.length_start, self.length_step, lm = _uniform_grid(
+            LENGTH_RANGE, step=LENGTH_STEP)
+        self.force_length_table = force_length_muscle(lm, force_length_regression)
+        self.parallel_table = force_length_parallel(lm)
+
+        self.tendon_start, self.tendon_step, lt = _uniform_grid(
+            TENDON_RANGE, step=LENGTH_STEP)
+        self.tendon_table = force_length_tendon(lt)
+
+        # each row of the inverse table is the monotone curve
+        # k*fv(vm) + BETA*vm re-sampled onto the required force grid
+        self.active_start, self.active_step, k = _uniform_grid(
+            ACTIVE_FORCE_RANGE, points=ACTIVE_FORCE_POINTS)
+        self.required_start, self.required_step, r = _uniform_grid(
+            REQUIRED_FORCE_RANGE, points=REQUIRED_FORCE_POINTS)
+
+        fv_min, fv_max = self.force_velocity_regression.bounds()
+        # fv is only curved over a narrow band of velocities, which gets
+        # dense sampling; outside it fv is flat and the curve is linear
+        vm = np.concatenate([
+            [(r[0] - k[-1]*fv_max)/BETA],
+            np.linspace(VELOCITY_RANGE[0], VELOCITY_RANGE[1], VELOCITY_POINTS),
+            [(r[-1] - k[0]*fv_min)/BETA],
+        ])
+        fv = self.force_velocity_regression(vm)
+
+        if np.any(np.diff(fv) < 0):
+            raise ValueError('force-velocity regression is not monotone, '
+                             'it cannot be inverted into a table')
+
+        self.velocity_table = np.array([
+            np.interp(r, k_row*fv + BETA*vm, vm) for k_row in k])
+
+        self.error_bounds = self._measure_errors()
+
+    def force_length_muscle(self, lm):
+        """
+        Tabulated force-length scale factor.
+
+        :param lm: normalized muscle (contractile element) lengths
+        :return force_length_scale_factor: the force-length scale factor
+        """
+
+        return self._lookup(lm, self.length_start, self.length_step,
+                            self.force_length_table,
+                            lambda x: force_length_muscle(x, self.force_length_regression))
+
+    def force_length_parallel(self, lm):
+        """
+        Tabulated normalized force of the parallel elastic element.
+
+        :param lm: normalized muscle (contractile element) lengths
+        :return normalize_PE_force: normalized force of parallel elastic element
+        """
+
+        return self._lookup(lm, self.length_start, self.length_step,
+                            self.parallel_table, force_length_parallel)
+
+    def force_length_tendon(self, lt):
+        """
+        Tabulated normalized tension of the tendon (series elastic element).
+
+        :param lt: normalized tendon (series elastic element) lengths
+        :return normalize_tendon_tension: normalized tension produced by tendon
+        """
+
+        return self._lookup(lt, self.tendon_start, self.tendon_step,
+                            self.tendon_table, force_length_tendon)
+
+    def get_velocity(self, a, lm, lt, vm0=None):
+        """
+        Tabulated CE velocity for given activation, muscle and tendon lengths.
+
+        :param a: activation for the muscle(s)
+        :param lm: normalized length of muscle (contractile element)
+        :param lt: normalized length of tendon (series elastic element)
+        :param vm0: initial guess, only used by the exact fallback
+        :return vm: velocity, one entry per muscle
+        """
+
+        active_force = a*self.force_length_muscle(lm)
+        required_force = self.force_length_tendon(lt) - self.force_length_parallel(lm)
+
+        return self.solve_velocity(active_force, required_force, vm0)
+
+    def solve_velocity(self, active_force, required_force, vm0=None):
+        """
+        Bilinear lookup of the inverse equilibrium table.
+
+        :param active_force: a*fl(lm), the activation-scaled force-length factor
+        :param required_force: tendon force minus parallel elastic force
+        :param vm0: initial guess, only used by the exact fallback
+        :return vm: CE velocity, one entry per muscle
+        """
+
+        active_force, required_force = np.broadcast_arrays(
+            np.atleast_1d(np.asarray(active_force, dtype=float)),
+            np.atleast_1d(np.asarray(required_force, dtype=float)))
+
+        i, wi, inside_i = _locate(active_force, self.active_start,
+                                  self.active_step, ACTIVE_FORCE_POINTS)
+        j, wj, inside_j = _locate(required_force, self.required_start,
+                                  self.required_step, REQUIRED_FORCE_POINTS)
+
+        table = self.velocity_table
+        vm = (1 - wi)*((1 - wj)*table[i, j] + wj*table[i, j + 1]) \
+            + wi*((1 - wj)*table[i + 1, j] + wj*table[i + 1, j + 1])
+
+        for _ in range(self.newton_steps):
+            fv, fv_slope = self.force_velocity_regression.value_and_derivative(vm)
+            residual = active_force*fv + BETA*vm - required_force
+            slope = active_force*fv_slope + BETA
+            vm = vm - residual/slope
+
+        outside = ~(inside_i & inside_j)
+        if outside.any():
+            guess = None if vm0 is None else np.broadcast_to(vm0, vm.shape)[outside]
+            vm[outside] = solve_velocity(active_force[outside],
+                                         required_force[outside],
+                                         self.force_velocity_regression, guess)
+
+        return vm
+
+    def _lookup(self, x, start, step, table, exact):
+        """
+        Linear interpolation on a uniform grid with an exact fallback for
+        entries outside the grid.
+        """
+
+        x = np.atleast_1d(np.asarray(x, dtype=float))
+        index, weight, inside = _locate(x, start, step, len(table))
+        y = (1 - weight)*table[index] + weight*table[index + 1]
+
+        if not inside.all():
+            y[~inside] = exact(x[~inside])
+
+        return y
+
+    def _measure_errors(self):
+        """
+        Maximum absolute interpolation error of each table, measured at the
+        cell midpoints where linear interpolation error is largest.
+        """
+
+        lm = self.length_start + self.length_step*(np.arange(len(self.parallel_table) - 1) + 0.5)
+        lt = self.tendon_start + self.tendon_step*(np.arange(len(self.tendon_table) - 1) + 0.5)
+        k = self.active_start + self.active_step*(np.arange(0, ACTIVE_FORCE_POINTS - 1, 10) + 0.5)
+        r = self.required_start + self.required_step*(np.arange(0, REQUIRED_FORCE_POINTS - 1, 10) + 0.5)
+        k, r = [grid.ravel() for grid in np.meshgrid(k, r)]
+
+        return {
+            'force_length': np.max(np.abs(self.force_length_muscle(lm)
+                                   - force_length_muscle(lm, self.force_length_regression))),
+            'parallel': np.max(np.abs(self.force_length_parallel(lm)
+                               - force_length_parallel(lm))),
+            'tendon': np.max(np.abs(self.force_length_tendon(lt)
+                             - force_length_tendon(lt))),
+            'velocity': np.max(np.abs(self.solve_velocity(k, r)
+                               - solve_velocity(k, r, self.force_velocity_regression))),
+        }
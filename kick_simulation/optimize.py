@@ -0,0 +1,227 @@
+import time
+
+import numpy as np
+
+from .activation import ActivationPattern, PiecewiseLinearActivation
+from .batch_simulate import batch_simulate
+from .simulate import run_simulation
+from .muscle_modelling.regression import get_muscle_force_length_regression,\
+                       get_muscle_force_velocity_regression
+
+MUSCLES = ('femoris', 'lateralis', 'medialis', 'intermedius')
+# decision variables and their default search bounds
+OPTIMIZATION_PARAMETERS = ('initial_theta', 'thigh_offset') \
+    + tuple(muscle + '_onset' for muscle in MUSCLES)
+OPTIMIZATION_BOUNDS = {
+    'initial_theta': (0, np.pi/2),
+    'thigh_offset': (-np.pi/4, np.pi/3),
+    'femoris_onset': (0, 0.2),
+    'lateralis_onset': (0, 0.2),
+    'medialis_onset': (0, 0.2),
+    'intermedius_onset': (0, 0.2),
+}
+ACTIVATION_RAMP_TIME = 0.02  # time for an activation to rise from 0 to 1
+FINITE_DIFFERENCE_STEP = 1e-3
+# tighter than the batch default, so that finite differences are not
+# dominated by integration error
+RTOL = 1e-8
+ATOL = 1e-10
+
+def onset_activation(onset, ramp_time=ACTIVATION_RAMP_TIME):
+    """
+    Activation that is off until onset, then ramps linearly to full
+    activation over ramp_time.
+
+    :param onset: time at which the muscle starts activating, in seconds
+    :param ramp_time: duration of the ramp, in seconds
+    :return activation: PiecewiseLinearActivation
+    """
+
+    return PiecewiseLinearActivation([onset, onset + ramp_time], [0, 1])
+
+
+class OptimizationResult:
+    """
+    Best kick strategy found by optimize_kick. parameters maps the names of
+    the optimized variables to their values and max_velocity is the foot
+    velocity they reach, re-evaluated with run_simulation. n_simulations
+    counts every simulated trajectory (including those used for finite
+    differences), n_batches the calls to batch_simulate; starts holds the
+    (parameters, max_velocity) reached from each start.
+    """
+
+    def __init__(self, parameters, max_velocity, n_simulations, n_batches,
+                 wall_time, starts):
+
+        self.parameters = parameters
+        self.max_velocity = max_velocity
+        self.n_simulations = n_simulations
+        self.n_batches = n_batches
+        self.wall_time = wall_time
+        self.starts = starts
+
+    def __repr__(self):
+        return 'OptimizationResult(max_velocity=%.4f, n_simulations=%d, wall_time=%.2fs)' % (
+            self.max_velocity, self.n_simulations, self.wall_time)
+
+
+class KickObjective:
+    """
+    Negative maximum foot velocity as a function of the decision variables,
+    with its gradient by forward finite differences. The base point and its
+    perturbations are integrated together as one batch by batch_simulate,
+    so they share the same adaptive steps and the differences are free of
+    step-size noise.
+    """
+
+    def __init__(self, T, names, fixed, force_length_regression,
+                 force_velocity_regression, step=FINITE_DIFFERENCE_STEP,
+                 bounds=None, rtol=RTOL, atol=ATOL):
+
+        self.T = T
+        self.names = names
+        self.fixed = fixed
+        self.force_length_regression = force_length_regression
+        self.force_velocity_regression = force_velocity_regression
+        self.step = step
+        self.bounds = bounds
+        self.rtol = rtol
+        self.atol = atol
+        self.n_simulations = 0
+        self.n_batches = 0
+
+    def parameters(self, x):
+        """
+        Full set of kick parameters for a decision vector.
+
+        :param x: values of the decision variables
+        :return parameters: dictionary of all OPTIMIZATION_PARAMETERS
+        """
+
+        parameters = dict(self.fixed)
+        parameters.update(zip(self.names, (float(value) for value in x)))
+
+        return parameters
+
+    def max_velocities(self, X):
+        """
+        Maximum foot velocities of a batch of decision vectors.
+
+        :param X: (B, n) decision vectors
+        :return max_velocity: (B,) maximum foot velocities
+        """
+
+        points = [self.parameters(x) for x in X]
+        initial_conditions = [[point['initial_theta'], 0, 1, 1, 1, 1] for point in points]
+        thigh_offsets = [point['thigh_offset'] for point in points]
+        patterns = [ActivationPattern([onset_activation(point[muscle + '_onset'])
+                                       for muscle in MUSCLES]) for point in points]
+
+        results = batch_simulate(self.T, initial_conditions, thigh_offsets,
+                                 lambda t: np.stack([pattern(t) for pattern in patterns]),
+                                 self.force_length_regression, self.force_velocity_regression,
+                                 rtol=self.rtol, atol=self.atol)
+
+        self.n_simulations += len(points)
+        self.n_batches += 1
+
+        return results['max_velocity']
+
+    def __call__(self, x):
+        """
+        Objective and gradient at x, from one batch of len(x) + 1 runs.
+
+        :param x: values of the decision variables
+        :return value: negative maximum foot velocity
+        :return gradient: gradient of value w.r.t. x
+        """
+
+        x = np.asarray(x, dtype=float)
+        steps = np.full(len(x), self.step)
+        # perturbations step backwards at the upper bounds
+        if self.bounds is not None:
+            steps[x + steps > np.array([upper for _, upper in self.bounds])] *= -1
+
+        X = np.vstack([x, x + np.diag(steps)])
+        values = -self.max_velocities(X)
+
+        return values[0], (values[1:] - values[0])/steps
+
+
+def optimize_kick(T=1, parameters=OPTIMIZATION_PARAMETERS, bounds=None, fixed=None,
+                  x0=None, n_starts=1, seed=None, maxiter=50,
+                  force_length_regression=None, force_velocity_regression=None):
+    """
+    Searches for the kick (initial knee angle, thigh offset and activation
+    onset of each muscle) with the largest maximum foot velocity, using
+    L-BFGS-B with batched finite-difference gradients. With n_starts > 1
+    the search is restarted from random points within the bounds (the first
+    start is x0, or the defaults described for fixed) and the best result
+    is kept, which guards against local optima.
+
+    The cost grows linearly with the number of parameters (one extra run
+    per parameter and gradient), where a grid search grows exponentially.
+
+    :param T: total time to simulate, in seconds
+    :param parameters: names of the OPTIMIZATION_PARAMETERS to optimize
+    :param bounds: dictionary of (lower, upper) bounds overriding
+        OPTIMIZATION_BOUNDS
+    :param fixed: values of the parameters that are not optimized, defaults
+        to the lower bound of the onsets and the centre of the others
+    :param x0: values to start the first search from
+    :param n_starts: number of starts of the multi-start search
+    :param seed: seed of the random starts
+    :param maxiter: maximum number of L-BFGS-B iterations per start
+    :param force_length_regression: function that regresses force from length
+    :param force_velocity_regression: function that regresses force from velocity
+    :return result: OptimizationResult
+    """
+
+    from scipy.optimize import minimize
+
+    names = tuple(parameters)
+    unknown = set(names) - set(OPTIMIZATION_PARAMETERS)
+    if unknown:
+        raise ValueError('unknown optimization parameters: %s' % ', '.join(sorted(unknown)))
+
+    all_bounds = dict(OPTIMIZATION_BOUNDS, **(bounds or {}))
+    search_bounds = [all_bounds[name] for name in names]
+    lower = np.array([low for low, _ in search_bounds], dtype=float)
+    upper = np.array([high for _, high in search_bounds], dtype=float)
+
+    defaults = {name: low if name.endswith('_onset') else 0.5*(low + high)
+                for name, (low, high) in all_bounds.items()}
+    defaults.update(fixed or {})
+
+    if force_length_regression is None:
+        force_length_regression = get_muscle_force_length_regression()
+    if force_velocity_regression is None:
+        force_velocity_regression = get_muscle_force_velocity_regression()
+
+    objective = KickObjective(T, names, defaults, force_length_regression,
+                              force_velocity_regression, bounds=search_bounds)
+
+    rng = np.random.default_rng(seed)
+    starts = [np.array([defaults[name] for name in names]) if x0 is None
+              else np.asarray(x0, dtype=float)]
+    starts += [rng.uniform(lower, upper) for _ in range(n_starts - 1)]
+
+    start_time = time.perf_counter()
+    outcomes = []
+    for start in starts:
+        solution = minimize(objective, start, jac=True, method='L-BFGS-B',
+                            bounds=search_bounds, options={'maxiter': maxiter})
+        outcomes.append((objective.parameters(solution.x), -solution.fun))
+
+    best_parameters, _ = max(outcomes, key=lambda outcome: outcome[1])
+
+    # the optimum is confirmed with the reference integrator
+    best = run_simulation(
+        T, [best_parameters['initial_theta'], 0, 1, 1, 1, 1], best_parameters['thigh_offset'],
+        *[onset_activation(best_parameters[muscle + '_onset']) for muscle in MUSCLES],
+        force_length_regression, force_velocity_regression)
+    wall_time = time.perf_counter() - start_time
+
+    return OptimizationResult(best_parameters, best.max_velocity,
+                              objective.n_simulations + 1, objective.n_batches,
+                              wall_time, outcomes)
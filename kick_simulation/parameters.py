@@ -0,0 +1,110 @@
+import numpy as np
+
+from .simulate import FEMORIS_MAX_FORCE, LATERALIS_MAX_FORCE, MEDIALIS_MAX_FORCE, \
+    INTERMEDIUS_MAX_FORCE, FEMORIS_MUSCLE_PERCENT, LATERALIS_MUSCLE_PERCENT, \
+    MEDIALIS_MUSCLE_PERCENT, INTERMEDIUS_MUSCLE_PERCENT, FEMORIS_TENDON_PERCENT, \
+    LATERALIS_TENDON_PERCENT, MEDIALIS_TENDON_PERCENT, INTERMEDIUS_TENDON_PERCENT, \
+    SHANK_LENGTH
+from .dynamics import KNEE_INERTIA, QUAD_MOMENT_ARM
+from .gravity_moment import SHANK_MASS, COM_DIST
+
+MUSCLES = ('femoris', 'lateralis', 'medialis', 'intermedius')
+# physical parameters of the model and their default values
+PARAMETER_DEFAULTS = {
+    'femoris_max_force': FEMORIS_MAX_FORCE,
+    'lateralis_max_force': LATERALIS_MAX_FORCE,
+    'medialis_max_force': MEDIALIS_MAX_FORCE,
+    'intermedius_max_force': INTERMEDIUS_MAX_FORCE,
+    'femoris_muscle_percent': FEMORIS_MUSCLE_PERCENT,
+    'lateralis_muscle_percent': LATERALIS_MUSCLE_PERCENT,
+    'medialis_muscle_percent': MEDIALIS_MUSCLE_PERCENT,
+    'intermedius_muscle_percent': INTERMEDIUS_MUSCLE_PERCENT,
+    'femoris_tendon_percent': FEMORIS_TENDON_PERCENT,
+    'lateralis_tendon_percent': LATERALIS_TENDON_PERCENT,
+    'medialis_tendon_percent': MEDIALIS_TENDON_PERCENT,
+    'intermedius_tendon_percent': INTERMEDIUS_TENDON_PERCENT,
+    'shank_length': SHANK_LENGTH,
+    'knee_inertia': KNEE_INERTIA,
+    'quad_moment_arm': QUAD_MOMENT_ARM,
+    'shank_mass': SHANK_MASS,
+    'com_distance': COM_DIST,
+}
+PARAMETER_NAMES = tuple(PARAMETER_DEFAULTS)
+
+class KickParameters:
+    """
+    Physical parameters of the knee-extension model, defaulting to the
+    module constants of simulate.py, dynamics.py and gravity_moment.py.
+    Every parameter is a scalar, or a (B,) array giving one value per
+    trajectory of a batch, so a whole sample of parameter sets can be
+    integrated by batch_simulate in one go.
+    """
+
+    def __init__(self, **values):
+
+        unknown = set(values) - set(PARAMETER_DEFAULTS)
+        if unknown:
+            raise ValueError('unknown model parameters: %s' % ', '.join(sorted(unknown)))
+
+        for name in PARAMETER_NAMES:
+            value = values.get(name, PARAMETER_DEFAULTS[name])
+            setattr(self, name, value if np.ndim(value) == 0 else np.asarray(value, dtype=float))
+
+    @classmethod
+    def from_array(cls, X, names):
+        """
+        Batch of parameter sets from the rows of a sample matrix; parameters
+        not in names keep their default.
+
+        :param X: (B, len(names)) parameter values
+        :param names: parameter names of the columns of X
+        :return parameters: KickParameters with (B,) arrays for names
+        """
+
+        X = np.atleast_2d(np.asarray(X, dtype=float))
+
+        return cls(**{name: X[:, i] for i, name in enumerate(names)})
+
+    def as_dict(self):
+        """
+        Parameter values keyed by name.
+
+        :return values: dictionary of all PARAMETER_NAMES
+        """
+
+        return {name: getattr(self, name) for name in PARAMETER_NAMES}
+
+    def take(self, index):
+        """
+        Parameter sets of a subset of the batch; scalar parameters are
+        shared and kept as they are.
+
+        :param index: integer indices or boolean mask into the batch
+        :return parameters: KickParameters of the subset
+        """
+
+        return KickParameters(**{name: value if np.ndim(value) == 0 else value[index]
+                                 for name, value in self.as_dict().items()})
+
+    def muscle_values(self, quantity):
+        """
+        Per-muscle values of a quantity, stacked along a trailing muscle axis.
+
+        :param quantity: 'max_force', 'muscle_percent' or 'tendon_percent'
+        :return values: (4,) or (B, 4) array in state-vector muscle order
+        """
+
+        return np.stack(np.broadcast_arrays(
+            *[getattr(self, muscle + '_' + quantity) for muscle in MUSCLES]), axis=-1)
+
+    def __repr__(self):
+        changed = ['%s=%r' % (name, value.tolist() if isinstance(value, np.ndarray) else value)
+                   for name, value in self.as_dict().items()
+                   if isinstance(value, np.ndarray) or value != PARAMETER_DEFAULTS[name]]
+        return 'KickParameters(%s)' % ', '.join(changed)
+
+    def __eq__(self, other):
+        return type(other) is type(self) and repr(other) == repr(self)
+
+    def __hash__(self):
+        return hash(repr(self))
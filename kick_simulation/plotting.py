@@ -0,0 +1,24 @@
+import numpy as np
+
+def plot_simulation(result):
+    """
+    Plots knee angle and foot velocity of a simulation over time. matplotlib
+    is only imported here, so that running simulations does not need it.
+
+    :param result: SimulationResult to plot
+    :return fig: figure with the angle and velocity subplots
+    """
+
+    import matplotlib.pyplot as plt
+
+    fig, axs = plt.subplots(2, 1, figsize=(8, 10))
+
+    axs[0].plot(result.time, result.theta*(180/np.pi), linewidth=1.5)
+    axs[0].set_ylabel('Thigh-Shank Angle (degree)')
+
+    axs[1].plot(result.time, result.velocity, linewidth=1.5)
+    axs[1].legend(loc='upper left')
+    axs[1].set_xlabel('Time (s)')
+    axs[1].set_ylabel('Velocity (m/s)')
+
+    return fig
@@ -0,0 +1,240 @@
+import hashlib
+import json
+import os
+import tempfile
+import types
+
+import numpy as np
+
+from .simulate import SimulationResult, run_simulation
+
+CACHE_VERSION = 3  # bump when simulation results change for the same inputs
+MAX_CACHE_BYTES = 1 << 30
+# lengths at which force-length regressions are sampled to fingerprint them
+FINGERPRINT_LENGTHS = np.linspace(0.3, 2.0, 35)
+
+def activation_descriptor(activation):
+    """
+    Returns a stable description of an activation profile, or None if it
+    has none. Profiles such as ConstantActivation describe themselves
+    through their repr; plain functions and lambdas cannot be described, so
+    simulations using them are not cached.
+
+    :param activation: activation function w.r.t time
+    :return descriptor: string describing the profile, or None
+    """
+
+    if isinstance(activation, (types.FunctionType, types.BuiltinFunctionType)) \
+            or type(activation).__repr__ is object.__repr__:
+        return None
+
+    return repr(activation)
+
+
+def simulation_key(T, initialCondition, thigh_offset, activations,
+                   force_length_regression, force_velocity_regression,
+                   tables=None, **solver_options):
+    """
+    Returns the content hash identifying a simulation, or None if one of its
+    activation profiles cannot be described. The force-length regression is
+    a function, so it is identified by its values on FINGERPRINT_LENGTHS.
+
+    :param T: total time to simulate, in seconds
+    :param initialCondition: initial state of thigh and muscles
+    :param thigh_offset: initial offset angle of thigh in radians
+    :param activations: activation functions of the four muscles
+    :param force_length_regression: function that regresses force from length
+    :param force_velocity_regression: function that regresses force from velocity
+    :param tables: optional MuscleTables of a tabulated simulation
+    :param solver_options: integrator settings passed to run_simulation
+    :return key: hex digest, or None
+    """
+
+    descriptors = [activation_descriptor(activation) for activation in activations]
+    if None in descriptors:
+        return None
+
+    description = json.dumps({
+        'version': CACHE_VERSION,
+        'T': float(T),
+        'initial_condition': [float(value) for value in initialCondition],
+        'thigh_offset': float(thigh_offset),
+        'activations': descriptors,
+        'tables': None if tables is None else tables.newton_steps,
+        'solver': {name: repr(value) for name, value in solver_options.items()},
+    }, sort_keys=True)
+
+    digest = hashlib.sha256(description.encode())
+    digest.update(np.asarray(force_length_regression(FINGERPRINT_LENGTHS), dtype=float).tobytes())
+    digest.update(np.asarray(force_velocity_regression, dtype=float).tobytes())
+
+    return digest.hexdigest()
+
+
+def save_result(path, result):
+    """
+    Saves a simulation result as a compressed .npz file. It is written to a
+    temporary file in the same directory and atomically renamed, so readers
+    in other processes never see a partial file. Trajectories that the
+    result does not have, as in a reductions-only run, are left out, and
+    the reductions are stored as JSON.
+
+    :param path: path of the .npz file
+    :param result: SimulationResult to save
+    """
+
+    trajectories = {name: value for name, value in (
+        ('time', result.time), ('theta', result.theta), ('velocity', result.velocity),
+        ('muscle_length', result.muscle_length)) if value is not None}
+    reductions = None if result.reductions is None else {
+        name: None if value is None else float(value)
+        for name, value in result.reductions.items()}
+
+    descriptor, temporary = tempfile.mkstemp(dir=os.path.dirname(path) or '.', suffix='.tmp')
+    try:
+        with os.fdopen(descriptor, 'wb') as file:
+            np.savez_compressed(
+                file, max_velocity=result.max_velocity,
+                termination=result.termination or '',
+                termination_time=np.nan if result.termination_time is None
+                                 else result.termination_time,
+                solver_stats=json.dumps(result.solver_stats),
+                reductions=json.dumps(reductions),
+                **trajectories)
+        os.replace(temporary, path)
+    except BaseException:
+        os.remove(temporary)
+        raise
+
+
+def load_result(path):
+    """
+    Loads a simulation result saved by save_result.
+
+    :param path: path of the .npz file
+    :return result: SimulationResult
+    """
+
+    with np.load(path) as data:
+        trajectories = {name: data[name] if name in data.files else None
+                        for name in ('time', 'theta', 'velocity', 'muscle_length')}
+        termination = str(data['termination']) or None
+        return SimulationResult(
+            trajectories['time'], trajectories['theta'], trajectories['velocity'],
+            float(data['max_velocity']), termination,
+            None if termination is None else float(data['termination_time']),
+            json.loads(str(data['solver_stats'])),
+            trajectories['muscle_length'],
+            json.loads(str(data['reductions'])))
+
+
+class SimulationCache:
+    """
+    Persistent, content-addressed store of simulation results. Each result
+    is one compressed .npz file named by the hash of everything that
+    determines it, so a repeated configuration is loaded instead of
+    simulated. Files are written to a temporary name and atomically renamed,
+    which makes the cache safe to share between worker processes; the least
+    recently used files are evicted once the cache exceeds max_bytes.
+    """
+
+    def __init__(self, directory, max_bytes=MAX_CACHE_BYTES):
+
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, key):
+        """
+        Location of the result file for a key.
+
+        :param key: simulation key
+        :return path: path of the .npz file
+        """
+
+        return os.path.join(self.directory, key + '.npz')
+
+    def load(self, key):
+        """
+        Loads a cached result and marks it as recently used.
+
+        :param key: simulation key
+        :return result: SimulationResult, or None if it is not cached
+        """
+
+        path = self.path(key)
+        try:
+            result = load_result(path)
+            os.utime(path)
+        except OSError:
+            # missing, or evicted/being replaced by another process
+            return None
+
+        return result
+
+    def store(self, key, result):
+        """
+        Stores a result under a key, then evicts old entries if needed.
+
+        :param key: simulation key
+        :param result: SimulationResult to store
+        """
+
+        save_result(self.path(key), result)
+
+        self.evict()
+
+    def evict(self):
+        """
+        Removes least recently used results until the cache fits max_bytes.
+        """
+
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.npz'):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def run(self, T, initialCondition, thigh_offset, get_femoris_activation,
+            get_lateralis_activation, get_medialis_activation, get_intermedius_activation,
+            force_length_regression, force_velocity_regression, tables=None,
+            **solver_options):
+        """
+        Returns the cached result of a simulation, running and storing it if
+        it is not cached yet. Takes the same arguments as run_simulation.
+
+        :return result: SimulationResult
+        """
+
+        activations = [get_femoris_activation, get_lateralis_activation,
+                       get_medialis_activation, get_intermedius_activation]
+        key = simulation_key(T, initialCondition, thigh_offset, activations,
+                             force_length_regression, force_velocity_regression,
+                             tables=tables, **solver_options)
+
+        if key is not None:
+            result = self.load(key)
+            if result is not None:
+                return result
+
+        result = run_simulation(T, initialCondition, thigh_offset, *activations,
+                                force_length_regression, force_velocity_regression,
+                                tables=tables, **solver_options)
+
+        if key is not None:
+            self.store(key, result)
+
+        return result
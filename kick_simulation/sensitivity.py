@@ -0,0 +1,308 @@
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import numpy as np
+
+from .batch_simulate import batch_simulate
+from .parameters import KickParameters, PARAMETER_DEFAULTS, PARAMETER_NAMES
+from .muscle_modelling.regression import get_muscle_force_length_regression,\
+                       get_muscle_force_velocity_regression
+
+RELATIVE_RANGE = 0.2  # parameters vary by +-20% around their defaults
+BATCH_SIZE = 512  # trajectories integrated together by batch_simulate
+BOOTSTRAP_SAMPLES = 200
+CONFIDENCE_LEVEL = 0.95
+MORRIS_LEVELS = 4
+# kick that is analysed: initial knee angle, thigh offset and activations
+KICK_DEFAULTS = {
+    'initial_theta': np.pi/4,
+    'thigh_offset': np.pi/6,
+    'activations': (1, 1, 1, 1),
+}
+
+# regressions of a worker process, set up once when the worker starts
+_regressions = None
+
+def parameter_bounds(names=PARAMETER_NAMES, relative_range=RELATIVE_RANGE):
+    """
+    Bounds of the parameters, a relative range around their defaults.
+
+    :param names: names of the KickParameters to vary
+    :param relative_range: half-width of the range, relative to the default
+    :return bounds: (d, 2) lower and upper bounds
+    """
+
+    defaults = np.array([PARAMETER_DEFAULTS[name] for name in names], dtype=float)
+
+    return np.stack([defaults*(1 - relative_range), defaults*(1 + relative_range)], axis=-1)
+
+
+def _init_worker():
+    """
+    Loads the regressions once per worker process.
+    """
+
+    global _regressions
+
+    _regressions = (get_muscle_force_length_regression(),
+                    get_muscle_force_velocity_regression())
+
+
+def _evaluate_batch(names, T, kick, X):
+    """
+    Maximum foot velocities of one batch of parameter sets.
+    """
+
+    if _regressions is None:
+        _init_worker()
+
+    initial_conditions = np.tile([kick['initial_theta'], 0, 1, 1, 1, 1], (len(X), 1))
+
+    return batch_simulate(T, initial_conditions, kick['thigh_offset'], kick['activations'],
+                          *_regressions,
+                          parameters=KickParameters.from_array(X, names))['max_velocity']
+
+
+def evaluate(X, names, T=1, kick=None, batch_size=BATCH_SIZE, workers=1, progress=False):
+    """
+    Maximum foot velocity of every parameter set of a sample. The sample is
+    split into batches of batch_size sets, each integrated in lockstep by
+    batch_simulate, so memory stays bounded for samples of tens of
+    thousands of runs; batches are spread over worker processes.
+
+    :param X: (n, d) parameter values, one row per run
+    :param names: parameter names of the columns of X
+    :param T: total time to simulate, in seconds
+    :param kick: initial_theta, thigh_offset and activations of the kick,
+        overriding KICK_DEFAULTS
+    :param batch_size: number of runs per batch
+    :param workers: number of worker processes, None for the CPU count;
+        1 runs the batches in this process
+    :param progress: show a progress bar over the batches
+    :return y: (n,) maximum foot velocities
+    """
+
+    from tqdm import tqdm
+
+    X = np.atleast_2d(np.asarray(X, dtype=float))
+    kick = dict(KICK_DEFAULTS, **(kick or {}))
+    batches = [X[start:start + batch_size] for start in range(0, len(X), batch_size)]
+    task = partial(_evaluate_batch, tuple(names), T, kick)
+
+    if workers == 1:
+        results = [task(batch) for batch in tqdm(batches, disable=not progress)]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+            results = list(tqdm(executor.map(task, batches),
+                                total=len(batches), disable=not progress))
+
+    return np.concatenate(results) if results else np.empty(0)
+
+
+def saltelli_sample(bounds, n, seed=None):
+    """
+    Saltelli sample for first-order and total Sobol indices: the rows of
+    two independent matrices A and B from a scrambled Sobol sequence, and of
+    the d matrices AB_i (A with column i taken from B), stacked as
+    [A, AB_1, ..., AB_d, B]. Powers of two for n keep the Sobol sequence
+    balanced.
+
+    :param bounds: (d, 2) lower and upper bounds
+    :param n: number of base samples
+    :param seed: seed of the scrambling
+    :return X: (n*(d + 2), d) sample
+    """
+
+    from scipy.stats import qmc
+
+    bounds = np.asarray(bounds, dtype=float)
+    d = len(bounds)
+
+    base = qmc.Sobol(2*d, scramble=True, seed=seed).random(n)
+    A, B = base[:, :d], base[:, d:]
+    AB = np.repeat(A[np.newaxis], d, axis=0)
+    AB[np.arange(d), :, np.arange(d)] = B.T
+
+    unit = np.concatenate([A[np.newaxis], AB, B[np.newaxis]]).reshape(-1, d)
+
+    return bounds[:, 0] + unit*(bounds[:, 1] - bounds[:, 0])
+
+
+def sobol_indices(y, d, n_bootstrap=BOOTSTRAP_SAMPLES, confidence=CONFIDENCE_LEVEL, seed=None):
+    """
+    First-order (Saltelli 2010) and total (Jansen) Sobol indices of the
+    outputs of a saltelli_sample, with bootstrap confidence intervals from
+    resampling the base rows.
+
+    :param y: (n*(d + 2),) outputs in saltelli_sample order
+    :param d: number of parameters
+    :param n_bootstrap: number of bootstrap resamples
+    :param confidence: confidence level of the intervals
+    :param seed: seed of the resampling
+    :return indices: dictionary with (d,) arrays S1 and ST, and (d, 2)
+        confidence intervals S1_conf and ST_conf
+    """
+
+    y = np.asarray(y, dtype=float).reshape(d + 2, -1)
+    n = y.shape[1]
+
+    def estimate(rows):
+        fA, fAB, fB = y[0][..., rows], y[1:-1][..., rows], y[-1][..., rows]
+        # rows may carry a leading bootstrap axis, moved in front of the
+        # parameter axis of fAB
+        fAB = np.moveaxis(fAB, 0, -2)
+        variance = np.var(np.concatenate([fA, fB], axis=-1), axis=-1)[..., np.newaxis]
+        first = np.mean(fB[..., np.newaxis, :]*(fAB - fA[..., np.newaxis, :]), axis=-1)/variance
+        total = 0.5*np.mean((fA[..., np.newaxis, :] - fAB)**2, axis=-1)/variance
+        return first, total
+
+    first, total = estimate(np.arange(n))
+    rng = np.random.default_rng(seed)
+    first_bootstrap, total_bootstrap = estimate(rng.integers(0, n, (n_bootstrap, n)))
+
+    tails = 100*np.array([(1 - confidence)/2, (1 + confidence)/2])
+
+    return {
+        'S1': first,
+        'ST': total,
+        'S1_conf': np.percentile(first_bootstrap, tails, axis=0).T,
+        'ST_conf': np.percentile(total_bootstrap, tails, axis=0).T,
+    }
+
+
+def morris_sample(bounds, r, levels=MORRIS_LEVELS, seed=None):
+    """
+    Morris one-at-a-time sample: r random trajectories of d + 1 points on a
+    levels-point grid, each step changing a single parameter by
+    delta = levels/(2*(levels - 1)) of its range.
+
+    :param bounds: (d, 2) lower and upper bounds
+    :param r: number of trajectories
+    :param levels: number of grid levels per parameter (even)
+    :param seed: seed of the trajectories
+    :return X: (r*(d + 1), d) sample
+    """
+
+    bounds = np.asarray(bounds, dtype=float)
+    d = len(bounds)
+    rng = np.random.default_rng(seed)
+    delta = levels/(2*(levels - 1))
+
+    # Morris (1991): B* = (J x* + delta/2*((2B - J) D* + J)) P*
+    lower_triangle = np.tril(np.ones((d + 1, d)), -1)
+    trajectories = np.empty((r, d + 1, d))
+    for k in range(r):
+        start = rng.integers(0, levels//2, d)/(levels - 1)
+        signs = np.diag(rng.choice([-1, 1], d))
+        permutation = np.eye(d)[rng.permutation(d)]
+        trajectories[k] = (start + delta/2*((2*lower_triangle - 1) @ signs + 1)) @ permutation
+
+    unit = trajectories.reshape(-1, d)
+
+    return bounds[:, 0] + unit*(bounds[:, 1] - bounds[:, 0])
+
+
+def morris_indices(X, y, bounds, n_bootstrap=BOOTSTRAP_SAMPLES, confidence=CONFIDENCE_LEVEL,
+                   seed=None):
+    """
+    Morris elementary-effect statistics of the outputs of a morris_sample:
+    mean mu, mean absolute value mu_star and standard deviation sigma of the
+    effects of each parameter, with a bootstrap confidence interval of
+    mu_star from resampling trajectories.
+
+    :param X: (r*(d + 1), d) sample from morris_sample
+    :param y: (r*(d + 1),) outputs
+    :param bounds: (d, 2) bounds the sample was drawn in
+    :param n_bootstrap: number of bootstrap resamples
+    :param confidence: confidence level of the interval
+    :param seed: seed of the resampling
+    :return indices: dictionary with (d,) arrays mu, mu_star and sigma, and
+        (d, 2) confidence interval mu_star_conf
+    """
+
+    bounds = np.asarray(bounds, dtype=float)
+    d = len(bounds)
+    unit = ((np.asarray(X, dtype=float) - bounds[:, 0])/(bounds[:, 1] - bounds[:, 0]))
+    unit = unit.reshape(-1, d + 1, d)
+    y = np.asarray(y, dtype=float).reshape(-1, d + 1)
+    r = len(y)
+
+    # each step of a trajectory changes exactly one parameter
+    steps = np.diff(unit, axis=1)
+    changed = np.argmax(np.abs(steps), axis=2)
+    step_sizes = np.take_along_axis(steps, changed[..., np.newaxis], axis=2)[..., 0]
+    effects = np.empty((r, d))
+    effects[np.arange(r)[:, np.newaxis], changed] = np.diff(y, axis=1)/step_sizes
+
+    rng = np.random.default_rng(seed)
+    resampled = np.mean(np.abs(effects[rng.integers(0, r, (n_bootstrap, r))]), axis=1)
+    tails = 100*np.array([(1 - confidence)/2, (1 + confidence)/2])
+
+    return {
+        'mu': np.mean(effects, axis=0),
+        'mu_star': np.mean(np.abs(effects), axis=0),
+        'sigma': np.std(effects, axis=0, ddof=1) if r > 1 else np.full(d, np.nan),
+        'mu_star_conf': np.percentile(resampled, tails, axis=0).T,
+    }
+
+
+def sobol_analysis(n=256, names=PARAMETER_NAMES, relative_range=RELATIVE_RANGE, T=1,
+                   kick=None, seed=None, **evaluate_options):
+    """
+    Sobol analysis of the maximum foot velocity w.r.t. the physical
+    parameters of the model, with n*(d + 2) runs.
+
+    :param n: number of base samples (a power of two)
+    :param names: names of the KickParameters to vary
+    :param relative_range: half-width of the parameter ranges, relative to
+        the defaults
+    :param T: total time to simulate, in seconds
+    :param kick: kick to analyse, overriding KICK_DEFAULTS
+    :param seed: seed of the sample and of the bootstrap
+    :param evaluate_options: passed to evaluate (batch_size, workers, ...)
+    :return analysis: sobol_indices, plus the parameter names, the number
+        of simulations and the wall time
+    """
+
+    start_time = time.perf_counter()
+    bounds = parameter_bounds(names, relative_range)
+    X = saltelli_sample(bounds, n, seed)
+    y = evaluate(X, names, T, kick, **evaluate_options)
+
+    analysis = sobol_indices(y, len(names), seed=seed)
+    analysis.update(names=tuple(names), n_simulations=len(X),
+                    wall_time=time.perf_counter() - start_time)
+
+    return analysis
+
+
+def morris_analysis(r=50, names=PARAMETER_NAMES, relative_range=RELATIVE_RANGE, T=1,
+                    kick=None, seed=None, levels=MORRIS_LEVELS, **evaluate_options):
+    """
+    Morris screening of the maximum foot velocity w.r.t. the physical
+    parameters of the model, with r*(d + 1) runs.
+
+    :param r: number of trajectories
+    :param names: names of the KickParameters to vary
+    :param relative_range: half-width of the parameter ranges, relative to
+        the defaults
+    :param T: total time to simulate, in seconds
+    :param kick: kick to analyse, overriding KICK_DEFAULTS
+    :param seed: seed of the sample and of the bootstrap
+    :param levels: number of grid levels per parameter
+    :param evaluate_options: passed to evaluate (batch_size, workers, ...)
+    :return analysis: morris_indices, plus the parameter names, the number
+        of simulations and the wall time
+    """
+
+    start_time = time.perf_counter()
+    bounds = parameter_bounds(names, relative_range)
+    X = morris_sample(bounds, r, levels, seed)
+    y = evaluate(X, names, T, kick, **evaluate_options)
+
+    analysis = morris_indices(X, y, bounds, seed=seed)
+    analysis.update(names=tuple(names), n_simulations=len(X),
+                    wall_time=time.perf_counter() - start_time)
+
+    return analysis
@@ -0,0 +1,469 @@
+import math
+from time import perf_counter
+import numpy as np
+
+from .muscle_length import quad_muscle_length
+from .muscle_modelling.hill_type_muscle import HillTypeMuscle
+from .muscle_modelling.muscle_group import MuscleGroup
+from .muscle_modelling.curves import tendon_force
+from .activation import ActivationPattern
+from . import instrumentation
+from .dynamics import dynamics, dynamics_jacobian, QUAD_MOMENT_ARM
+from .plotting import plot_simulation
+
+QUAD_REST_ANGLE = math.pi
+FEMORIS_MAX_FORCE = 3500
+LATERALIS_MAX_FORCE = 4000
+MEDIALIS_MAX_FORCE = 2500
+INTERMEDIUS_MAX_FORCE = 3000
+FEMORIS_TENDON_PERCENT = 0.2451
+FEMORIS_MUSCLE_PERCENT = 0.7549
+LATERALIS_TENDON_PERCENT = 0.2059
+LATERALIS_MUSCLE_PERCENT = 0.7941
+MEDIALIS_TENDON_PERCENT = 0.1181
+MEDIALIS_MUSCLE_PERCENT = 0.8819
+INTERMEDIUS_TENDON_PERCENT = 0.1572
+INTERMEDIUS_MUSCLE_PERCENT = 0.8428
+SHANK_LENGTH = 0.5048
+# default tolerances of the integrator (the defaults of scipy's odeint)
+RTOL = 1.49012e-8
+ATOL = 1.49012e-8
+# integrators supported by run_simulation, and those that use a Jacobian
+SOLVER_METHODS = ('LSODA', 'Radau', 'BDF', 'RK45', 'RK23', 'DOP853')
+IMPLICIT_METHODS = ('LSODA', 'Radau', 'BDF')
+# what run_simulation returns: trajectories sampled at given times, at every
+# integrator step, or only the scalar reductions
+OUTPUT_MODES = ('samples', 'steps', 'reductions')
+OUTPUT_POINTS = 100  # default number of evenly spaced output samples
+TERMINATIONS = ('extension', 'flexion')
+EVENT_TOLERANCE = 4*np.finfo(float).eps
+PEAK_SEARCH_POINTS = 5  # dense output samples per step searched for the velocity peak
+
+class SimulationResult:
+    """
+    Numeric output of a simulation: samples of time, knee angle and foot
+    velocity up to the point the knee leaves its valid range, and the
+    maximum foot velocity reached. If the knee reached the end of its range,
+    termination is 'extension' (theta = pi) or 'flexion' (theta = 0) and
+    termination_time is the exact time it got there; otherwise both are None.
+    solver_stats reports the integrator and its evaluation counts (nfev RHS
+    evaluations, njev Jacobian evaluations, nlu LU decompositions).
+    muscle_length holds the (n, 4) normalized CE lengths at the samples.
+
+    reductions holds scalars accumulated over every integrator step rather
+    than the samples: max_velocity and max_velocity_time, extension_time,
+    max_muscle_force (total quadricep tendon force, N) and muscle_impulse
+    (its time integral, N s). A reductions-only run has no samples, so its
+    trajectories are None. max_velocity is the peak searched on the dense
+    output of every step, the same in every output mode (see run_simulation).
+
+    instrumentation is the run's RunReport if instrumentation was enabled.
+    """
+
+    def __init__(self, time, theta, velocity, max_velocity,
+                 termination=None, termination_time=None, solver_stats=None,
+                 muscle_length=None, reductions=None):
+
+        self.time = time
+        self.theta = theta
+        self.velocity = velocity
+        self.max_velocity = max_velocity
+        self.termination = termination
+        self.termination_time = termination_time
+        self.solver_stats = solver_stats
+        self.muscle_length = muscle_length
+        self.reductions = reductions
+        self.instrumentation = None
+
+    @property
+    def extension_time(self):
+        """
+        Time taken to reach full extension, None if it was never reached.
+        """
+
+        return self.termination_time if self.termination == 'extension' else None
+
+    def as_dict(self):
+        """
+        Results in the dictionary layout returned by simulate().
+
+        :return results: dictionary of simulation results
+        """
+
+        return {
+            "max_velocity" : self.max_velocity,
+            "time" : self.time,
+            "theta" : self.theta,
+            "velocity": self.velocity,
+        }
+
+
+def simulate(T, initialCondition, thigh_offset, get_femoris_activation, 
+                get_lateralis_activation, get_medialis_activation, get_intermedius_activation, 
+                force_length_regression, force_velocity_regression, tables=None,
+                times=None):
+    """
+    Runs a simulation of the model and plots results.
+
+    :param T: total time to simulate, in seconds
+    :param initialCondition: initial state of thigh and muscles
+    :param thigh_offset: initial offset angle of thigh in radians
+    :param get_femoris_activation: femoris activation function w.r.t time
+    :param get_lateralis_activation: lateralis activation function w.r.t time
+    :param get_medialis_activation: medialis activation function w.r.t time
+    :param get_intermedius_activation: intermedius activation function w.r.t time
+    :param force_length_regression: function that regresses force from length
+    :param force_velocity_regression: function that regresses force from velocity
+    :param tables: optional MuscleTables built once from the regressions, runs
+        the simulation in tabulated mode (table lookups instead of root solves)
+    :param times: times to sample the trajectory at, OUTPUT_POINTS evenly
+        spaced samples of [0, T] if None
+    :return fig: figure of knee angle and foot velocity over time
+    :return results: dictionary of simulation results
+    """
+
+    result = run_simulation(T, initialCondition, thigh_offset, get_femoris_activation,
+                get_lateralis_activation, get_medialis_activation, get_intermedius_activation,
+                force_length_regression, force_velocity_regression, tables=tables,
+                times=times)
+
+    return plot_simulation(result), result.as_dict()
+
+
+def run_simulation(T, initialCondition, thigh_offset, get_femoris_activation,
+                get_lateralis_activation, get_medialis_activation, get_intermedius_activation,
+                force_length_regression, force_velocity_regression, tables=None,
+                method='LSODA', rtol=RTOL, atol=ATOL, max_step=np.inf,
+                first_step=None, jacobian=True, moment_arm=QUAD_MOMENT_ARM,
+                parameters=None, output='samples', times=None):
+    """
+    Runs a simulation of the model without plotting, so that it can run on
+    headless machines and in sweeps that only need the numbers.
+
+    :param T: total time to simulate, in seconds
+    :param initialCondition: initial state of thigh and muscles
+    :param thigh_offset: initial offset angle of thigh in radians
+    :param get_femoris_activation: femoris activation function w.r.t time
+    :param get_lateralis_activation: lateralis activation function w.r.t time
+    :param get_medialis_activation: medialis activation function w.r.t time
+    :param get_intermedius_activation: intermedius activation function w.r.t time
+    :param force_length_regression: function that regresses force from length
+    :param force_velocity_regression: function that regresses force from velocity
+    :param tables: optional MuscleTables built once from the regressions, runs
+        the simulation in tabulated mode (table lookups instead of root solves)
+    :param method: integrator, one of SOLVER_METHODS; LSODA switches between
+        stiff and non-stiff methods, Radau and BDF are implicit stiff
+        methods and RK45, RK23 and DOP853 are explicit Runge-Kutta methods
+    :param rtol: relative tolerance of the integrator
+    :param atol: absolute tolerance of the integrator
+    :param max_step: largest step the integrator may take, in seconds
+    :param first_step: initial step size, chosen by the integrator if None
+    :param jacobian: supply the analytic Jacobian to implicit integrators,
+        otherwise they estimate it by finite differences
+    :param moment_arm: constant moment arm of the quadricep in meters, or
+        None to use the angle-dependent moment arm of the muscle path
+    :param parameters: optional KickParameters replacing the physical
+        constants of the model; a constant moment arm then comes from its
+        quad_moment_arm
+    :param output: 'samples' samples the trajectory at times, 'steps' at
+        every integrator step and 'reductions' keeps no trajectory at all,
+        only the reductions accumulated while integrating
+    :param times: sorted sample times within [0, T] for 'samples' output,
+        OUTPUT_POINTS evenly spaced samples if None
+    :return result: SimulationResult; its max_velocity is
+        reductions['max_velocity'], the peak of the foot velocity on the
+        dense output of every integrator step up to the boundary crossing,
+        so it is the same in every output mode and whatever sample times a
+        caller asks for, and no sample exceeds it
+    """
+
+    if method not in SOLVER_METHODS:
+        raise ValueError('unknown integrator %r, expected one of %s'
+                         % (method, ', '.join(SOLVER_METHODS)))
+
+    if not 0 <= initialCondition[0] <= np.pi:
+        raise ValueError('initial knee angle %r is outside [0, pi]' % (initialCondition[0],))
+
+    rest_quad_muscle_length = quad_muscle_length(QUAD_REST_ANGLE, thigh_offset)
+    rest_length_femoris = rest_quad_muscle_length
+    rest_length_lateralis = rest_quad_muscle_length
+    rest_length_medialis = rest_quad_muscle_length
+    rest_length_intermedius = rest_quad_muscle_length
+
+    femoris = HillTypeMuscle(
+                FEMORIS_MAX_FORCE, 
+                FEMORIS_MUSCLE_PERCENT*rest_length_femoris, 
+                FEMORIS_TENDON_PERCENT*rest_length_femoris)
+    lateralis = HillTypeMuscle(
+                LATERALIS_MAX_FORCE, 
+                LATERALIS_MUSCLE_PERCENT*rest_length_lateralis, 
+                LATERALIS_TENDON_PERCENT*rest_length_lateralis)
+    medialis = HillTypeMuscle(
+                MEDIALIS_MAX_FORCE, 
+                MEDIALIS_MUSCLE_PERCENT*rest_length_medialis, 
+                MEDIALIS_TENDON_PERCENT*rest_length_medialis)
+    intermedius = HillTypeMuscle(
+                INTERMEDIUS_MAX_FORCE, 
+                INTERMEDIUS_MUSCLE_PERCENT*rest_length_intermedius, 
+                INTERMEDIUS_TENDON_PERCENT*rest_length_intermedius)
+
+    # the four heads are integrated as one vectorized muscle group
+    muscles = MuscleGroup.from_muscles([femoris, lateralis, medialis, intermedius])
+    shank_length = SHANK_LENGTH
+    if parameters is not None:
+        muscles = MuscleGroup(
+            parameters.muscle_values('max_force'),
+            parameters.muscle_values('muscle_percent')*rest_quad_muscle_length,
+            parameters.muscle_values('tendon_percent')*rest_quad_muscle_length)
+        shank_length = parameters.shank_length
+        if moment_arm is not None:
+            moment_arm = parameters.quad_moment_arm
+    # activation profiles are evaluated for all four heads at once
+    get_activations = ActivationPattern([get_femoris_activation, get_lateralis_activation,
+                                         get_medialis_activation, get_intermedius_activation])
+
+    # consecutive RHS evaluations are close in state, so the last CE
+    # velocities solved for are an excellent starting point for the next solve
+    muscle_velocity = None
+
+    def f(t, x):
+        """
+        Analytical Equation to Use in Solver
+        """
+
+        nonlocal muscle_velocity
+        activations = get_activations(t)
+
+        x_dot = dynamics(x, thigh_offset, muscles, activations,
+             force_length_regression, force_velocity_regression,
+             tables=tables, moment_arm=moment_arm, parameters=parameters,
+             vm0=muscle_velocity)
+        muscle_velocity = x_dot[2:]
+
+        return x_dot
+
+    def jac(t, x):
+        """
+        Analytical Jacobian of the equation for implicit solvers
+        """
+
+        activations = get_activations(t)
+
+        return dynamics_jacobian(x, thigh_offset, muscles, activations,
+             force_length_regression, force_velocity_regression,
+             tables=tables, moment_arm=moment_arm, parameters=parameters,
+             vm0=muscle_velocity)
+
+    # explicit methods take no Jacobian (scipy warns if one is given)
+    options = {'max_step': max_step}
+    if first_step is not None:
+        options['first_step'] = first_step
+    if jacobian and method in IMPLICIT_METHODS:
+        options['jac'] = jac
+
+    if output not in OUTPUT_MODES:
+        raise ValueError('unknown output mode %r, expected one of %s'
+                         % (output, ', '.join(OUTPUT_MODES)))
+
+    if times is None:
+        times = np.linspace(0, T, OUTPUT_POINTS)
+    times = np.asarray(times, dtype=float)
+    if np.any(np.diff(times) < 0) or np.any((times < 0) | (times > T)):
+        raise ValueError('output times must be sorted and within [0, T]')
+
+    def muscle_force(x):
+        """
+        Total tendon force of the quadricep at a state
+        """
+
+        lt = muscles.norm_tendon_length(quad_muscle_length(x[0], thigh_offset), x[2:])
+        forces = tendon_force(lt) if tables is None else tables.force_length_tendon(lt)
+
+        return float(np.sum(muscles.f0M*forces))
+
+    # with instrumentation enabled, the run records a report of its RHS
+    # evaluations, root solves and steps
+    report, previous_recorder = instrumentation.begin_run()
+    start = perf_counter()
+    solver = None
+    try:
+        # reductions are updated at every accepted step, so no trajectory has
+        # to be kept to compute them
+        solver = _solver_class(method)(f, 0.0, initialCondition, float(T), rtol=rtol, atol=atol,
+                                 **options)
+        force = muscle_force(solver.y)
+        reductions = {
+            'max_velocity': float(shank_length*solver.y[1]),
+            'max_velocity_time': 0.0,
+            'extension_time': None,
+            'max_muscle_force': force,
+            'muscle_impulse': 0.0,
+        }
+
+        def reduce(t, x, t_previous, force_previous, peak):
+            peak_time, peak_omega = peak
+            velocity = float(shank_length*peak_omega)
+            if velocity > reductions['max_velocity']:
+                reductions['max_velocity'] = velocity
+                reductions['max_velocity_time'] = float(peak_time)
+            force = muscle_force(x)
+            reductions['max_muscle_force'] = max(reductions['max_muscle_force'], force)
+            reductions['muscle_impulse'] += 0.5*(force + force_previous)*(t - t_previous)
+            return force
+
+        # integration stops as soon as the knee leaves [0, pi], i.e. at the
+        # first crossing of theta = pi upwards (full extension) or theta = 0
+        # downwards (full flexion), located on the step's dense output
+        boundaries = np.array([np.pi, 0.0])
+        directions = np.array([1, -1])
+        g = solver.y[0] - boundaries
+
+        ts = [np.array([solver.t])] if output == 'steps' else []
+        ys = [solver.y[:, np.newaxis]] if output == 'steps' else []
+        sample = 0
+        termination = None
+        termination_time = None
+
+        while solver.status == 'running':
+            t_previous = solver.t
+            nfev_previous = solver.nfev
+            message = solver.step()
+            if solver.status == 'failed':
+                raise RuntimeError('integration failed: %s' % message)
+            if report is not None:
+                report.step(solver.t - t_previous, solver.nfev - nfev_previous)
+
+            t, y = solver.t, solver.y
+            dense = solver.dense_output()
+
+            g_new = y[0] - boundaries
+            crossed = np.flatnonzero(((g <= 0) & (g_new >= 0) & (directions > 0))
+                                     | ((g >= 0) & (g_new <= 0) & (directions < 0)))
+            g = g_new
+            if len(crossed) > 0:
+                roots = [_locate_crossing(dense, boundaries[i], t_previous, t) for i in crossed]
+                first = int(np.argmin(roots))
+                termination = TERMINATIONS[crossed[first]]
+                t = termination_time = roots[first]
+                y = dense(t)
+
+            # the peak is searched over the whole step, and the samples taken
+            # in it are candidates too, so no sample exceeds max_velocity
+            peak = _step_peak(dense, t_previous, t, y)
+
+            if output == 'steps':
+                ts.append(np.array([t]))
+                ys.append(y[:, np.newaxis])
+            elif output == 'samples':
+                sample_new = np.searchsorted(times, t, side='right')
+                if sample_new > sample:
+                    step_samples = dense(times[sample:sample_new])
+                    ts.append(times[sample:sample_new])
+                    ys.append(step_samples)
+                    best = int(np.argmax(step_samples[1]))
+                    if step_samples[1, best] > peak[1]:
+                        peak = (times[sample + best], step_samples[1, best])
+                    sample = sample_new
+                # the located boundary crossing is kept as the final sample
+                if termination is not None:
+                    ts.append(np.array([t]))
+                    ys.append(y[:, np.newaxis])
+
+            force = reduce(t, y, t_previous, force, peak)
+
+            if termination is not None:
+                break
+    finally:
+        instrumentation.end_run(report, previous_recorder, solver, perf_counter() - start)
+
+    if termination == 'extension':
+        reductions['extension_time'] = termination_time
+
+    solver_stats = {
+        'method': method,
+        'nfev': int(solver.nfev),
+        'njev': int(solver.njev),
+        'nlu': int(solver.nlu),
+    }
+
+    if output == 'reductions':
+        result = SimulationResult(None, None, None, reductions['max_velocity'],
+                                  termination, termination_time, solver_stats,
+                                  reductions=reductions)
+        result.instrumentation = report
+        return result
+
+    time = np.concatenate(ts)
+    y = np.hstack(ys).T
+
+    theta = y[:,0]
+    foot_velocity = shank_length*y[:, 1]
+
+    result = SimulationResult(time, theta, foot_velocity, reductions['max_velocity'],
+                              termination, termination_time, solver_stats, y[:, 2:],
+                              reductions)
+    result.instrumentation = report
+
+    return result
+
+
+def _solver_class(method):
+    """
+    scipy OdeSolver class of an integrator. scipy.integrate takes about half
+    a second to import, so it is only imported once a simulation runs.
+
+    :param method: one of SOLVER_METHODS
+    :return solver_class: subclass of scipy.integrate.OdeSolver
+    """
+
+    import scipy.integrate
+
+    return getattr(scipy.integrate, method)
+
+
+def _step_peak(dense, t_start, t_end, y_end):
+    """
+    Time and value of the largest angular velocity within a step. The dense
+    output is sampled at PEAK_SEARCH_POINTS times, and a peak inside the
+    step is refined with a bounded scalar search.
+
+    :param dense: dense output of the step
+    :param t_start: start of the step
+    :param t_end: end of the step, or the boundary crossing within it
+    :param y_end: state at t_end
+    :return t: time of the peak
+    :return omega: angular velocity at the peak
+    """
+
+    from scipy.optimize import minimize_scalar
+
+    ts = np.linspace(t_start, t_end, PEAK_SEARCH_POINTS)
+    omega = dense(ts)[1]
+    omega[-1] = y_end[1]
+    peak = int(np.argmax(omega))
+    if 0 < peak < len(ts) - 1:
+        search = minimize_scalar(lambda t: -dense(t)[1], bounds=(ts[peak - 1], ts[peak + 1]),
+                                 method='bounded', options={'xatol': 1e-9*(t_end - t_start)})
+        if -search.fun > omega[peak]:
+            return float(search.x), float(-search.fun)
+
+    return float(ts[peak]), float(omega[peak])
+
+
+def _locate_crossing(dense, boundary, t_start, t_end):
+    """
+    Time at which the knee angle crosses a boundary within a step, found
+    with brentq on the step's dense output at the tolerance solve_ivp uses
+    for events.
+
+    :param dense: dense output of the step
+    :param boundary: knee angle being crossed
+    :param t_start: start of the step
+    :param t_end: end of the step
+    :return t: crossing time
+    """
+
+    from scipy.optimize import brentq
+
+    return brentq(lambda t: dense(t)[0] - boundary, t_start, t_end,
+                  xtol=EVENT_TOLERANCE, rtol=EVENT_TOLERANCE)
@@ -0,0 +1,298 @@
+import numpy as np
+
+from .batch_simulate import batch_simulate
+from .muscle_modelling.regression import get_muscle_force_length_regression,\
+                       get_muscle_force_velocity_regression
+
+# inputs of the surrogate; activations are constant levels
+SURROGATE_PARAMETERS = (
+    'initial_theta',
+    'thigh_offset',
+    'femoris_activation',
+    'lateralis_activation',
+    'medialis_activation',
+    'intermedius_activation',
+)
+SURROGATE_BOUNDS = {
+    'initial_theta': (0, np.pi/2),
+    'thigh_offset': (-np.pi/4, np.pi/3),
+    'femoris_activation': (0, 1),
+    'lateralis_activation': (0, 1),
+    'medialis_activation': (0, 1),
+    'intermedius_activation': (0, 1),
+}
+SURROGATE_METHODS = ('gp', 'polynomial')
+VALIDATION_FRACTION = 0.2
+MAX_STD = 0.5  # predicted standard deviation (m/s) above which the simulator is used
+POLYNOMIAL_DEGREE = 4
+SIMULATION_TIME = 1
+
+def simulate_max_velocity(X, T=SIMULATION_TIME, force_length_regression=None,
+                          force_velocity_regression=None):
+    """
+    Maximum foot velocities of a batch of surrogate inputs, simulated in
+    lockstep with batch_simulate.
+
+    :param X: (B, 6) inputs in SURROGATE_PARAMETERS order
+    :param T: total time to simulate, in seconds
+    :param force_length_regression: function that regresses force from length
+    :param force_velocity_regression: function that regresses force from velocity
+    :return max_velocity: (B,) maximum foot velocities
+    """
+
+    if force_length_regression is None:
+        force_length_regression = get_muscle_force_length_regression()
+    if force_velocity_regression is None:
+        force_velocity_regression = get_muscle_force_velocity_regression()
+
+    X = np.atleast_2d(np.asarray(X, dtype=float))
+    initial_conditions = np.zeros((len(X), 6))
+    initial_conditions[:, 0] = X[:, 0]
+    initial_conditions[:, 2:] = 1
+
+    return batch_simulate(T, initial_conditions, X[:, 1], X[:, 2:],
+                          force_length_regression, force_velocity_regression)['max_velocity']
+
+
+class Surrogate:
+    """
+    Fast emulator of the maximum foot velocity as a function of initial
+    knee angle, thigh offset and the four (constant) muscle activations,
+    trained on batched simulation results.
+
+    The 'gp' method fits a Gaussian process with an anisotropic RBF kernel
+    and a noise term, and predicts its standard deviation; the 'polynomial'
+    method fits a ridge-regularized polynomial and uses its validation RMSE
+    as a constant uncertainty. Inputs are scaled to the unit box spanned by
+    bounds. query() answers from the emulator inside the trained domain and
+    falls back to the simulator outside it, or where the uncertainty exceeds
+    max_std.
+
+    validation holds the RMSE, maximum absolute error and R^2 on a hold-out
+    set that is not used for training.
+    """
+
+    def __init__(self, method='gp', bounds=None, max_std=MAX_STD, T=SIMULATION_TIME,
+                 degree=POLYNOMIAL_DEGREE):
+
+        if method not in SURROGATE_METHODS:
+            raise ValueError('method must be one of %s, got %r'
+                             % (', '.join(SURROGATE_METHODS), method))
+
+        bounds = dict(SURROGATE_BOUNDS, **(bounds or {}))
+        self.method = method
+        self.lower = np.array([bounds[name][0] for name in SURROGATE_PARAMETERS], dtype=float)
+        self.upper = np.array([bounds[name][1] for name in SURROGATE_PARAMETERS], dtype=float)
+        self.max_std = max_std
+        self.T = T
+        self.degree = degree
+        self.model = None
+        self.validation = None
+        self.n_simulations = 0
+
+    def sample(self, n, seed=None):
+        """
+        Latin hypercube sample of the trained domain.
+
+        :param n: number of points
+        :param seed: seed of the sample
+        :return X: (n, 6) inputs
+        """
+
+        from scipy.stats import qmc
+
+        unit = qmc.LatinHypercube(d=len(SURROGATE_PARAMETERS), seed=seed).random(n)
+
+        return self.lower + unit*(self.upper - self.lower)
+
+    def fit(self, X=None, y=None, n=200, seed=None,
+            validation_fraction=VALIDATION_FRACTION):
+        """
+        Trains the emulator. Without X and y, n inputs are sampled and
+        simulated in one batch.
+
+        :param X: (n, 6) inputs in SURROGATE_PARAMETERS order
+        :param y: (n,) maximum foot velocities of X
+        :param n: number of training runs when X is not given
+        :param seed: seed of the sample and of the validation split
+        :param validation_fraction: fraction of runs held out for validation
+        :return self: the trained surrogate
+        """
+
+        if X is None:
+            X = self.sample(n, seed)
+        X = np.atleast_2d(np.asarray(X, dtype=float))
+        if y is None:
+            y = simulate_max_velocity(X, self.T)
+            self.n_simulations += len(X)
+        y = np.asarray(y, dtype=float)
+
+        # runs that never started (e.g. outside [0, pi]) carry no information
+        valid = np.isfinite(y)
+        X, y = X[valid], y[valid]
+
+        rng = np.random.default_rng(seed)
+        order = rng.permutation(len(X))
+        n_validation = int(round(validation_fraction*len(X)))
+        held_out, train = order[:n_validation], order[n_validation:]
+
+        # the GP is fitted to standardized targets, so its kernel amplitude
+        # and noise bounds do not depend on the scale of the velocities
+        self._y_mean = 0.0
+        self._y_std = 1.0
+        if self.method == 'gp':
+            self._y_mean = float(np.mean(y[train]))
+            self._y_std = float(np.std(y[train])) or 1.0
+
+        self.model = self._build_model()
+        self.model.fit(self._scale(X[train]), (y[train] - self._y_mean)/self._y_std)
+        self._compile()
+
+        if n_validation > 0:
+            error = self.predict(X[held_out]) - y[held_out]
+            self.validation = {
+                'rmse': float(np.sqrt(np.mean(error**2))),
+                'max_error': float(np.max(np.abs(error))),
+                'r2': float(1 - np.sum(error**2)/np.sum((y[held_out] - np.mean(y[held_out]))**2)),
+                'n_validation': int(n_validation),
+            }
+        else:
+            self.validation = None
+
+        return self
+
+    def _build_model(self):
+        """
+        Untrained scikit-learn estimator of the chosen method.
+        """
+
+        if self.method == 'gp':
+            from sklearn.gaussian_process import GaussianProcessRegressor
+            from sklearn.gaussian_process.kernels import ConstantKernel, RBF, WhiteKernel
+
+            kernel = ConstantKernel(1.0)*RBF(length_scale=np.ones(len(SURROGATE_PARAMETERS)),
+                                             length_scale_bounds=(1e-2, 1e2)) \
+                + WhiteKernel(1e-4, noise_level_bounds=(1e-8, 1e-1))
+            return GaussianProcessRegressor(kernel, normalize_y=False, n_restarts_optimizer=2,
+                                            random_state=0)
+
+        from sklearn.pipeline import make_pipeline
+        from sklearn.preprocessing import PolynomialFeatures
+        from sklearn.linear_model import Ridge
+
+        return make_pipeline(PolynomialFeatures(self.degree), Ridge(alpha=1e-6))
+
+    def _compile(self):
+        """
+        Extracts the trained GP into plain arrays, so that predictions are a
+        kernel evaluation and a dot product without scikit-learn's per-call
+        overhead. The predictive variance k** - |L^-1 k*|^2 uses the inverse
+        of the Cholesky factor L of the training kernel, precomputed here,
+        so it takes one more matmul.
+        """
+
+        if self.method != 'gp':
+            return
+
+        from scipy.linalg import solve_triangular
+
+        kernel = self.model.kernel_
+        self._length_scale = np.asarray(kernel.k1.k2.length_scale, dtype=float)
+        self._amplitude = float(kernel.k1.k1.constant_value)
+        self._prior_variance = self._amplitude + float(kernel.k2.noise_level)
+        self._train = self.model.X_train_/self._length_scale
+        self._train_norms = np.sum(self._train**2, axis=1)
+        self._alpha = self.model.alpha_.ravel()*self._y_std*self._amplitude
+        L_inverse = solve_triangular(self.model.L_, np.eye(len(self._train)), lower=True)
+        self._whitening = self._amplitude*L_inverse.T
+
+    def _correlation(self, Z):
+        """
+        RBF correlations between scaled inputs and the training inputs.
+        """
+
+        # -|z - z_i|^2/2 = z.z_i - |z_i|^2/2 - |z|^2/2, so the kernel
+        # matrix takes one matmul and one exp, all in place
+        Z = Z/self._length_scale
+        kernel = Z @ self._train.T
+        kernel -= 0.5*self._train_norms
+        kernel -= 0.5*np.sum(Z**2, axis=1)[:, np.newaxis]
+        np.minimum(kernel, 0, out=kernel)
+        np.exp(kernel, out=kernel)
+
+        return kernel
+
+    def _scale(self, X):
+        return (X - self.lower)/(self.upper - self.lower)
+
+    def predict(self, X, return_std=False):
+        """
+        Emulated maximum foot velocities.
+
+        :param X: (n, 6) inputs in SURROGATE_PARAMETERS order
+        :param return_std: also return the predicted standard deviation
+        :return max_velocity: (n,) predicted maximum foot velocities
+        :return std: (n,) predicted standard deviation, if requested
+        """
+
+        if self.model is None:
+            raise RuntimeError('the surrogate has not been trained, call fit() first')
+
+        Z = self._scale(np.atleast_2d(np.asarray(X, dtype=float)))
+
+        if self.method == 'gp':
+            kernel = self._correlation(Z)
+            prediction = self._y_mean + kernel @ self._alpha
+            if not return_std:
+                return prediction
+            projection = kernel @ self._whitening
+            variance = self._prior_variance - np.einsum('ij,ij->i', projection, projection)
+            return prediction, self._y_std*np.sqrt(np.maximum(variance, 0))
+
+        prediction = self.model.predict(Z)
+        if return_std:
+            rmse = np.inf if self.validation is None else self.validation['rmse']
+            return prediction, np.full(len(prediction), rmse)
+        return prediction
+
+    def contains(self, X):
+        """
+        Which inputs lie inside the trained domain.
+
+        :param X: (n, 6) inputs in SURROGATE_PARAMETERS order
+        :return inside: (n,) boolean mask
+        """
+
+        X = np.atleast_2d(np.asarray(X, dtype=float))
+
+        return np.all((X >= self.lower) & (X <= self.upper), axis=1)
+
+    def query(self, X):
+        """
+        Maximum foot velocities from the emulator where it is trustworthy,
+        and from the simulator where the input lies outside the trained
+        domain or the predicted standard deviation exceeds max_std.
+
+        :param X: (n, 6) inputs in SURROGATE_PARAMETERS order
+        :return max_velocity: (n,) maximum foot velocities
+        :return simulated: (n,) mask of the inputs that were simulated
+        """
+
+        X = np.atleast_2d(np.asarray(X, dtype=float))
+        max_velocity = np.full(len(X), np.nan)
+        simulated = ~self.contains(X)
+
+        inside = np.flatnonzero(~simulated)
+        if len(inside) > 0 and np.isinf(self.max_std):
+            # no uncertainty threshold, so the standard deviation is not needed
+            max_velocity[inside] = self.predict(X[inside])
+        elif len(inside) > 0:
+            prediction, std = self.predict(X[inside], return_std=True)
+            max_velocity[inside] = prediction
+            simulated[inside[std > self.max_std]] = True
+
+        if simulated.any():
+            max_velocity[simulated] = simulate_max_velocity(X[simulated], self.T)
+            self.n_simulations += int(np.sum(simulated))
+
+        return max_velocity, simulated
@@ -0,0 +1,428 @@
+import itertools
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import numpy as np
+
+from .simulate import run_simulation
+from .result_cache import SimulationCache
+from .trajectory_store import TrajectoryStore, TrajectoryWriter
+from .checkpoint import SweepCheckpoint, point_key
+from . import instrumentation
+from .muscle_modelling.regression import get_muscle_force_length_regression,\
+                       get_muscle_force_velocity_regression
+from .activation import ConstantActivation
+
+# parameters of a sweep point, in the order the grid is expanded
+SWEEP_PARAMETERS = (
+    'initial_theta',
+    'thigh_offset',
+    'femoris_activation',
+    'lateralis_activation',
+    'medialis_activation',
+    'intermedius_activation',
+)
+SWEEP_DEFAULTS = {
+    'initial_theta': 0,
+    'initial_velocity': 0,
+    'thigh_offset': 0,
+    'femoris_activation': ConstantActivation(1),
+    'lateralis_activation': ConstantActivation(1),
+    'medialis_activation': ConstantActivation(1),
+    'intermedius_activation': ConstantActivation(1),
+}
+
+ADAPTIVE_BUDGET = 100  # maximum number of simulations of an adaptive sweep
+ADAPTIVE_TOLERANCE = 0.5  # max_velocity variation (m/s) below which cells are kept
+ADAPTIVE_MAX_DEPTH = 8
+POLL_INTERVAL = 5  # seconds between checks for points claimed by other processes
+
+# regressions, result cache, trajectory writer and checkpoint of a worker
+# process, set up once when the worker starts
+_regressions = None
+_cache = None
+_writer = None
+_checkpoint = None
+
+def parameter_grid(**values):
+    """
+    Expands a declarative parameter grid into sweep points. Every keyword is
+    a list of values for one of SWEEP_PARAMETERS (or initial_velocity);
+    parameters left out take their SWEEP_DEFAULTS value. Points are generated
+    with itertools.product in SWEEP_PARAMETERS order, so the last parameter
+    varies fastest.
+
+    :param values: lists of values keyed by parameter name
+    :return points: list of dictionaries, one per sweep point
+    """
+
+    unknown = set(values) - set(SWEEP_DEFAULTS)
+    if unknown:
+        raise ValueError('unknown sweep parameters: %s' % ', '.join(sorted(unknown)))
+
+    names = [name for name in SWEEP_PARAMETERS if name in values] \
+        + [name for name in values if name not in SWEEP_PARAMETERS]
+
+    points = []
+    for combination in itertools.product(*[values[name] for name in names]):
+        point = dict(SWEEP_DEFAULTS)
+        point.update(zip(names, combination))
+        points.append(point)
+
+    return points
+
+
+def _init_worker(cache_dir=None, store_dir=None, instrument=False, checkpoint_dir=None):
+    """
+    Fits the regressions once per worker process, opens the result cache,
+    trajectory writer and checkpoint if they are used, and enables
+    instrumentation if asked to.
+    """
+
+    global _regressions, _cache, _writer, _checkpoint
+
+    if instrument:
+        instrumentation.enable()
+
+    _regressions = (get_muscle_force_length_regression(),
+                    get_muscle_force_velocity_regression())
+    _cache = None if cache_dir is None else SimulationCache(cache_dir)
+    if _writer is not None:
+        _writer.close()
+    _writer = None if store_dir is None else TrajectoryWriter(store_dir)
+    _checkpoint = None if checkpoint_dir is None else SweepCheckpoint(checkpoint_dir)
+
+
+def simulate_point(T, point):
+    """
+    Runs the simulation of a single sweep point with the worker's regressions.
+
+    :param T: total time to simulate, in seconds
+    :param point: dictionary of sweep parameters
+    :return result: SimulationResult
+    """
+
+    if _regressions is None:
+        _init_worker()
+    force_length_regression, force_velocity_regression = _regressions
+
+    point = dict(SWEEP_DEFAULTS, **point)
+    initialCondition = [point['initial_theta'], point['initial_velocity'], 1, 1, 1, 1]
+
+    run = run_simulation if _cache is None else _cache.run
+
+    return run(T, initialCondition, point['thigh_offset'],
+                point['femoris_activation'], point['lateralis_activation'],
+                point['medialis_activation'], point['intermedius_activation'],
+                force_length_regression, force_velocity_regression)
+
+
+def store_point(T, run, point):
+    """
+    Runs the simulation of a single sweep point and appends its trajectory
+    to the worker's trajectory store.
+
+    :param T: total time to simulate, in seconds
+    :param run: run id of the point in the store
+    :param point: dictionary of sweep parameters
+    """
+
+    _writer.append(simulate_point(T, point), point, run)
+
+
+def checkpoint_point(T, key, point):
+    """
+    Runs the simulation of a single sweep point and checkpoints its result,
+    unless the point is finished or claimed by another process. An
+    exception raised by the simulation is recorded as the point's failure
+    instead of ending the sweep.
+
+    :param T: total time to simulate, in seconds
+    :param key: point key of the point in the checkpoint
+    :param point: dictionary of sweep parameters
+    :return finished: True if this process finished the point
+    """
+
+    if _checkpoint.finished(key) or not _checkpoint.claim(key):
+        return False
+    if _checkpoint.finished(key):
+        # finished by another process between the check and the claim
+        _checkpoint.release(key)
+        return False
+
+    stop_heartbeat = _checkpoint.heartbeat(key)
+    try:
+        result = simulate_point(T, point)
+    except Exception as error:
+        _checkpoint.fail(key, point, error)
+        return True
+    except BaseException:
+        _checkpoint.release(key)
+        raise
+    finally:
+        stop_heartbeat()
+
+    _checkpoint.complete(key, result)
+    return True
+
+
+def run_sweep(T, points, workers=None, chunksize=1, progress=True, cache_dir=None,
+              store_dir=None, instrument=False, checkpoint_dir=None, retry_failed=False):
+    """
+    Runs the simulation of every sweep point on a pool of worker processes.
+    Results are returned in the order of points, independent of the number
+    of workers or the order in which simulations finish.
+
+    :param T: total time to simulate, in seconds
+    :param points: sweep points, e.g. from parameter_grid
+    :param workers: number of worker processes, defaults to the CPU count;
+        1 runs the sweep serially in this process
+    :param chunksize: number of points sent to a worker at a time
+    :param progress: show a progress bar
+    :param cache_dir: directory of a SimulationCache shared by the workers;
+        points simulated by an earlier sweep are loaded instead of rerun
+    :param store_dir: directory of a TrajectoryStore; each worker streams
+        its trajectories to disk instead of sending them back, and the
+        returned results are memory-mapped views into the store; run ids
+        are reserved with TrajectoryStore.reserve_runs, so sweeps writing
+        to the same store at once get distinct ids
+    :param instrument: record a RunReport of every simulation in the
+        workers; it is attached to each result (results loaded from the
+        cache have none), and instrumentation.merge_reports aggregates them
+    :param checkpoint_dir: directory of a SweepCheckpoint; every point is
+        checkpointed as it finishes, so an interrupted sweep resumes where
+        it stopped, and a point whose simulation raises is recorded as
+        failed instead of ending the sweep. Several processes, on one or
+        more machines, can run the same sweep on a shared directory; each
+        simulates the points nobody else has claimed, then waits for the
+        rest. Results are loaded from the checkpoint (without
+        instrumentation reports) and failed points are None
+    :param retry_failed: simulate the points recorded as failed again
+    :return results: list of SimulationResult, one per point
+    """
+
+    from tqdm import tqdm
+
+    points = list(points)
+
+    if checkpoint_dir is not None:
+        if store_dir is not None:
+            raise ValueError('a sweep cannot use both a checkpoint and a trajectory store')
+        return _checkpointed_sweep(T, points, checkpoint_dir, retry_failed, workers,
+                                   chunksize, progress, cache_dir, instrument)
+
+    if store_dir is None:
+        task = partial(simulate_point, T)
+        arguments = (points,)
+    else:
+        runs = list(TrajectoryStore(store_dir).reserve_runs(len(points)))
+        task = partial(store_point, T)
+        arguments = (runs, points)
+
+    if workers == 1:
+        was_enabled = instrumentation.enabled()
+        _init_worker(cache_dir, store_dir, instrument)
+        try:
+            results = [task(*argument) for argument in
+                       tqdm(list(zip(*arguments)), disable=not progress)]
+        finally:
+            if _writer is not None:
+                _writer.close()
+            if instrument and not was_enabled:
+                instrumentation.disable()
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(cache_dir, store_dir, instrument)) as executor:
+            results = list(tqdm(executor.map(task, *arguments, chunksize=chunksize),
+                                total=len(points), disable=not progress))
+
+    if store_dir is None:
+        return results
+
+    store = TrajectoryStore(store_dir)
+    return [store.result(i) for i in store.find(runs)]
+
+
+def _checkpointed_sweep(T, points, checkpoint_dir, retry_failed, workers, chunksize,
+                        progress, cache_dir, instrument):
+    """
+    Runs a sweep through a SweepCheckpoint, see run_sweep. Each pass offers
+    every unfinished point to the workers; points claimed by other
+    processes are left to them, and checked again after POLL_INTERVAL
+    until they are finished or their claims are abandoned.
+    """
+
+    from tqdm import tqdm
+
+    checkpoint = SweepCheckpoint(checkpoint_dir)
+    keys = [point_key(T, point) for point in points]
+    if retry_failed:
+        for key in keys:
+            checkpoint.clear_failure(key)
+
+    task = partial(checkpoint_point, T)
+    executor = None
+    if workers == 1:
+        was_enabled = instrumentation.enabled()
+        _init_worker(cache_dir, None, instrument, checkpoint_dir)
+    else:
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                       initargs=(cache_dir, None, instrument, checkpoint_dir))
+
+    try:
+        with tqdm(total=len(points), disable=not progress) as bar:
+            first_pass = True
+            while True:
+                pending = [i for i, key in enumerate(keys) if not checkpoint.finished(key)]
+                bar.update(len(points) - len(pending) - bar.n)
+                if not pending:
+                    break
+                if not first_pass:
+                    time.sleep(POLL_INTERVAL)
+                first_pass = False
+
+                arguments = ([keys[i] for i in pending], [points[i] for i in pending])
+                if executor is None:
+                    finished = map(task, *arguments)
+                else:
+                    finished = executor.map(task, *arguments, chunksize=chunksize)
+                for point_finished in finished:
+                    bar.update(int(point_finished))
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+        elif instrument and not was_enabled:
+            instrumentation.disable()
+
+    failed = sum(checkpoint.failed(key) for key in keys)
+    if failed:
+        warnings.warn('%d of %d sweep points failed, see the failure records in %s'
+                      % (failed, len(points), checkpoint.directory))
+
+    return [checkpoint.load(key) for key in keys]
+
+
+def adaptive_sweep(T, ranges, fixed=None, initial_divisions=2, budget=ADAPTIVE_BUDGET,
+                   tolerance=ADAPTIVE_TOLERANCE, max_depth=ADAPTIVE_MAX_DEPTH, **sweep_options):
+    """
+    Sweeps a box of parameter space, e.g. thigh offset x initial theta,
+    with a sample density that adapts to the response. The box starts as a
+    coarse grid of cells whose corners are simulated. Each round, the cells
+    in which max_velocity varies by more than tolerance between corners, or
+    whose corners end differently (so the validity boundary of the knee
+    angle crosses the cell), are split in half along every axis, largest
+    variation first; the new corners of a round are simulated together with
+    run_sweep. Refinement stops once no cell needs splitting, cells reach
+    max_depth, or the next split would exceed the simulation budget.
+
+    :param T: total time to simulate, in seconds
+    :param ranges: (lower, upper) range of each swept parameter, keyed by
+        sweep parameter name; one or more parameters
+    :param fixed: values of the other sweep parameters
+    :param initial_divisions: number of cells per axis of the initial grid
+    :param budget: maximum number of simulations
+    :param tolerance: max_velocity variation (m/s) that triggers a split
+    :param max_depth: maximum number of splits of an initial cell
+    :param sweep_options: passed to run_sweep (workers, cache_dir, ...); with
+        a checkpoint_dir, an interrupted adaptive sweep replays its rounds
+        from the checkpoint, and failed corners are left out of the cells
+    :return points: simulated sweep points, in order of simulation
+    :return results: list of SimulationResult, one per point
+    """
+
+    names = list(ranges)
+    unknown = (set(names) | set(fixed or {})) - set(SWEEP_DEFAULTS)
+    if unknown:
+        raise ValueError('unknown sweep parameters: %s' % ', '.join(sorted(unknown)))
+
+    sweep_options.setdefault('progress', False)
+    evaluated = {}
+    points = []
+    results = []
+
+    def simulate_corners(corners):
+        new = [corner for corner in dict.fromkeys(corners) if corner not in evaluated]
+        new_points = [dict(fixed or {}, **dict(zip(names, corner))) for corner in new]
+        for corner, point, result in zip(new, new_points,
+                                         run_sweep(T, new_points, **sweep_options)):
+            evaluated[corner] = result
+            # points that failed in a checkpointed sweep are left out
+            if result is not None:
+                points.append(point)
+                results.append(result)
+
+    # cells are (lower corner, upper corner, depth)
+    edges = [np.linspace(low, high, initial_divisions + 1) for low, high in ranges.values()]
+    cells = [(tuple(edge[i] for edge, i in zip(edges, index)),
+              tuple(edge[i + 1] for edge, i in zip(edges, index)), 0)
+             for index in itertools.product(range(initial_divisions), repeat=len(names))]
+
+    if (initial_divisions + 1)**len(names) > budget:
+        raise ValueError('the initial grid alone exceeds the budget of %d simulations' % budget)
+    simulate_corners([corner for cell in cells for corner in _cell_nodes(cell, 2)])
+
+    while True:
+        candidates = []
+        for cell in cells:
+            corners = [evaluated[corner] for corner in _cell_nodes(cell, 2)
+                       if evaluated[corner] is not None]
+            if not corners:
+                continue
+            velocities = np.array([result.max_velocity for result in corners], dtype=float)
+            variation = np.nanmax(velocities) - np.nanmin(velocities) \
+                if not np.all(np.isnan(velocities)) else 0
+            crossing = len(set(result.termination for result in corners)) > 1
+            if cell[2] < max_depth and (variation > tolerance or crossing):
+                candidates.append((np.inf if crossing else variation, cell))
+
+        # cells are split in order of need, as long as the budget allows
+        split = []
+        pending = set()
+        for _, cell in sorted(candidates, key=lambda candidate: -candidate[0]):
+            new = set(_cell_nodes(cell, 3)) - set(evaluated) - pending
+            if len(evaluated) + len(pending) + len(new) > budget:
+                continue
+            pending |= new
+            split.append(cell)
+
+        if not split:
+            break
+
+        simulate_corners(sorted(pending))
+        split_set = set(split)
+        cells = [child for cell in cells
+                 for child in (_split_cell(cell) if cell in split_set else [cell])]
+
+    return points, results
+
+
+def _cell_nodes(cell, n):
+    """
+    Nodes of a cell on an n-per-axis grid: its corners for n = 2, its
+    corners, edge midpoints and centre for n = 3.
+    """
+
+    lower, upper, _ = cell
+    axes = [np.linspace(low, high, n) for low, high in zip(lower, upper)]
+
+    return [tuple(float(value) for value in node) for node in itertools.product(*axes)]
+
+
+def _split_cell(cell):
+    """
+    Splits a cell in half along every axis.
+    """
+
+    lower, upper, depth = cell
+    middle = tuple(float(value) for value in np.linspace(lower, upper, 3)[1])
+
+    children = []
+    for halves in itertools.product((0, 1), repeat=len(lower)):
+        children.append((
+            tuple(middle[i] if half else lower[i] for i, half in enumerate(halves)),
+            tuple(upper[i] if half else middle[i] for i, half in enumerate(halves)),
+            depth + 1))
+
+    return children
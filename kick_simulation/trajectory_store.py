@@ -0,0 +1,414 @@
+import json
+import numbers
+import os
+import time
+import uuid
+
+import numpy as np
+
+from .simulate import SimulationResult
+from .result_cache import activation_descriptor
+from .instrumentation import RunReport
+
+# trajectory columns and their number of values per sample
+COLUMNS = {
+    'time': 1,
+    'theta': 1,
+    'velocity': 1,
+    'muscle_length': 4,
+}
+COLUMN_DTYPE = np.dtype('<f8')
+# one fixed-size record per run, so a chunk's index is a flat binary array
+INDEX_DTYPE = np.dtype([
+    ('run', '<i8'),
+    ('offset', '<i8'),
+    ('length', '<i8'),
+    ('max_velocity', '<f8'),
+    ('termination', '<i8'),
+    ('termination_time', '<f8'),
+])
+TERMINATIONS = (None, 'extension', 'flexion')
+CHUNK_SAMPLES = 1 << 20  # samples per chunk before a writer starts a new one
+INDEX_FILE = 'index.bin'
+PARAMETERS_FILE = 'parameters.jsonl'
+# next free run id, only read and advanced while holding the lock file
+RUNS_FILE = 'runs.json'
+RUNS_LOCK = 'runs.lock'
+LOCK_TIMEOUT = 10  # seconds after which a lock left by a dead process is broken
+
+def _describe(value):
+    """
+    JSON-serializable description of a sweep parameter; activation profiles
+    are described by their repr, as in the result cache.
+    """
+
+    if isinstance(value, (bool, str)) or value is None:
+        return value
+    if isinstance(value, numbers.Integral):
+        return int(value)
+    if isinstance(value, numbers.Real):
+        return float(value)
+
+    return activation_descriptor(value) or repr(value)
+
+
+class TrajectoryWriter:
+    """
+    Appends simulation results to a TrajectoryStore directory. Every writer
+    owns its own chunk directories, named after its process and a random
+    suffix, so any number of processes can write to the same store without
+    locking. Within a chunk each trajectory column is a flat binary file
+    that runs are appended to, and a run only becomes visible to readers
+    once its fixed-size index record is written, after its samples and
+    parameters; a writer that dies mid-run leaves trailing bytes that
+    readers ignore.
+    """
+
+    def __init__(self, directory, chunk_samples=CHUNK_SAMPLES):
+
+        self.directory = directory
+        self.chunk_samples = chunk_samples
+        self.name = '%d-%s' % (os.getpid(), uuid.uuid4().hex[:8])
+        self.chunk = -1
+        self.samples = 0
+        self.runs = 0
+        self._files = None
+        os.makedirs(directory, exist_ok=True)
+
+    def _next_chunk(self):
+        """
+        Closes the current chunk and opens the files of a new one.
+        """
+
+        self.close()
+        self.chunk += 1
+        self.samples = 0
+        path = os.path.join(self.directory, '%s-%05d' % (self.name, self.chunk))
+        os.makedirs(path)
+
+        self._files = {name: open(os.path.join(path, name + '.f8'), 'ab')
+                       for name in COLUMNS}
+        self._files['parameters'] = open(os.path.join(path, PARAMETERS_FILE), 'a')
+        self._files['index'] = open(os.path.join(path, INDEX_FILE), 'ab')
+
+    def append(self, result, parameters=None, run=None):
+        """
+        Appends a result and the parameters that produced it.
+
+        :param result: SimulationResult to store
+        :param parameters: dictionary of the run's parameters, e.g. a sweep point
+        :param run: integer id of the run, defaults to the writer's count of
+            appended runs
+        """
+
+        length = len(result.time)
+        if self._files is None or (self.samples > 0
+                                   and self.samples + length > self.chunk_samples):
+            self._next_chunk()
+
+        muscle_length = result.muscle_length
+        if muscle_length is None:
+            muscle_length = np.full((length, COLUMNS['muscle_length']), np.nan)
+        columns = {'time': result.time, 'theta': result.theta,
+                   'velocity': result.velocity, 'muscle_length': muscle_length}
+
+        # everything is checked before anything is written, so that a
+        # rejected run cannot shift the offsets of the following ones
+        for name, width in COLUMNS.items():
+            columns[name] = np.ascontiguousarray(columns[name], dtype=COLUMN_DTYPE)
+            if columns[name].size != length*width:
+                raise ValueError('%s of a run with %d samples has %d values, expected %d'
+                                 % (name, length, columns[name].size, length*width))
+
+        for name in COLUMNS:
+            self._files[name].write(memoryview(columns[name]).cast('B'))
+            self._files[name].flush()
+
+        report = getattr(result, 'instrumentation', None)
+        self._files['parameters'].write(json.dumps({
+            'parameters': {name: _describe(value)
+                           for name, value in (parameters or {}).items()},
+            'solver_stats': result.solver_stats,
+            'instrumentation': None if report is None else report.as_dict()}) + '\n')
+        self._files['parameters'].flush()
+
+        record = np.zeros(1, dtype=INDEX_DTYPE)
+        record['run'] = self.runs if run is None else run
+        record['offset'] = self.samples
+        record['length'] = length
+        record['max_velocity'] = result.max_velocity
+        record['termination'] = TERMINATIONS.index(result.termination)
+        record['termination_time'] = np.nan if result.termination_time is None \
+            else result.termination_time
+        self._files['index'].write(record.tobytes())
+        self._files['index'].flush()
+
+        self.samples += length
+        self.runs += 1
+
+    def close(self):
+        if self._files is not None:
+            for file in self._files.values():
+                file.close()
+            self._files = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class TrajectoryStore:
+    """
+    On-disk store of the full trajectories of many simulations, written by
+    TrajectoryWriters and read lazily. Only the index (a few numbers per
+    run) is loaded into memory; trajectory columns are memory-mapped and
+    results are views into them, so any subset of runs can be sliced and
+    analysed without reading the rest of the store. Runs are ordered by
+    their run id; reserve_runs hands out ids that are unique across
+    processes.
+    """
+
+    def __init__(self, directory):
+
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.refresh()
+
+    def refresh(self):
+        """
+        Rescans the store for runs written since it was opened.
+        """
+
+        self.chunks = []
+        indices = []
+        for entry in sorted(os.scandir(self.directory), key=lambda entry: entry.name):
+            path = os.path.join(entry.path, INDEX_FILE)
+            if not entry.is_dir() or not os.path.exists(path):
+                continue
+            # only whole records count, a record being written is ignored
+            count = os.path.getsize(path)//INDEX_DTYPE.itemsize
+            if count > 0:
+                indices.append((len(self.chunks), np.fromfile(path, INDEX_DTYPE, count)))
+                self.chunks.append(entry.path)
+
+        if indices:
+            index = np.concatenate([records for _, records in indices])
+            chunk = np.concatenate([np.full(len(records), i) for i, records in indices])
+            row = np.concatenate([np.arange(len(records)) for _, records in indices])
+        else:
+            index = np.zeros(0, dtype=INDEX_DTYPE)
+            chunk = row = np.zeros(0, dtype=int)
+
+        order = np.argsort(index['run'], kind='stable')
+        self.index = index[order]
+        self._chunk = chunk[order]
+        self._row = row[order]
+        self._maps = {}
+        self._records = {}
+
+    def __len__(self):
+        return len(self.index)
+
+    @property
+    def runs(self):
+        return self.index['run']
+
+    @property
+    def max_velocity(self):
+        return self.index['max_velocity']
+
+    def next_run(self):
+        """
+        Id following the largest run id in the store.
+
+        :return run: integer run id
+        """
+
+        return int(self.runs.max()) + 1 if len(self) > 0 else 0
+
+    def reserve_runs(self, count):
+        """
+        Reserves consecutive run ids that no other caller, in this or any
+        other process, is given, so concurrent sweeps writing to the same
+        store never share ids. The next free id is kept in a file that is
+        only updated while holding an exclusively created lock file.
+
+        :param count: number of run ids
+        :return runs: range of the reserved run ids
+        """
+
+        lock = os.path.join(self.directory, RUNS_LOCK)
+        while True:
+            try:
+                os.close(os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                break
+            except FileExistsError:
+                pass
+            try:
+                if time.time() - os.path.getmtime(lock) > LOCK_TIMEOUT:
+                    # renaming is atomic, so only one process breaks the lock
+                    broken = '%s.%d-%s.broken' % (lock, os.getpid(), uuid.uuid4().hex[:8])
+                    os.rename(lock, broken)
+                    os.remove(broken)
+                    continue
+            except FileNotFoundError:
+                continue
+            time.sleep(0.01)
+
+        try:
+            path = os.path.join(self.directory, RUNS_FILE)
+            try:
+                with open(path) as file:
+                    next_free = json.load(file)['next']
+            except FileNotFoundError:
+                next_free = 0
+            # runs written with ids of their own are never reused either
+            self.refresh()
+            first = max(next_free, self.next_run())
+
+            temporary = '%s.%d-%s.tmp' % (path, os.getpid(), uuid.uuid4().hex[:8])
+            with open(temporary, 'w') as file:
+                json.dump({'next': first + count}, file)
+            os.replace(temporary, path)
+        finally:
+            os.remove(lock)
+
+        return range(first, first + count)
+
+    def writer(self, chunk_samples=CHUNK_SAMPLES):
+        """
+        A new writer appending to this store.
+
+        :param chunk_samples: samples per chunk file
+        :return writer: TrajectoryWriter
+        """
+
+        return TrajectoryWriter(self.directory, chunk_samples)
+
+    def _column(self, chunk, name):
+        """
+        Memory map of a column of a chunk, covering its indexed runs only.
+        """
+
+        key = (chunk, name)
+        if key not in self._maps:
+            in_chunk = self.index[self._chunk == chunk]
+            samples = int(np.max(in_chunk['offset'] + in_chunk['length']))
+            width = COLUMNS[name]
+            self._maps[key] = np.memmap(
+                os.path.join(self.chunks[chunk], name + '.f8'), dtype=COLUMN_DTYPE,
+                mode='r', shape=(samples,) if width == 1 else (samples, width))
+
+        return self._maps[key]
+
+    def _record(self, chunk, row):
+        """
+        Parameters, solver statistics and instrumentation report of a run; a
+        chunk's records are parsed once, the first time one of them is needed.
+        """
+
+        if chunk not in self._records:
+            count = int(np.sum(self._chunk == chunk))
+            with open(os.path.join(self.chunks[chunk], PARAMETERS_FILE)) as file:
+                self._records[chunk] = [json.loads(line) for _, line in zip(range(count), file)]
+
+        return self._records[chunk][row]
+
+    def trajectory(self, i, name):
+        """
+        One column of the trajectory of a run, as a view into the store.
+
+        :param i: position of the run in the store
+        :param name: column name, one of COLUMNS
+        :return values: (n,) or (n, width) memory-mapped array
+        """
+
+        record = self.index[i]
+        start = int(record['offset'])
+
+        return self._column(int(self._chunk[i]), name)[start:start + int(record['length'])]
+
+    def parameters(self, i):
+        """
+        Parameters of a run, with activation profiles described by their repr.
+
+        :param i: position of the run in the store
+        :return parameters: dictionary of parameter values
+        """
+
+        return self._record(int(self._chunk[i]), int(self._row[i]))['parameters']
+
+    def parameter_table(self, names=None):
+        """
+        Parameter values of every run as columns. Reads every run's
+        parameters, but no trajectories.
+
+        :param names: parameters to tabulate, all if None
+        :return table: dictionary of (len(store),) arrays keyed by name;
+            numeric parameters are float arrays, others object arrays
+        """
+
+        rows = [self.parameters(i) for i in range(len(self))]
+        if names is None:
+            names = sorted(set().union(*rows)) if rows else []
+
+        table = {}
+        for name in names:
+            values = [row.get(name) for row in rows]
+            numeric = all(isinstance(value, numbers.Real) and not isinstance(value, bool)
+                          for value in values)
+            table[name] = np.array(values, dtype=float if numeric else object)
+
+        return table
+
+    def result(self, i):
+        """
+        Result of a run, with its trajectories as views into the store.
+
+        :param i: position of the run in the store
+        :return result: SimulationResult
+        """
+
+        record = self.index[i]
+        termination = TERMINATIONS[int(record['termination'])]
+        stored = self._record(int(self._chunk[i]), int(self._row[i]))
+
+        result = SimulationResult(
+            self.trajectory(i, 'time'), self.trajectory(i, 'theta'),
+            self.trajectory(i, 'velocity'), float(record['max_velocity']),
+            termination, None if termination is None else float(record['termination_time']),
+            stored['solver_stats'], self.trajectory(i, 'muscle_length'))
+        if stored.get('instrumentation') is not None:
+            result.instrumentation = RunReport.from_dict(stored['instrumentation'])
+
+        return result
+
+    def __getitem__(self, key):
+        """
+        Results of runs by position: an integer gives one result, a slice,
+        index array or boolean mask gives a list of results.
+        """
+
+        if isinstance(key, numbers.Integral):
+            return self.result(int(key) % len(self) if key < 0 else int(key))
+
+        return [self.result(int(i)) for i in np.arange(len(self))[key]]
+
+    def find(self, runs):
+        """
+        Positions of runs in the store.
+
+        :param runs: run ids
+        :return positions: integer positions of the runs
+        """
+
+        runs = np.asarray(runs)
+        positions = np.searchsorted(self.runs, runs)
+        positions = np.minimum(positions, max(len(self) - 1, 0))
+        if len(self) == 0 or np.any(self.runs[positions] != runs):
+            raise KeyError('runs not in the store: %s'
+                           % np.setdiff1d(runs, self.runs).tolist())
+
+        return positions
@@ -1,17 +1,31 @@
+import os
 import sys
-sys.path.append('.')
-sys.path.append('./muscle_modelling')
 
 import numpy as np
-import itertools
-from tqdm import tqdm
-import matplotlib.pyplot as plt
 
-from simulate import simulate
-from muscle_modelling.regression import get_muscle_force_length_regression,\
+from kick_simulation.simulate import simulate
+from kick_simulation.muscle_modelling.regression import get_muscle_force_length_regression,\
                        get_muscle_force_velocity_regression
+from kick_simulation.activation import ConstantActivation, CosineActivation
+from kick_simulation.sweep import parameter_grid, run_sweep, adaptive_sweep
+from kick_simulation.optimize import optimize_kick, ACTIVATION_RAMP_TIME, MUSCLES
 
 THIGH_OFFSET = np.pi/6
+# set KICK_CHECKPOINT_DIR to keep finished sweep points there, so an
+# interrupted run resumes; results are only reused while the model is
+# unchanged, so checkpointing is off by default
+CHECKPOINT_DIR = os.environ.get('KICK_CHECKPOINT_DIR')
+
+def checkpoint_dir(sweep_name):
+    """
+    Checkpoint directory of one of the sweeps, None unless checkpointing is
+    enabled.
+    """
+
+    if not CHECKPOINT_DIR:
+        return None
+
+    return os.path.join(CHECKPOINT_DIR, sweep_name)
 
 def sample_simulation():
     force_length_regression = get_muscle_force_length_regression()
@@ -22,10 +36,10 @@ def sample_simulation():
     T = 0.75
     initialCondition = [np.pi/8, 0.1, 1, 1, 1, 1]
     thigh_offset = THIGH_OFFSET
-    get_femoris_activation = lambda x: 1
-    get_lateralis_activation = lambda x: 1
-    get_medialis_activation = lambda x: 1
-    get_intermedius_activation = lambda x: 1
+    get_femoris_activation = ConstantActivation(1)
+    get_lateralis_activation = ConstantActivation(1)
+    get_medialis_activation = ConstantActivation(1)
+    get_intermedius_activation = ConstantActivation(1)
 
     fig, results = simulate(T, initialCondition, thigh_offset, get_femoris_activation, 
                 get_lateralis_activation, get_medialis_activation, get_intermedius_activation, 
@@ -35,77 +49,38 @@ def sample_simulation():
     fig.savefig('sample_simulation.png')
 
 def sample_simulation_sweep():
-    force_length_regression = get_muscle_force_length_regression()
-    force_velocity_regression = get_muscle_force_velocity_regression()
-
     # SAMPLE SWEEP
 
     # define parameter sets
     T = 0.75
-    initial_thetas = [np.pi/4]
-    thigh_offsets = [-np.pi/6, 0, np.pi/6]
-    femoris_activation_funcs = [lambda x: 1, lambda x: np.cos((x*np.pi)/2)]
-    lateralis_activation_funcs = [lambda x: 1, lambda x: np.cos((x*np.pi)/2)]
-    medialis_activation_funcs = [lambda x: 1, lambda x: np.cos((x*np.pi)/2)]
-    intermedius_activation_funcs = [lambda x: 1, lambda x: np.cos((x*np.pi)/2)]
-
-    # Generate all possible combinations using itertools.product
-    param_combinations = list(itertools.product(
-        initial_thetas, thigh_offsets, femoris_activation_funcs, 
-        lateralis_activation_funcs, medialis_activation_funcs, 
-        intermedius_activation_funcs))
+    activations = [ConstantActivation(1), CosineActivation()]
+    points = parameter_grid(
+        initial_theta=[np.pi/4],
+        initial_velocity=[0.1],
+        thigh_offset=[-np.pi/6, 0, np.pi/6],
+        femoris_activation=activations,
+        lateralis_activation=activations,
+        medialis_activation=activations,
+        intermedius_activation=activations)
 
     # Execute each combination
-    for combination in param_combinations:
-        initialCondition = [combination[0], 0.1, 1, 1, 1, 1]
-        thigh_offset = combination[1]
-        get_femoris_activation = combination[2]
-        get_lateralis_activation = combination[3]
-        get_medialis_activation = combination[4]
-        get_intermedius_activation = combination[5]
-
-        fig, results = simulate(T, initialCondition, thigh_offset, get_femoris_activation, 
-                    get_lateralis_activation, get_medialis_activation, get_intermedius_activation, 
-                    force_length_regression, force_velocity_regression)
+    run_sweep(T, points)
 
 def sweep_thigh_offset():
-    force_length_regression = get_muscle_force_length_regression()
-    force_velocity_regression = get_muscle_force_velocity_regression()
-
     # SAMPLE SWEEP
 
     # define parameter sets
     T = 1
-    initial_thetas = [np.pi/4]
-    thigh_offsets = [-np.pi/12, 0, np.pi/12, np.pi/10, np.pi/8, np.pi/6]
-    femoris_activation_funcs = [lambda x: 1]
-    lateralis_activation_funcs = [lambda x: 1]
-    medialis_activation_funcs = [lambda x: 1]
-    intermedius_activation_funcs = [lambda x: 1]
-
-    # Generate all possible combinations using itertools.product
-    param_combinations = list(itertools.product(
-        initial_thetas, thigh_offsets, femoris_activation_funcs, 
-        lateralis_activation_funcs, medialis_activation_funcs, 
-        intermedius_activation_funcs))
-
-    max_velocities = np.zeros(len(thigh_offsets))
-
-    # Execute each combination
-    for i, combination in enumerate(tqdm(param_combinations)):
-        initialCondition = [combination[0], 0, 1, 1, 1, 1]
-        thigh_offset = combination[1]
-        get_femoris_activation = combination[2]
-        get_lateralis_activation = combination[3]
-        get_medialis_activation = combination[4]
-        get_intermedius_activation = combination[5]
-
-        fig, results = simulate(T, initialCondition, thigh_offset, get_femoris_activation, 
-                    get_lateralis_activation, get_medialis_activation, get_intermedius_activation, 
-                    force_length_regression, force_velocity_regression)
 
-        max_velocities[i] = results['max_velocity']
+    # samples are placed where max velocity changes most
+    points, results = adaptive_sweep(T, {'thigh_offset': (-np.pi/12, np.pi/6)},
+                                     fixed={'initial_theta': np.pi/4}, budget=17,
+                                     checkpoint_dir=checkpoint_dir('thigh_offset'))
+    order = np.argsort([point['thigh_offset'] for point in points])
+    thigh_offsets = np.array([point['thigh_offset'] for point in points])[order]
+    max_velocities = np.array([result.max_velocity for result in results])[order]
 
+    import matplotlib.pyplot as plt
     fig = plt.figure()
     plt.plot(thigh_offsets, max_velocities, linewidth=1.5)
     plt.ylabel('Maximum Foot Velocity (m/s)')
@@ -115,43 +90,20 @@ def sweep_thigh_offset():
 
 
 def sweep_initial_theta():
-    force_length_regression = get_muscle_force_length_regression()
-    force_velocity_regression = get_muscle_force_velocity_regression()
-
     # SAMPLE SWEEP
 
     # define parameter sets
     T = 1
-    initial_thetas = [0, np.pi/8, np.pi/6, np.pi/4, np.pi/2, np.pi]
-    thigh_offsets = [np.pi/6]
-    femoris_activation_funcs = [lambda x: 1]
-    lateralis_activation_funcs = [lambda x: 1]
-    medialis_activation_funcs = [lambda x: 1]
-    intermedius_activation_funcs = [lambda x: 1]
-
-    # Generate all possible combinations using itertools.product
-    param_combinations = list(itertools.product(
-        initial_thetas, thigh_offsets, femoris_activation_funcs, 
-        lateralis_activation_funcs, medialis_activation_funcs, 
-        intermedius_activation_funcs))
-
-    max_velocities = np.zeros(len(initial_thetas))
-
-    # Execute each combination
-    for i, combination in enumerate(tqdm(param_combinations)):
-        initialCondition = [combination[0], 0, 1, 1, 1, 1]
-        thigh_offset = combination[1]
-        get_femoris_activation = combination[2]
-        get_lateralis_activation = combination[3]
-        get_medialis_activation = combination[4]
-        get_intermedius_activation = combination[5]
-
-        fig, results = simulate(T, initialCondition, thigh_offset, get_femoris_activation, 
-                    get_lateralis_activation, get_medialis_activation, get_intermedius_activation, 
-                    force_length_regression, force_velocity_regression)
 
-        max_velocities[i] = results['max_velocity']
+    # samples are placed where max velocity changes most
+    points, results = adaptive_sweep(T, {'initial_theta': (0, np.pi)},
+                                     fixed={'thigh_offset': np.pi/6}, budget=17,
+                                     checkpoint_dir=checkpoint_dir('initial_theta'))
+    order = np.argsort([point['initial_theta'] for point in points])
+    initial_thetas = np.array([point['initial_theta'] for point in points])[order]
+    max_velocities = np.array([result.max_velocity for result in results])[order]
 
+    import matplotlib.pyplot as plt
     fig = plt.figure()
     plt.plot(initial_thetas, max_velocities, linewidth=1.5)
     plt.ylabel('Maximum Foot Velocity (m/s)')
@@ -160,45 +112,25 @@ def sweep_initial_theta():
     fig.savefig('initial_theta_sweep.png')
 
 def sweep_muscle_activations():
-    force_length_regression = get_muscle_force_length_regression()
-    force_velocity_regression = get_muscle_force_velocity_regression()
-
     # SAMPLE SWEEP
 
     # define parameter sets
     T = 0.75
     muscles = ['femoris', 'lateralis', 'medialis', 'intermedius']
 
-    max_velocities = np.zeros(4)
+    # only one muscle is activated at each point
+    points = [dict(initial_theta=0, thigh_offset=np.pi/6, **{
+                  other + '_activation': ConstantActivation(1 if other == muscle else 0)
+                  for other in muscles})
+              for muscle in muscles]
 
-    # Execute each combination
-    for i, muscle in enumerate(tqdm(muscles)):
-        initialCondition = [0, 0, 1, 1, 1, 1]
-        thigh_offset = np.pi/6
-
-        if muscle == 'femoris':
-            get_femoris_activation = lambda x: 1
-        else:
-            get_femoris_activation = lambda x: 0
-        if muscle == 'lateralis':
-            get_lateralis_activation = lambda x: 1
-        else:
-            get_lateralis_activation = lambda x: 0
-        if muscle == 'medialis':
-            get_medialis_activation = lambda x: 1
-        else:
-            get_medialis_activation = lambda x: 0
-        if muscle == 'intermedius':
-            get_intermedius_activation = lambda x: 1
-        else:
-            get_intermedius_activation = lambda x: 0
-
-        fig, results = simulate(T, initialCondition, thigh_offset, get_femoris_activation, 
-                    get_lateralis_activation, get_medialis_activation, get_intermedius_activation, 
-                    force_length_regression, force_velocity_regression)
-
-        max_velocities[i] = results['max_velocity']
+    # Execute each combination, failed points are left blank
+    results = run_sweep(T, points,
+                        checkpoint_dir=checkpoint_dir('muscle_activations'))
+    max_velocities = np.array([np.nan if result is None else result.max_velocity
+                               for result in results])
 
+    import matplotlib.pyplot as plt
     fig = plt.figure()
     plt.plot(muscles, max_velocities, linewidth=1.5)
     plt.ylabel('Maximum Foot Velocity (m/s)')
@@ -208,51 +140,48 @@ def sweep_muscle_activations():
 
 
 def sweep_final():
-    force_length_regression = get_muscle_force_length_regression()
-    force_velocity_regression = get_muscle_force_velocity_regression()
-
     # SAMPLE SWEEP
 
     # define parameter sets
     T = 1
-    initial_thetas = [0, np.pi/6, np.pi/4]
-    thigh_offsets = [-np.pi/12, 0, np.pi/6, np.pi/4]
-    femoris_activation_funcs = [lambda x: 1]
-    lateralis_activation_funcs = [lambda x: 1]
-    medialis_activation_funcs = [lambda x: 1]
-    intermedius_activation_funcs = [lambda x: 1]
-
-    # Generate all possible combinations using itertools.product
-    param_combinations = list(itertools.product(
-        initial_thetas, thigh_offsets, femoris_activation_funcs, 
-        lateralis_activation_funcs, medialis_activation_funcs, 
-        intermedius_activation_funcs))
+    points = parameter_grid(
+        initial_theta=[0, np.pi/6, np.pi/4],
+        thigh_offset=[-np.pi/12, 0, np.pi/6, np.pi/4])
 
-    max_velocities = np.zeros(len(param_combinations))
+    # Execute each combination, failed points are skipped
+    results = run_sweep(T, points, checkpoint_dir=checkpoint_dir('final'))
+    max_velocities = np.array([np.nan if result is None else result.max_velocity
+                               for result in results])
 
-    # Execute each combination
-    for i, combination in enumerate(tqdm(param_combinations)):
-        initialCondition = [combination[0], 0, 1, 1, 1, 1]
-        thigh_offset = combination[1]
-        get_femoris_activation = combination[2]
-        get_lateralis_activation = combination[3]
-        get_medialis_activation = combination[4]
-        get_intermedius_activation = combination[5]
-
-        fig, results = simulate(T, initialCondition, thigh_offset, get_femoris_activation, 
-                    get_lateralis_activation, get_medialis_activation, get_intermedius_activation, 
-                    force_length_regression, force_velocity_regression)
-
-        max_velocities[i] = results['max_velocity']
-
-    max_velocity_idx = np.argmax(max_velocities)
-    best_params = param_combinations[max_velocity_idx]
+    max_velocity_idx = np.nanargmax(max_velocities)
+    best_params = points[max_velocity_idx]
     print("The Best Params Are:")
-    print("Initial Theta: ", best_params[0])
-    print("Thigh Offset: ", best_params[1])
+    print("Initial Theta: ", best_params['initial_theta'])
+    print("Thigh Offset: ", best_params['thigh_offset'])
+
+def optimize_final():
+    # SAMPLE OPTIMIZATION
+
+    # the same problem as sweep_final, solved by gradient search instead of
+    # a grid: full activation from t = 0 (the onset ramps end at t = 0) and
+    # the ranges of its grid, from several starts
+    result = optimize_kick(T=1, parameters=('initial_theta', 'thigh_offset'),
+                           bounds={'initial_theta': (0, np.pi/4),
+                                   'thigh_offset': (-np.pi/12, np.pi/4)},
+                           fixed={muscle + '_onset': -ACTIVATION_RAMP_TIME for muscle in MUSCLES},
+                           n_starts=3, seed=0)
+
+    print("The Optimal Params Are:")
+    print("Initial Theta: ", result.parameters['initial_theta'])
+    print("Thigh Offset: ", result.parameters['thigh_offset'])
+    print("Max Velocity: ", result.max_velocity)
+    print("Simulations: ", result.n_simulations, " Wall Time: ", result.wall_time)
 
 if __name__ == "__main__":
     sweep_thigh_offset()
     sweep_initial_theta()
     sweep_muscle_activations()
-    sweep_final()
\ No newline at end of file
+    sweep_final()
+    # the optimization is slower than the sweeps, so it only runs on request
+    if '--optimize' in sys.argv[1:]:
+        optimize_final()
\ No newline at end of file
@@ -0,0 +1,21 @@
+"""
+Fixtures shared by the simulation tests.
+"""
+
+import numpy as np
+import pytest
+
+from kick_simulation.activation import ConstantActivation
+from kick_simulation.muscle_modelling.regression import get_muscle_force_length_regression, \
+    get_muscle_force_velocity_regression
+
+
+@pytest.fixture(scope='session')
+def arguments():
+    """
+    Positional arguments of run_simulation for the reference kick: one
+    second from theta = pi/4 at rest, thigh offset pi/6, full activation.
+    """
+
+    return (1, [np.pi/4, 0, 1, 1, 1, 1], np.pi/6) + (ConstantActivation(1),)*4 \
+        + (get_muscle_force_length_regression(), get_muscle_force_velocity_regression())
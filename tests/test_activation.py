@@ -0,0 +1,31 @@
+"""
+Activation profiles as sweep parameters: stable descriptions, pickling and
+equality.
+"""
+
+import pickle
+
+import pytest
+
+from kick_simulation.activation import ExcitationDynamicsActivation, \
+    PiecewiseLinearActivation
+from kick_simulation.checkpoint import point_key
+from kick_simulation.result_cache import activation_descriptor
+
+
+def test_excitation_dynamics_is_describable():
+    profile = ExcitationDynamicsActivation(PiecewiseLinearActivation((0, 0.1), (1, 0)), 0.5)
+    same = ExcitationDynamicsActivation(PiecewiseLinearActivation((0, 0.1), (1, 0)), 0.5)
+
+    assert profile == same and hash(profile) == hash(same)
+    assert pickle.loads(pickle.dumps(profile)) == profile
+    # the description has no memory address, so keys agree between processes
+    assert activation_descriptor(profile) == activation_descriptor(same)
+    assert '0x' not in activation_descriptor(profile)
+    assert point_key(1, {'femoris_activation': profile}) \
+        == point_key(1, {'femoris_activation': same})
+
+
+def test_excitation_dynamics_rejects_functions():
+    with pytest.raises(TypeError, match='ActivationProfile'):
+        ExcitationDynamicsActivation(lambda t: 1, 0.5)
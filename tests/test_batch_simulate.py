@@ -0,0 +1,40 @@
+"""
+Lockstep batch simulations against single run_simulation runs.
+"""
+
+import numpy as np
+import pytest
+
+from kick_simulation.activation import ConstantActivation
+from kick_simulation.batch_simulate import batch_simulate
+from kick_simulation.simulate import run_simulation
+
+CASES = [([np.pi/4, 0, 1, 1, 1, 1], np.pi/6), ([0.3, 0, 1, 1, 1, 1], 0),
+         ([np.pi/6, 0, 1, 1, 1, 1], -np.pi/12)]
+
+
+@pytest.fixture(scope='module')
+def regressions(arguments):
+    return arguments[-2:]
+
+
+@pytest.mark.parametrize('method', ['RK45', 'RK4'])
+def test_matches_run_simulation(regressions, method):
+    results = batch_simulate(1, [state for state, _ in CASES], [offset for _, offset in CASES],
+                             np.ones(4), *regressions, method=method)
+
+    for i, (state, offset) in enumerate(CASES):
+        reference = run_simulation(1, state, offset, *(ConstantActivation(1),)*4, *regressions)
+        # the peak is reached at extension, which ends the trajectory
+        assert results['max_velocity'][i] == pytest.approx(reference.max_velocity, rel=1e-3)
+        assert results['end_time'][i] == pytest.approx(reference.termination_time, rel=1e-3)
+
+
+def test_diverged_trajectory_is_dropped(regressions):
+    activations = np.ones((3, 4))
+    activations[1] = np.nan
+    results = batch_simulate(1, [state for state, _ in CASES], [offset for _, offset in CASES],
+                             activations, *regressions)
+
+    assert np.isnan(results['max_velocity'][1]) and np.isnan(results['end_time'][1])
+    assert np.isfinite(results['max_velocity'][[0, 2]]).all()
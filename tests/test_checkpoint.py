@@ -0,0 +1,60 @@
+"""
+Claims of sweep checkpoints: taking over abandoned claims and keeping
+running ones alive.
+"""
+
+import json
+import os
+import socket
+import time
+
+from kick_simulation.checkpoint import SweepCheckpoint, _process_start_time
+
+
+def write_claim(checkpoint, key, **claim):
+    with open(checkpoint.claim_path(key), 'w') as file:
+        json.dump(dict({'host': socket.gethostname(), 'pid': os.getpid(),
+                        'started': _process_start_time(os.getpid()), 'time': time.time()},
+                       **claim), file)
+
+
+def test_live_claim_is_kept(tmp_path):
+    checkpoint = SweepCheckpoint(str(tmp_path))
+
+    assert checkpoint.claim('a')
+    assert not checkpoint.claim('a')
+
+
+def test_claim_of_reused_pid_is_taken_over(tmp_path):
+    checkpoint = SweepCheckpoint(str(tmp_path))
+    started = _process_start_time(os.getpid())
+    # this process is alive, but is not the one that made the claim
+    write_claim(checkpoint, 'a', started=None if started is None else started - 1)
+
+    assert checkpoint.claim('a') is (started is not None)
+
+
+def test_stale_claim_is_taken_over_on_any_host(tmp_path):
+    checkpoint = SweepCheckpoint(str(tmp_path), claim_timeout=60)
+    write_claim(checkpoint, 'a')
+    write_claim(checkpoint, 'b', host='elsewhere')
+    for key in 'ab':
+        os.utime(checkpoint.claim_path(key), (time.time() - 120,)*2)
+
+    assert checkpoint.claim('a') and checkpoint.claim('b')
+
+
+def test_heartbeat_refreshes_claim(tmp_path):
+    checkpoint = SweepCheckpoint(str(tmp_path), claim_timeout=60, heartbeat_interval=0.05)
+    assert checkpoint.claim('a')
+    path = checkpoint.claim_path('a')
+    os.utime(path, (time.time() - 120,)*2)
+
+    stop = checkpoint.heartbeat('a')
+    try:
+        time.sleep(0.5)
+    finally:
+        stop()
+
+    assert time.time() - os.path.getmtime(path) < 60
+    assert not checkpoint.claim('a')
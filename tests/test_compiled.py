@@ -0,0 +1,52 @@
+"""
+The compiled RK4 backend against run_simulation, and its refusal to run
+without numba.
+"""
+
+import numpy as np
+import pytest
+
+from kick_simulation import compiled
+from kick_simulation.activation import ConstantActivation, CosineActivation
+from kick_simulation.simulate import run_simulation
+from kick_simulation.muscle_modelling.regression import get_muscle_force_length_regression, \
+    get_muscle_force_velocity_regression
+
+
+def test_requires_numba(monkeypatch):
+    monkeypatch.setattr(compiled, 'NUMBA_AVAILABLE', False)
+
+    with pytest.raises(ImportError, match='compiled'):
+        compiled.run_compiled(1, [np.pi/4, 0, 1, 1, 1, 1], np.pi/6, [ConstantActivation(1)]*4)
+
+
+def test_rejects_other_force_length_regressions():
+    pytest.importorskip('numba')
+
+    with pytest.raises(ValueError, match='gaussian'):
+        compiled.run_compiled(1, [np.pi/4, 0, 1, 1, 1, 1], np.pi/6, [ConstantActivation(1)]*4,
+                              force_length_regression=lambda lm: np.ones_like(lm))
+
+
+@pytest.mark.parametrize('initial_condition, thigh_offset, activations, moment_arm', [
+    ([np.pi/4, 0, 1, 1, 1, 1], np.pi/6, [ConstantActivation(1)]*4, 0.039),
+    ([0.3, 0, 1, 1, 1, 1], 0, [CosineActivation(0.5), ConstantActivation(1),
+                               ConstantActivation(0.5), ConstantActivation(1)], 0.039),
+    ([np.pi/4, 0, 1, 1, 1, 1], np.pi/6, [ConstantActivation(1)]*4, None),
+])
+def test_matches_run_simulation(initial_condition, thigh_offset, activations, moment_arm):
+    pytest.importorskip('numba')
+    force_length_regression = get_muscle_force_length_regression()
+    force_velocity_regression = get_muscle_force_velocity_regression()
+
+    result = compiled.run_compiled(1, initial_condition, thigh_offset, activations,
+                                   force_length_regression, force_velocity_regression,
+                                   moment_arm=moment_arm)
+    expected = run_simulation(1, initial_condition, thigh_offset, *activations,
+                              force_length_regression, force_velocity_regression,
+                              moment_arm=moment_arm)
+
+    assert result.solver_stats['method'] == 'RK4-compiled'
+    assert result.termination == expected.termination
+    assert result.max_velocity == pytest.approx(expected.max_velocity, rel=1e-3)
+    assert result.termination_time == pytest.approx(expected.termination_time, rel=1e-5)
@@ -0,0 +1,240 @@
+"""
+Equivalence of the array-native muscle curves with the original per-element
+implementations of force_length and force_velocity, for scalars, 0-d, 1-d
+and (B, N) inputs of integer and float dtype, and for the out= path.
+"""
+
+import numpy as np
+import pytest
+
+from kick_simulation.muscle_modelling import curves
+from kick_simulation.muscle_modelling.force_length import force_length_muscle, \
+    force_length_parallel, force_length_tendon
+from kick_simulation.muscle_modelling.force_velocity import force_velocity_muscle
+from kick_simulation.muscle_modelling.regression import get_muscle_force_length_regression, \
+    get_muscle_force_velocity_regression
+
+STEP = 1e-6  # central difference step of the reference slopes
+
+# lengths on both sides of the resting length, and exactly at it
+LENGTHS = [0.5, 0.9, 1.0, 1.0001, 1.05, 1.3, 2.0]
+INTEGER_LENGTHS = [0, 1, 2, 3]
+VELOCITIES = [-1.0, -0.75, -0.3, -0.05, 0.0, 0.2]
+INTEGER_VELOCITIES = [-1, 0]
+
+
+@pytest.fixture(scope='module')
+def force_length_regression():
+    return get_muscle_force_length_regression()
+
+
+@pytest.fixture(scope='module')
+def force_velocity_regression():
+    return get_muscle_force_velocity_regression()
+
+
+def reference_tendon_force(lt):
+    """
+    Tendon tension as originally computed, one element at a time.
+    """
+
+    return 0.0 if lt < 1 else 10*(lt - 1) + 240*((lt - 1)**2)
+
+
+def reference_parallel_force(lm):
+    """
+    Parallel elastic force as originally computed, one element at a time.
+    """
+
+    return 0.0 if lm < 1 else 3*((lm - 1)**2)/(0.6 + lm - 1)
+
+
+def reference_force_velocity(vm, coefficients):
+    """
+    Force-velocity regression as originally evaluated by model_eval, for one
+    velocity.
+    """
+
+    basis = np.array([1/(1 + np.exp(-(vm - centre)/0.15))
+                      for centre in np.arange(-1, -0.09, 0.2)])
+
+    return coefficients[0] + np.dot(basis, coefficients[1:])
+
+
+def central_difference(function, value):
+    return (function(value + STEP) - function(value - STEP))/(2*STEP)
+
+
+def elementwise(function, values):
+    """
+    Applies a scalar reference function to every element of an array.
+    """
+
+    values = np.asarray(values)
+    return np.array([function(value) for value in values.ravel().tolist()],
+                    dtype=float).reshape(values.shape)
+
+
+def shapes(values):
+    """
+    The same values as a Python scalar, 0-d array, 1-d array and (B, N)
+    array; the (B, N) array repeats the values in every row.
+    """
+
+    values = list(values)
+    yield values[-1]
+    yield np.array(values[-1])
+    yield np.array(values)
+    yield np.array([values, values[::-1], values])
+
+
+def inputs(float_values, integer_values):
+    for values in (float_values, integer_values):
+        for value in shapes(values):
+            yield value
+
+
+ELASTIC_CASES = [
+    (curves.tendon_force, reference_tendon_force),
+    (curves.parallel_force, reference_parallel_force),
+]
+STIFFNESS_CASES = [
+    (curves.tendon_stiffness, reference_tendon_force),
+    (curves.parallel_stiffness, reference_parallel_force),
+]
+
+
+def check_shape(result, value):
+    """
+    Scalar inputs give scalar outputs, arrays keep their shape, and the
+    result is always floating point.
+    """
+
+    if np.ndim(value) == 0:
+        assert np.ndim(result) == 0
+    else:
+        assert np.shape(result) == np.shape(value)
+    assert np.issubdtype(np.asarray(result).dtype, np.floating)
+
+
+@pytest.mark.parametrize('curve, reference', ELASTIC_CASES)
+@pytest.mark.parametrize('value', list(inputs(LENGTHS, INTEGER_LENGTHS)), ids=repr)
+def test_elastic_force(curve, reference, value):
+    result = curve(value)
+
+    check_shape(result, value)
+    np.testing.assert_allclose(result, elementwise(reference, value), rtol=1e-12, atol=1e-14)
+
+
+@pytest.mark.parametrize('curve, reference', STIFFNESS_CASES)
+@pytest.mark.parametrize('value', list(inputs(LENGTHS, INTEGER_LENGTHS)), ids=repr)
+def test_elastic_stiffness(curve, reference, value):
+    # the reference curves have a kink at the resting length, where the
+    # stiffness is taken as its value on the slack side
+    def slope(length):
+        return 0.0 if length <= 1 else central_difference(reference, length)
+
+    result = curve(value)
+
+    check_shape(result, value)
+    np.testing.assert_allclose(result, elementwise(slope, value), rtol=1e-6, atol=1e-6)
+
+
+@pytest.mark.parametrize('value', list(inputs(LENGTHS, INTEGER_LENGTHS)), ids=repr)
+def test_force_length(force_length_regression, value):
+    result = curves.force_length(value, force_length_regression)
+
+    np.testing.assert_allclose(result, force_length_regression(np.asarray(value, dtype=float)),
+                               rtol=1e-12)
+
+
+@pytest.mark.parametrize('value', list(inputs(LENGTHS, INTEGER_LENGTHS)), ids=repr)
+def test_force_length_slope(force_length_regression, value):
+    def slope(length):
+        return central_difference(lambda lm: float(force_length_regression(np.array([lm]))[0]),
+                                  length)
+
+    result = curves.force_length_slope(value, force_length_regression)
+
+    np.testing.assert_allclose(result, elementwise(slope, value), rtol=1e-5, atol=1e-8)
+
+
+@pytest.mark.parametrize('value', list(inputs(VELOCITIES, INTEGER_VELOCITIES)), ids=repr)
+def test_force_velocity(force_velocity_regression, value):
+    coefficients = np.asarray(force_velocity_regression)
+
+    result = curves.force_velocity(value, force_velocity_regression)
+
+    check_shape(result, value)
+    np.testing.assert_allclose(
+        result, elementwise(lambda vm: reference_force_velocity(vm, coefficients), value),
+        rtol=1e-12, atol=1e-14)
+
+
+@pytest.mark.parametrize('value', list(inputs(VELOCITIES, INTEGER_VELOCITIES)), ids=repr)
+def test_force_velocity_slope(force_velocity_regression, value):
+    coefficients = np.asarray(force_velocity_regression)
+
+    def slope(vm):
+        return central_difference(lambda v: reference_force_velocity(v, coefficients), vm)
+
+    result = curves.force_velocity_slope(value, force_velocity_regression)
+
+    check_shape(result, value)
+    np.testing.assert_allclose(result, elementwise(slope, value), rtol=1e-6, atol=1e-8)
+
+
+@pytest.mark.parametrize('curve', [curves.tendon_force, curves.tendon_stiffness,
+                                   curves.parallel_force, curves.parallel_stiffness])
+@pytest.mark.parametrize('dtype', [int, float])
+def test_elastic_out(curve, dtype):
+    value = np.array([INTEGER_LENGTHS, INTEGER_LENGTHS[::-1]], dtype=dtype)
+    out = np.full(value.shape, np.nan)
+
+    result = curve(value, out=out)
+
+    assert result is out
+    np.testing.assert_array_equal(out, curve(value))
+
+
+@pytest.mark.parametrize('dtype', [int, float])
+def test_regression_out(force_length_regression, force_velocity_regression, dtype):
+    lengths = np.array([INTEGER_LENGTHS, INTEGER_LENGTHS[::-1]], dtype=dtype)
+    velocities = np.array([INTEGER_VELOCITIES, INTEGER_VELOCITIES[::-1]], dtype=dtype)
+
+    for curve, value, regression in [
+            (curves.force_length, lengths, force_length_regression),
+            (curves.force_length_slope, lengths, force_length_regression),
+            (curves.force_velocity, velocities, force_velocity_regression),
+            (curves.force_velocity_slope, velocities, force_velocity_regression)]:
+        out = np.full(value.shape, np.nan)
+        result = curve(value, regression, out=out)
+
+        assert result is out
+        np.testing.assert_array_equal(out, curve(value, regression))
+
+
+@pytest.mark.parametrize('value', [2, 2.0, 0.5, [0.5, 1.3, 2]], ids=repr)
+def test_legacy_functions(force_length_regression, force_velocity_regression, value):
+    # the original functions return (1,) arrays for scalar inputs
+    expected_shape = np.shape(np.atleast_1d(value))
+
+    tendon = force_length_tendon(value)
+    parallel = force_length_parallel(value)
+
+    assert tendon.shape == expected_shape and parallel.shape == expected_shape
+    np.testing.assert_allclose(tendon, elementwise(reference_tendon_force, np.atleast_1d(value)),
+                               rtol=1e-12)
+    np.testing.assert_allclose(parallel,
+                               elementwise(reference_parallel_force, np.atleast_1d(value)),
+                               rtol=1e-12)
+    np.testing.assert_allclose(force_length_muscle(value, force_length_regression),
+                               force_length_regression(np.atleast_1d(value).astype(float)),
+                               rtol=1e-12)
+
+    coefficients = np.asarray(force_velocity_regression)
+    velocities = np.atleast_1d(value) - 1.5
+    np.testing.assert_allclose(
+        force_velocity_muscle(velocities, force_velocity_regression).ravel(),
+        elementwise(lambda vm: reference_force_velocity(vm, coefficients), velocities),
+        rtol=1e-12)
@@ -0,0 +1,27 @@
+"""
+Run reports of instrumented simulations.
+"""
+
+import pytest
+
+from kick_simulation.instrumentation import instrumented
+from kick_simulation.simulate import run_simulation
+
+
+@pytest.mark.parametrize('method', ['DOP853', 'RK45', 'RK23'])
+def test_step_counts_do_not_depend_on_output(arguments, method):
+    # dense output makes extra RHS evaluations, which are not step attempts
+    with instrumented():
+        reports = [run_simulation(*arguments, method=method, output=output).instrumentation
+                   for output in ('samples', 'steps', 'reductions')]
+
+    counts = {(report.accepted_steps, report.rejected_steps) for report in reports}
+    assert len(counts) == 1
+    assert reports[0].rejected_steps is not None
+
+
+def test_implicit_methods_report_no_rejections(arguments):
+    with instrumented():
+        report = run_simulation(*arguments, method='LSODA').instrumentation
+
+    assert report.accepted_steps > 0 and report.rejected_steps is None
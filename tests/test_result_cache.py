@@ -0,0 +1,46 @@
+"""
+Round trips of simulation results through the result cache.
+"""
+
+import numpy as np
+import pytest
+
+from kick_simulation.result_cache import SimulationCache, load_result, save_result
+from kick_simulation.simulate import run_simulation
+
+
+def assert_same_result(loaded, result):
+    for name in ('time', 'theta', 'velocity', 'muscle_length'):
+        expected = getattr(result, name)
+        if expected is None:
+            assert getattr(loaded, name) is None
+        else:
+            np.testing.assert_array_equal(getattr(loaded, name), expected)
+    assert loaded.max_velocity == result.max_velocity
+    assert loaded.termination == result.termination
+    assert loaded.termination_time == result.termination_time
+    assert loaded.solver_stats == result.solver_stats
+    assert loaded.reductions == result.reductions
+
+
+@pytest.mark.parametrize('output', ['samples', 'reductions'])
+def test_round_trip(arguments, output, tmp_path):
+    result = run_simulation(*arguments, output=output)
+    path = str(tmp_path / 'result.npz')
+
+    save_result(path, result)
+
+    assert_same_result(load_result(path), result)
+
+
+@pytest.mark.parametrize('output', ['samples', 'reductions'])
+def test_cache_hits(arguments, output, tmp_path, monkeypatch):
+    cache = SimulationCache(str(tmp_path))
+    result = cache.run(*arguments, output=output)
+
+    def simulate(*args, **kwargs):
+        raise AssertionError('cached simulation was run again')
+
+    monkeypatch.setattr('kick_simulation.result_cache.run_simulation', simulate)
+
+    assert_same_result(cache.run(*arguments, output=output), result)
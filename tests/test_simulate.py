@@ -0,0 +1,30 @@
+"""
+Output modes of run_simulation.
+"""
+
+import numpy as np
+import pytest
+
+from kick_simulation.simulate import run_simulation
+
+
+SAMPLINGS = [{}, {'times': np.linspace(0, 1, 100)}, {'times': [0.5]}, {'times': [0.01, 0.02]},
+             {'output': 'steps'}, {'output': 'reductions'}]
+
+
+@pytest.mark.parametrize('options', SAMPLINGS, ids=repr)
+def test_max_velocity_does_not_depend_on_sampling(arguments, options):
+    reference = run_simulation(*arguments, output='reductions')
+    result = run_simulation(*arguments, **options)
+
+    # samples that land on the peak can differ from the searched peak in
+    # the last bits only
+    assert result.max_velocity == pytest.approx(reference.max_velocity, rel=1e-12)
+    assert result.max_velocity == result.reductions['max_velocity']
+
+
+@pytest.mark.parametrize('options', SAMPLINGS[:-1], ids=repr)
+def test_no_sample_exceeds_max_velocity(arguments, options):
+    result = run_simulation(*arguments, **options)
+
+    assert np.max(result.velocity) <= result.max_velocity
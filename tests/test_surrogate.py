@@ -0,0 +1,44 @@
+"""
+The compiled GP surrogate against scikit-learn's predictions.
+"""
+
+import numpy as np
+import pytest
+
+from kick_simulation.surrogate import Surrogate
+
+
+@pytest.fixture(scope='module')
+def surrogate():
+    return Surrogate().fit(n=60, seed=0)
+
+
+def test_compiled_prediction_matches_sklearn(surrogate):
+    X = surrogate.sample(500, seed=1)
+
+    prediction, std = surrogate.predict(X, return_std=True)
+    expected, expected_std = surrogate.model.predict(surrogate._scale(X), return_std=True)
+
+    np.testing.assert_allclose(prediction, surrogate._y_mean + surrogate._y_std*expected,
+                               rtol=1e-9)
+    np.testing.assert_allclose(std, surrogate._y_std*expected_std, rtol=1e-6, atol=1e-9)
+    np.testing.assert_array_equal(surrogate.predict(X), prediction)
+
+
+def test_query_without_threshold_skips_std(surrogate, monkeypatch):
+    X = surrogate.sample(50, seed=2)
+    predict = surrogate.predict
+    calls = []
+
+    def recording_predict(X, return_std=False):
+        calls.append(return_std)
+        return predict(X, return_std)
+
+    monkeypatch.setattr(surrogate, 'max_std', np.inf)
+    monkeypatch.setattr(surrogate, 'predict', recording_predict)
+
+    max_velocity, simulated = surrogate.query(X)
+
+    assert calls == [False]
+    assert not simulated.any()
+    np.testing.assert_array_equal(max_velocity, predict(X))
@@ -0,0 +1,39 @@
+"""
+Run ids of trajectory stores shared by concurrent sweeps.
+"""
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from kick_simulation.simulate import SimulationResult
+from kick_simulation.trajectory_store import RUNS_LOCK, LOCK_TIMEOUT, TrajectoryStore
+
+
+def test_reservations_do_not_overlap(tmp_path):
+    stores = [TrajectoryStore(str(tmp_path)) for _ in range(8)]
+    with ThreadPoolExecutor(len(stores)) as executor:
+        reservations = list(executor.map(lambda store: store.reserve_runs(5), stores))
+
+    runs = np.concatenate([list(reserved) for reserved in reservations])
+    assert sorted(runs) == list(range(40))
+
+
+def test_reservations_follow_written_runs(tmp_path):
+    store = TrajectoryStore(str(tmp_path))
+    with store.writer() as writer:
+        writer.append(SimulationResult(np.zeros(2), np.zeros(2), np.zeros(2), 0.0), run=41)
+
+    assert list(store.reserve_runs(2)) == [42, 43]
+    assert list(store.reserve_runs(1)) == [44]
+
+
+def test_abandoned_lock_is_broken(tmp_path):
+    lock = os.path.join(str(tmp_path), RUNS_LOCK)
+    open(lock, 'w').close()
+    os.utime(lock, (time.time() - 2*LOCK_TIMEOUT,)*2)
+
+    assert list(TrajectoryStore(str(tmp_path)).reserve_runs(3)) == [0, 1, 2]
+    assert not os.path.exists(lock)